@@ -1,13 +1,29 @@
 """Admin-related API endpoints."""
-from fastapi import APIRouter, HTTPException, status, Depends
-from pydantic import BaseModel
+import csv
+
+from fastapi import APIRouter, HTTPException, status, Depends, File, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.core.security import verify_password
+from app.core.config import get_settings
+from app.core.database import get_db, run_db, run_write, write_queue
+from app.core.security import password_hasher
+from app.core.tokens import token_authority
+from app.models.models import Admin, Driver, Student
 from app.services import crud
+from app.services.auth import check_password
+from app.services.broadcast import broadcaster
+from app.services.bulk_import import DRIVERS, STUDENTS, BulkImport, ImportSpec, read_rows
+from app.services.live_positions import live_positions
+from app.services.pagination import decode_cursor, set_next_cursor, stream_json_array
+from app.services.response_cache import response_cache
+from app.services.route_assignment import route_assigner
+from app.services.schedule_conflicts import schedule_conflicts
+from app.services.stats import dashboard_stats
 
 router = APIRouter(prefix="/admin", tags=["admin"])
+settings = get_settings()
 
 
 class AdminLoginRequest(BaseModel):
@@ -30,6 +46,8 @@ class DashboardStats(BaseModel):
     total_students: int
     total_drivers: int
     active_buses: int
+    active_drivers: int
+    students_per_route: dict[int, int]
 
 
 @router.post("/login", response_model=AdminLoginResponse)
@@ -41,15 +59,15 @@ async def admin_login(credentials: AdminLoginRequest, db: Session = Depends(get_
     - Username: admin, Password: admin123
     - Username: tceeduride, Password: tce@2025
     """
-    admin = crud.get_admin_by_username(db, credentials.username)
-    if not admin or not verify_password(credentials.password, admin.password):
+    admin = await run_db(crud.get_admin_by_username, db, credentials.username)
+    if not await check_password(Admin, admin, credentials.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password"
         )
     
     return AdminLoginResponse(
-        access_token=f"simple_token_{admin.id}_{admin.username}",
+        access_token=token_authority.issue(admin.id, "admin"),
         token_type="bearer",
         user={
             "id": admin.id,
@@ -61,23 +79,39 @@ async def admin_login(credentials: AdminLoginRequest, db: Session = Depends(get_
 
 
 @router.get("/dashboard", response_model=DashboardStats)
-async def admin_dashboard(db: Session = Depends(get_db)) -> DashboardStats:
-    """Return summary metrics for the admin dashboard."""
-    from app.models.models import Bus, Route, Student, Driver
-    
-    total_buses = db.query(Bus).count()
-    total_routes = db.query(Route).count()
-    total_students = db.query(Student).count()
-    total_drivers = db.query(Driver).count()
-    active_buses = db.query(Bus).filter(Bus.status == "active").count()
-    
-    return DashboardStats(
-        total_buses=total_buses,
-        total_routes=total_routes,
-        total_students=total_students,
-        total_drivers=total_drivers,
-        active_buses=active_buses
-    )
+async def admin_dashboard() -> DashboardStats:
+    """Return summary metrics for the admin dashboard from the in-memory counters."""
+    return DashboardStats(**dashboard_stats.snapshot())
+
+
+class ImportRowError(BaseModel):
+    """Validation errors of one CSV row."""
+    row: int
+    errors: list[str]
+
+
+class ImportReport(BaseModel):
+    """Outcome of a bulk CSV import."""
+    imported: int
+    valid: int
+    failed: int
+    errors: list[ImportRowError]
+
+
+async def run_import(db: Session, file: UploadFile, spec: ImportSpec, dry_run: bool) -> ImportReport:
+    """
+    Validate an uploaded CSV file on a read session, hash its passwords on
+    the hashing pool, then insert it on the writer connection.
+    """
+    importer = BulkImport(spec, chunk_size=settings.import_chunk_size)
+    try:
+        await run_db(importer.validate, db, read_rows(file.file))
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise HTTPException(status_code=400, detail=f"Unreadable CSV file: {exc}")
+    if not dry_run:
+        await importer.hash_passwords()
+        await run_write(importer.insert)
+    return ImportReport(**importer.report(dry_run))
 
 
 # Student Management by Admin
@@ -88,6 +122,8 @@ class StudentCreate(BaseModel):
     roll_number: str
     phone: str
     route_id: int | None = None
+    home_latitude: float | None = Field(None, ge=-90, le=90)
+    home_longitude: float | None = Field(None, ge=-180, le=180)
     password: str
 
 
@@ -99,53 +135,121 @@ class StudentResponse(BaseModel):
     roll_number: str
     phone: str
     route_id: int | None
+    home_latitude: float | None = None
+    home_longitude: float | None = None
     status: str
 
 
+def student_response(s) -> StudentResponse:
+    """Build the response schema for a student."""
+    return StudentResponse(
+        id=s.id,
+        name=s.name,
+        email=s.email,
+        roll_number=s.roll_number,
+        phone=s.phone,
+        route_id=s.route_id,
+        home_latitude=s.home_latitude,
+        home_longitude=s.home_longitude,
+        status=s.status
+    )
+
+
 @router.post("/students", response_model=StudentResponse, status_code=status.HTTP_201_CREATED)
 async def create_student(student: StudentCreate, db: Session = Depends(get_db)) -> StudentResponse:
     """Admin creates a new student account."""
     # Check if email already exists
-    existing = crud.get_student_by_email(db, student.email)
+    existing = await run_db(crud.get_student_by_email, db, student.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    db_student = crud.create_student(
-        db=db,
+    db_student = await run_write(
+        crud.create_student,
         name=student.name,
         email=student.email,
         roll_number=student.roll_number,
         phone=student.phone,
-        password=student.password,
-        route_id=student.route_id
-    )
-    return StudentResponse(
-        id=db_student.id,
-        name=db_student.name,
-        email=db_student.email,
-        roll_number=db_student.roll_number,
-        phone=db_student.phone,
-        route_id=db_student.route_id,
-        status=db_student.status
+        password_hash=await password_hasher.hash(student.password),
+        route_id=student.route_id,
+        home_latitude=student.home_latitude,
+        home_longitude=student.home_longitude
     )
+    return student_response(db_student)
+
+
+@router.post("/students/import", response_model=ImportReport)
+async def import_students(file: UploadFile = File(...), dry_run: bool = False,
+                          db: Session = Depends(get_db)) -> ImportReport:
+    """
+    Create students from a CSV file in one transaction.
+
+    Columns: name, email, roll_number, phone, password and optionally
+    route_id, home_latitude and home_longitude. Invalid rows are skipped and listed by line number.
+    """
+    return await run_import(db, file, STUDENTS, dry_run)
+
+
+class RouteLoad(BaseModel):
+    """Seats on a route available to assigned students, and how many are taken."""
+    route_id: int
+    capacity: int
+    load: int
+
+
+class AssignmentReport(BaseModel):
+    """Outcome of assigning students with home coordinates to routes."""
+    students: int
+    assigned: int
+    unassigned: list[int]
+    moved: int
+    total_walk_m: float
+    mean_walk_m: float
+    routes: list[RouteLoad]
+    applied: bool
+
+
+@router.post("/students/assign-routes", response_model=AssignmentReport)
+async def assign_student_routes(apply: bool = False, db: Session = Depends(get_db)) -> AssignmentReport:
+    """
+    Assign every active student with home coordinates to the route with the
+    nearest stop, within the seats of the buses scheduled on each route.
+
+    Students out of walking range of any route with seats left, or left over
+    once routes are full, are listed as unassigned. With `apply=true` the
+    changed routes are saved, and unassigned students lose their route.
+    """
+    if not apply:
+        plan = await run_db(route_assigner.plan, db)
+        return AssignmentReport(**plan.summary(), applied=False)
+
+    def save(write_db: Session) -> dict:
+        plan = route_assigner.plan(write_db)
+        route_assigner.apply(write_db, plan)
+        return plan.summary()
+
+    return AssignmentReport(**await run_write(save), applied=True)
 
 
 @router.get("/students", response_model=list[StudentResponse])
-async def list_students(db: Session = Depends(get_db)) -> list[StudentResponse]:
-    """Admin views all students."""
-    students = crud.get_students(db)
-    return [
-        StudentResponse(
-            id=s.id,
-            name=s.name,
-            email=s.email,
-            roll_number=s.roll_number,
-            phone=s.phone,
-            route_id=s.route_id,
-            status=s.status
-        )
-        for s in students
-    ]
+async def list_students(response: Response, cursor: str | None = None,
+                        limit: int = Query(100, ge=1, le=1000),
+                        db: Session = Depends(get_db)) -> list[StudentResponse]:
+    """Admin views students a page at a time; the next page cursor is in X-Next-Cursor."""
+    students, next_id = await run_db(crud.get_students, db, decode_cursor(cursor), limit)
+    set_next_cursor(response, next_id)
+    return [student_response(s) for s in students]
+
+
+@router.get("/students/export", response_model=list[StudentResponse])
+async def export_students() -> StreamingResponse:
+    """Stream every student as one JSON array."""
+    return StreamingResponse(
+        stream_json_array(
+            lambda db: crud.export_query(db, Student),
+            lambda s: student_response(s).model_dump_json()
+        ),
+        media_type="application/json"
+    )
 
 
 @router.put("/students/{student_id}", response_model=StudentResponse)
@@ -164,10 +268,11 @@ async def update_student(student_id: int, student: StudentCreate) -> StudentResp
 
 
 @router.delete("/students/{student_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_student(student_id: int, db: Session = Depends(get_db)) -> None:
+async def delete_student(student_id: int) -> None:
     """Admin deletes a student account."""
-    if not crud.delete_student(db, student_id):
+    if not await run_write(crud.delete_student, student_id):
         raise HTTPException(status_code=404, detail="Student not found")
+    token_authority.revoke_user("student", student_id)
 
 
 # Driver Management by Admin
@@ -192,50 +297,71 @@ class DriverResponse(BaseModel):
     status: str
 
 
+def driver_response(d) -> DriverResponse:
+    """Build the response schema for a driver."""
+    return DriverResponse(
+        id=d.id,
+        name=d.name,
+        email=d.email,
+        phone=d.phone,
+        license_number=d.license_number,
+        bus_id=d.bus_id,
+        status=d.status
+    )
+
+
 @router.post("/drivers", response_model=DriverResponse, status_code=status.HTTP_201_CREATED)
 async def create_driver(driver: DriverCreate, db: Session = Depends(get_db)) -> DriverResponse:
     """Admin creates a new driver account."""
     # Check if email already exists
-    existing = crud.get_driver_by_email(db, driver.email)
+    existing = await run_db(crud.get_driver_by_email, db, driver.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    db_driver = crud.create_driver(
-        db=db,
+    db_driver = await run_write(
+        crud.create_driver,
         name=driver.name,
         email=driver.email,
         phone=driver.phone,
         license_number=driver.license_number,
-        password=driver.password,
+        password_hash=await password_hasher.hash(driver.password),
         bus_id=driver.bus_id
     )
-    return DriverResponse(
-        id=db_driver.id,
-        name=db_driver.name,
-        email=db_driver.email,
-        phone=db_driver.phone,
-        license_number=db_driver.license_number,
-        bus_id=db_driver.bus_id,
-        status=db_driver.status
-    )
+    return driver_response(db_driver)
+
+
+@router.post("/drivers/import", response_model=ImportReport)
+async def import_drivers(file: UploadFile = File(...), dry_run: bool = False,
+                         db: Session = Depends(get_db)) -> ImportReport:
+    """
+    Create drivers from a CSV file in one transaction.
+
+    Columns: name, email, phone, license_number, password and optionally
+    bus_id. Invalid rows are skipped and listed by line number.
+    """
+    return await run_import(db, file, DRIVERS, dry_run)
 
 
 @router.get("/drivers", response_model=list[DriverResponse])
-async def list_drivers(db: Session = Depends(get_db)) -> list[DriverResponse]:
-    """Admin views all drivers."""
-    drivers = crud.get_drivers(db)
-    return [
-        DriverResponse(
-            id=d.id,
-            name=d.name,
-            email=d.email,
-            phone=d.phone,
-            license_number=d.license_number,
-            bus_id=d.bus_id,
-            status=d.status
-        )
-        for d in drivers
-    ]
+async def list_drivers(response: Response, cursor: str | None = None,
+                       limit: int = Query(100, ge=1, le=1000),
+                       db: Session = Depends(get_db)) -> list[DriverResponse]:
+    """Admin views drivers a page at a time; the next page cursor is in X-Next-Cursor."""
+    drivers, next_id = await run_db(crud.get_drivers, db, decode_cursor(cursor), limit)
+    set_next_cursor(response, next_id)
+    return [driver_response(d) for d in drivers]
+
+
+@router.get("/drivers/export", response_model=list[DriverResponse])
+async def export_drivers() -> StreamingResponse:
+    """Stream every driver as one JSON array."""
+    return StreamingResponse(
+        stream_json_array(
+            lambda db: crud.export_query(db, Driver),
+            lambda d: driver_response(d).model_dump_json()
+        ),
+        media_type="application/json"
+    )
 
 
 @router.put("/drivers/{driver_id}", response_model=DriverResponse)
@@ -254,7 +380,22 @@ async def update_driver(driver_id: int, driver: DriverCreate) -> DriverResponse:
 
 
 @router.delete("/drivers/{driver_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_driver(driver_id: int, db: Session = Depends(get_db)) -> None:
+async def delete_driver(driver_id: int) -> None:
     """Admin deletes a driver account."""
-    if not crud.delete_driver(db, driver_id):
+    if not await run_write(crud.delete_driver, driver_id):
         raise HTTPException(status_code=404, detail="Driver not found")
+    live_positions.forget_driver(driver_id)
+    token_authority.revoke_user("driver", driver_id)
+
+
+@router.get("/live-positions/stats", response_model=dict)
+async def live_position_stats() -> dict:
+    """Return runtime counters of the live position store and its broadcaster."""
+    return {**live_positions.stats(), "broadcast": broadcaster.stats()}
+
+
+@router.get("/runtime-stats", response_model=dict)
+async def runtime_stats() -> dict:
+    """Return runtime counters of the write queue, token cache, response cache and schedule index."""
+    return {"writer": write_queue.stats(), "tokens": token_authority.stats(),
+            "response_cache": response_cache.stats(), "schedule_conflicts": schedule_conflicts.stats()}
@@ -0,0 +1,19 @@
+"""Access token endpoints shared by every user type."""
+from fastapi import APIRouter, Depends, status
+
+from app.core.tokens import Principal, token_authority
+from app.services.auth import require_role
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+
+@router.get("/me", response_model=dict)
+async def current_user(principal: Principal = Depends(require_role())) -> dict:
+    """Return the user and role a token was issued to."""
+    return {"user_id": principal.user_id, "role": principal.role, "expires_at": principal.expires_at}
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(principal: Principal = Depends(require_role())) -> None:
+    """Revoke the token used for this request."""
+    token_authority.revoke(principal)
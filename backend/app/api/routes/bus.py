@@ -1,10 +1,21 @@
 """Bus management endpoints."""
-from fastapi import APIRouter, HTTPException, status, Depends
-from pydantic import BaseModel
+import json
+import math
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import ReadSessionLocal, get_db, run_db, run_write
+from app.models.models import Bus, Schedule
 from app.services import crud
+from app.services.location_history import location_history
+from app.services.pagination import decode_cursor, next_cursor_headers, stream_json_array
+from app.services.response_cache import cached_response, response_cache
+from app.services.live_positions import live_positions, naive_utc
+from app.services.spatial_index import spatial_index
 
 router = APIRouter(prefix="/buses", tags=["bus"])
 
@@ -27,6 +38,16 @@ class BusResponse(BaseModel):
     status: str
 
 
+class BusLocation(BaseModel):
+    """Latest known position of a bus."""
+    bus_id: int
+    driver_id: int
+    lat: float
+    lng: float
+    speed: float | None
+    timestamp: str
+
+
 class BusUpdate(BaseModel):
     """Schema for updating bus information."""
     capacity: int | None = None
@@ -34,63 +55,145 @@ class BusUpdate(BaseModel):
     status: str | None = None
 
 
+def bus_response(b) -> BusResponse:
+    """Build the response schema for a bus."""
+    return BusResponse(
+        id=b.id,
+        bus_number=b.bus_number,
+        capacity=b.capacity,
+        model=b.model,
+        registration_number=b.registration_number,
+        status=b.status
+    )
+
+
+bus_list_adapter = TypeAdapter(list[BusResponse])
+
+
 @router.get("/", response_model=list[BusResponse])
-async def list_buses(db: Session = Depends(get_db)) -> list[BusResponse]:
-    """List all buses registered in the system."""
-    buses = crud.get_buses(db)
-    return [
-        BusResponse(
-            id=b.id,
-            bus_number=b.bus_number,
-            capacity=b.capacity,
-            model=b.model,
-            registration_number=b.registration_number,
-            status=b.status
-        )
-        for b in buses
-    ]
+async def list_buses(request: Request, cursor: str | None = None,
+                     limit: int = Query(100, ge=1, le=1000),
+                     db: Session = Depends(get_db)) -> Response:
+    """
+    List buses a page at a time; the next page cursor is in X-Next-Cursor.
+
+    Pages are served from the response cache and revalidated with ETag /
+    If-None-Match.
+    """
+    after_id = decode_cursor(cursor)
+
+    def serialize_page() -> tuple[bytes, dict[str, str]]:
+        buses, next_id = crud.get_buses(db, after_id, limit)
+        return bus_list_adapter.dump_json([bus_response(b) for b in buses]), next_cursor_headers(next_id)
+
+    return await cached_response(request, "buses", f"{after_id}:{limit}", serialize_page)
+
+
+@router.get("/export", response_model=list[BusResponse])
+async def export_buses() -> StreamingResponse:
+    """Stream every bus as one JSON array."""
+    return StreamingResponse(
+        stream_json_array(
+            lambda db: crud.export_query(db, Bus),
+            lambda b: bus_response(b).model_dump_json()
+        ),
+        media_type="application/json"
+    )
 
 
 @router.get("/{bus_id}", response_model=BusResponse)
 async def get_bus(bus_id: int, db: Session = Depends(get_db)) -> BusResponse:
     """Get details of a specific bus."""
-    bus = crud.get_bus(db, bus_id)
+    bus = await run_db(crud.get_bus, db, bus_id)
     if not bus:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bus not found")
-    return BusResponse(
-        id=bus.id,
-        bus_number=bus.bus_number,
-        capacity=bus.capacity,
-        model=bus.model,
-        registration_number=bus.registration_number,
-        status=bus.status
+    return bus_response(bus)
+
+
+@router.get("/{bus_id}/location", response_model=BusLocation)
+async def get_bus_location(bus_id: int) -> BusLocation:
+    """Get the live position of a bus from memory."""
+    position = live_positions.get(bus_id)
+    if not position:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No live position for bus")
+    return BusLocation(**position.to_dict())
+
+
+def stream_history(bus_id: int, start: datetime, end: datetime, max_points: int | None):
+    """Yield NDJSON lines for a bus's positions, keeping every n-th point if decimating."""
+    db = ReadSessionLocal()
+    try:
+        stride = 1
+        if max_points is not None:
+            total = location_history.count(db, start, end, bus_id=bus_id)
+            stride = max(1, math.ceil(total / max_points))
+
+        last = None
+        for index, row in enumerate(location_history.iter_rows(db, start, end, bus_id=bus_id)):
+            line = json.dumps({
+                "lat": row.latitude,
+                "lng": row.longitude,
+                "speed": row.speed,
+                "timestamp": row.timestamp.isoformat()
+            }) + "\n"
+            if index % stride == 0:
+                yield line
+                last = None
+            else:
+                last = line
+        if last is not None:
+            yield last
+    finally:
+        db.close()
+
+
+@router.get("/{bus_id}/history")
+async def get_bus_history(
+    bus_id: int,
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    max_points: int | None = Query(None, ge=2),
+    db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Replay a bus's recorded positions between `from` and `to` as NDJSON.
+
+    Rows are streamed in timestamp order without loading the range into
+    memory. `max_points` thins the output to roughly that many points,
+    always keeping the first and last. Bounds with an offset are converted
+    to UTC, the time positions are stored in.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'to' must be after 'from'")
+    if not await run_db(crud.get_bus, db, bus_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bus not found")
+
+    return StreamingResponse(
+        stream_history(bus_id, start, end, max_points),
+        media_type="application/x-ndjson"
     )
 
 
 @router.post("/", response_model=BusResponse, status_code=status.HTTP_201_CREATED)
-async def create_bus(bus: BusCreate, db: Session = Depends(get_db)) -> BusResponse:
+async def create_bus(bus: BusCreate) -> BusResponse:
     """Register a new bus in the system."""
-    db_bus = crud.create_bus(
-        db=db,
+    db_bus = await run_write(
+        crud.create_bus,
         bus_number=bus.bus_number,
         capacity=bus.capacity,
         model=bus.model,
         registration_number=bus.registration_number
     )
-    return BusResponse(
-        id=db_bus.id,
-        bus_number=db_bus.bus_number,
-        capacity=db_bus.capacity,
-        model=db_bus.model,
-        registration_number=db_bus.registration_number,
-        status=db_bus.status
-    )
+    response_cache.bump("buses")
+    return bus_response(db_bus)
 
 
 @router.put("/{bus_id}", response_model=BusResponse)
 async def update_bus(bus_id: int, bus_update: BusUpdate) -> BusResponse:
     """Update bus information."""
     # TODO: Update in database
+    response_cache.bump("buses")
     return BusResponse(
         id=bus_id,
         bus_number="BUS-001",
@@ -102,7 +205,17 @@ async def update_bus(bus_id: int, bus_update: BusUpdate) -> BusResponse:
 
 
 @router.delete("/{bus_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_bus(bus_id: int, db: Session = Depends(get_db)) -> None:
-    """Remove a bus from the system."""
-    if not crud.delete_bus(db, bus_id):
+async def delete_bus(bus_id: int) -> None:
+    """Remove a bus from the system; 409 while schedules still use it."""
+    def remove(db: Session) -> bool:
+        if db.query(Schedule.id).filter(Schedule.bus_id == bus_id).first():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Bus has schedules; delete or reassign them first"
+            )
+        return crud.delete_bus(db, bus_id)
+
+    if not await run_write(remove):
         raise HTTPException(status_code=404, detail="Bus not found")
+    response_cache.bump("buses")
+    spatial_index.remove_bus(bus_id)
@@ -1,11 +1,19 @@
 """Driver-related endpoints."""
+from datetime import datetime
+
 from fastapi import APIRouter, HTTPException, status, Depends
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.core.security import verify_password
+from app.core.config import get_settings
+from app.core.database import get_db, run_db, run_write_batched
+from app.core.tokens import Principal, token_authority
+from app.models.models import Driver
 from app.services import crud
+from app.services.auth import check_password, require_role
+from app.services.broadcast import broadcaster
+from app.services.live_positions import BusPosition, live_positions, naive_utc
+from app.services.spatial_index import spatial_index
 
 router = APIRouter(prefix="/drivers", tags=["driver"])
 
@@ -25,16 +33,46 @@ class DriverLoginResponse(BaseModel):
 
 class LocationUpdate(BaseModel):
     """GPS location update from driver."""
+    driver_id: int
+    bus_id: int | None = None
+    latitude: float
+    longitude: float
+    speed: float | None = None  # km/h
+    timestamp: datetime | None = None
+
+    _naive_timestamp = field_validator("timestamp")(naive_utc)
+
+
+class LocationPoint(BaseModel):
+    """A buffered GPS point with the client's sequence number."""
+    seq: int
     latitude: float
     longitude: float
     speed: float | None = None
+    timestamp: datetime
+
+    _naive_timestamp = field_validator("timestamp")(naive_utc)
+
+
+class LocationBatch(BaseModel):
+    """A buffer of GPS points uploaded in one request."""
+    driver_id: int
+    bus_id: int | None = None
+    points: list[LocationPoint]
+
+
+class LocationBatchResult(BaseModel):
+    """Outcome of a batched location upload."""
+    status: str
+    accepted: int
+    duplicates: int
 
 
 @router.post("/login", response_model=DriverLoginResponse)
 async def driver_login(credentials: DriverLoginRequest, db: Session = Depends(get_db)) -> DriverLoginResponse:
     """Authenticate driver users."""
-    driver = crud.get_driver_by_email(db, credentials.email)
-    if not driver or not verify_password(credentials.password, driver.password):
+    driver = await run_db(crud.get_driver_by_email, db, credentials.email)
+    if not await check_password(Driver, driver, credentials.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -42,12 +80,12 @@ async def driver_login(credentials: DriverLoginRequest, db: Session = Depends(ge
     
     bus_number = None
     if driver.bus_id:
-        bus = crud.get_bus(db, driver.bus_id)
+        bus = await run_db(crud.get_bus, db, driver.bus_id)
         if bus:
             bus_number = bus.bus_number
     
     return DriverLoginResponse(
-        access_token=f"driver_token_{driver.id}_{driver.email}",
+        access_token=token_authority.issue(driver.id, "driver"),
         token_type="bearer",
         driver={
             "id": driver.id,
@@ -55,6 +93,7 @@ async def driver_login(credentials: DriverLoginRequest, db: Session = Depends(ge
             "name": driver.name,
             "license_number": driver.license_number,
             "phone": driver.phone,
+            "bus_id": driver.bus_id,
             "bus_assigned": bus_number
         }
     )
@@ -75,11 +114,115 @@ async def driver_dashboard() -> dict:
     }
 
 
+async def resolve_bus_id(db: Session, driver_id: int, bus_id: int | None) -> int:
+    """
+    Return the bus assigned to a driver, hitting the database once per driver.
+
+    A `bus_id` sent by the client must be that bus.
+    """
+    assigned = live_positions.bus_for_driver(driver_id)
+    if assigned is None:
+        driver = await run_db(crud.get_driver, db, driver_id)
+        if not driver:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Driver not found")
+        if not driver.bus_id:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No bus assigned to driver")
+        live_positions.remember_driver_bus(driver_id, driver.bus_id)
+        assigned = driver.bus_id
+    if bus_id not in (None, assigned):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Bus is not assigned to this driver")
+    return assigned
+
+
+def check_driver(principal: Principal, driver_id: int) -> None:
+    """Reject location uploads on behalf of another driver."""
+    if principal.user_id != driver_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token belongs to another driver")
+
+
+def publish_position(position: BusPosition) -> None:
+    """Push a new live position to subscribers and the spatial index."""
+    spatial_index.move_bus(position.bus_id, position.latitude, position.longitude)
+    broadcaster.publish(position)
+
+
 @router.post("/location", status_code=200)
-async def update_location(location: LocationUpdate) -> dict:
-    """Update driver's current GPS location."""
-    # TODO: Store in database and broadcast to students
+async def update_location(location: LocationUpdate, db: Session = Depends(get_db),
+                          principal: Principal = Depends(require_role("driver"))) -> dict:
+    """Update driver's current GPS location; requires the driver's access token."""
+    check_driver(principal, location.driver_id)
+    bus_id = await resolve_bus_id(db, location.driver_id, location.bus_id)
+    position = live_positions.update(
+        bus_id=bus_id,
+        driver_id=location.driver_id,
+        latitude=location.latitude,
+        longitude=location.longitude,
+        speed=location.speed,
+        timestamp=location.timestamp
+    )
+    if live_positions.get(bus_id) is position:
+        publish_position(position)
     return {
         "status": "success",
         "message": "Location updated successfully"
     }
+
+
+@router.post("/location/batch", response_model=LocationBatchResult)
+async def update_location_batch(batch: LocationBatch, db: Session = Depends(get_db),
+                                principal: Principal = Depends(require_role("driver"))) -> LocationBatchResult:
+    """
+    Upload a buffer of GPS points collected while offline; requires the driver's access token.
+
+    Points may arrive out of order or be re-sent after a failed upload;
+    (driver_id, seq) pairs already seen are skipped. New points are written
+    with one multi-row INSERT and the newest one becomes the live position.
+    """
+    check_driver(principal, batch.driver_id)
+    max_points = get_settings().location_batch_max_points
+    if len(batch.points) > max_points:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {max_points} points per batch"
+        )
+
+    bus_id = await resolve_bus_id(db, batch.driver_id, batch.bus_id)
+    points = sorted(
+        (p for p in batch.points if live_positions.claim_sequence(batch.driver_id, p.seq)),
+        key=lambda p: p.timestamp
+    )
+    try:
+        await run_write_batched(crud.create_locations, [
+            {
+                "bus_id": bus_id,
+                "driver_id": batch.driver_id,
+                "latitude": p.latitude,
+                "longitude": p.longitude,
+                "speed": p.speed,
+                "timestamp": p.timestamp
+            }
+            for p in points
+        ])
+    except Exception:
+        live_positions.release_sequences(batch.driver_id, [p.seq for p in points])
+        raise
+
+    if points:
+        newest = points[-1]
+        position = live_positions.update(
+            bus_id=bus_id,
+            driver_id=batch.driver_id,
+            latitude=newest.latitude,
+            longitude=newest.longitude,
+            speed=newest.speed,
+            timestamp=newest.timestamp,
+            persist=False
+        )
+        if live_positions.get(bus_id) is position:
+            publish_position(position)
+
+    return LocationBatchResult(
+        status="success",
+        accepted=len(points),
+        duplicates=len(batch.points) - len(points)
+    )
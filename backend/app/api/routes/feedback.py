@@ -1,9 +1,14 @@
 """Feedback dashboard endpoints."""
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, status, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_db, run_db, run_write
+from app.models.models import Feedback
+from app.services import feedback_search
+from app.services.feedback_analytics import feedback_analytics
+from app.services.pagination import decode_cursor, set_next_cursor, stream_json_array
 
 router = APIRouter(prefix="/feedback", tags=["feedback"])
 
@@ -29,81 +34,116 @@ class FeedbackResponse(BaseModel):
     status: str
 
 
+class DailyFeedback(BaseModel):
+    """Feedback count and average rating of one day."""
+    day: str
+    count: int
+    average_rating: float
+
+
 class FeedbackSummary(BaseModel):
     """Analytics summary for feedback dashboard."""
     total_feedback: int
     average_rating: float
     feedback_by_category: dict[str, int]
+    feedback_by_user_type: dict[str, int]
+    daily: list[DailyFeedback] = []
     recent_feedback: list[FeedbackResponse]
 
 
+class FeedbackSearchResult(FeedbackResponse):
+    """Feedback entry matching a search, with the highlighted match."""
+    snippet: str
+    rank: float
+
+
+def feedback_response(f) -> FeedbackResponse:
+    """Build the response schema for a feedback entry."""
+    return FeedbackResponse(
+        id=f.id,
+        user_id=f.user_id,
+        user_type=f.user_type,
+        rating=f.rating,
+        category=f.category,
+        message=f.message,
+        created_at=f.created_at.isoformat(),
+        status=f.status
+    )
+
+
 @router.get("/", response_model=list[FeedbackResponse])
-async def list_feedback(db: Session = Depends(get_db)) -> list[FeedbackResponse]:
-    """List all feedback entries."""
+async def list_feedback(response: Response, cursor: str | None = None,
+                        limit: int = Query(100, ge=1, le=1000),
+                        db: Session = Depends(get_db)) -> list[FeedbackResponse]:
+    """List feedback entries a page at a time; the next page cursor is in X-Next-Cursor."""
     from app.services import crud
-    feedbacks = crud.get_feedbacks(db)
+    feedbacks, next_id = await run_db(crud.get_feedbacks, db, decode_cursor(cursor), limit)
+    set_next_cursor(response, next_id)
+    return [feedback_response(f) for f in feedbacks]
+
+
+@router.get("/export", response_model=list[FeedbackResponse])
+async def export_feedback() -> StreamingResponse:
+    """Stream every feedback entry as one JSON array."""
+    from app.services import crud
+    return StreamingResponse(
+        stream_json_array(
+            lambda db: crud.export_query(db, Feedback),
+            lambda f: feedback_response(f).model_dump_json()
+        ),
+        media_type="application/json"
+    )
+
+
+@router.get("/search", response_model=list[FeedbackSearchResult])
+async def search_feedback(q: str = Query(..., min_length=1, max_length=200),
+                          category: str | None = None,
+                          rating: int | None = Query(None, ge=1, le=5),
+                          status: str | None = None,
+                          limit: int = Query(20, ge=1, le=100),
+                          offset: int = Query(0, ge=0),
+                          db: Session = Depends(get_db)) -> list[FeedbackSearchResult]:
+    """Search feedback messages, best match first; hits are wrapped in <mark> in `snippet`."""
+    rows = await run_db(feedback_search.search, db, q, category=category, rating=rating, status=status,
+                        limit=limit, offset=offset)
     return [
-        FeedbackResponse(
-            id=f.id,
-            user_id=f.user_id,
-            user_type=f.user_type,
-            rating=f.rating,
-            category=f.category,
-            message=f.message,
-            created_at=f.created_at.isoformat(),
-            status=f.status
-        )
-        for f in feedbacks
+        FeedbackSearchResult(**feedback_response(row).model_dump(), snippet=row.snippet, rank=row.rank)
+        for row in rows
     ]
 
 
 @router.get("/summary", response_model=FeedbackSummary)
-async def get_feedback_summary() -> FeedbackSummary:
-    """Return feedback analytics for the dashboard."""
-    # TODO: Calculate from database
+async def get_feedback_summary(days: int | None = Query(None, ge=1, le=366),
+                               recent: int = Query(10, ge=0, le=50),
+                               db: Session = Depends(get_db)) -> FeedbackSummary:
+    """
+    Return feedback analytics for the dashboard.
+
+    Without `days` the all-time totals come from memory; with `days` they
+    cover the last `days` days and are read from the daily rollups.
+    """
+    if days is None:
+        totals, daily = feedback_analytics.totals(), []
+    else:
+        totals = await run_db(feedback_analytics.window, db, days)
+        daily = await run_db(feedback_analytics.daily, db, days)
     return FeedbackSummary(
-        total_feedback=150,
-        average_rating=4.2,
-        feedback_by_category={
-            "service": 50,
-            "bus_condition": 40,
-            "driver_behavior": 35,
-            "route": 25
-        },
-        recent_feedback=[
-            FeedbackResponse(
-                id=1,
-                user_id=1,
-                user_type="student",
-                rating=5,
-                category="service",
-                message="Excellent service",
-                created_at="2025-11-25T10:30:00",
-                status="reviewed"
-            )
-        ]
+        **totals,
+        daily=[DailyFeedback(**d) for d in daily],
+        recent_feedback=[FeedbackResponse(**f) for f in feedback_analytics.recent(recent)]
     )
 
 
 @router.post("/", response_model=FeedbackResponse, status_code=status.HTTP_201_CREATED)
-async def submit_feedback(feedback: FeedbackCreate, db: Session = Depends(get_db)) -> FeedbackResponse:
+async def submit_feedback(feedback: FeedbackCreate) -> FeedbackResponse:
     """Submit new feedback."""
     from app.services import crud
-    new_feedback = crud.create_feedback(
-        db=db,
+    new_feedback = await run_write(
+        crud.create_feedback,
         user_id=feedback.user_id,
         user_type=feedback.user_type,
         rating=feedback.rating,
         category=feedback.category,
         message=feedback.message
     )
-    return FeedbackResponse(
-        id=new_feedback.id,
-        user_id=new_feedback.user_id,
-        user_type=new_feedback.user_type,
-        rating=new_feedback.rating,
-        category=new_feedback.category,
-        message=new_feedback.message,
-        created_at=new_feedback.created_at.isoformat(),
-        status=new_feedback.status
-    )
+    return feedback_response(new_feedback)
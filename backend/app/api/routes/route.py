@@ -1,16 +1,27 @@
 """Route management endpoints."""
-from fastapi import APIRouter, HTTPException, status, Depends
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from sqlalchemy.orm import Session, selectinload
 
-from app.core.database import get_db
+from app.core.database import get_db, run_db, run_write
+from app.models.models import Route, Schedule
 from app.services import crud
+from app.services.eta import eta_engine
+from app.services.live_positions import live_positions
+from app.services.pagination import decode_cursor, next_cursor_headers, stream_json_array
+from app.services.response_cache import cached_response, response_cache
+from app.services.route_optimizer import route_optimizer
+from app.services.schedule_conflicts import schedule_conflicts
+from app.services.spatial_index import spatial_index
+from app.services.stop_times import set_segment_speeds, stop_times
 
 router = APIRouter(prefix="/routes", tags=["route"])
 
 
 class RouteStop(BaseModel):
-    """A stop along a route."""
+    """A stop along a route; `id` identifies an existing stop when updating."""
+    id: int | None = None
     stop_name: str
     latitude: float
     longitude: float
@@ -33,43 +44,54 @@ class RouteResponse(BaseModel):
     status: str
 
 
-@router.get("/", response_model=list[RouteResponse])
-async def list_routes(db: Session = Depends(get_db)) -> list[RouteResponse]:
-    """List all configured routes."""
-    routes = crud.get_routes(db)
-    return [
-        RouteResponse(
-            id=route.id,
-            route_name=route.route_name,
-            description=route.description or "",
-            stops=[
-                RouteStop(
-                    stop_name=stop.stop_name,
-                    latitude=stop.latitude,
-                    longitude=stop.longitude,
-                    order=stop.order
-                )
-                for stop in route.stops
-            ],
-            status=route.status
-        )
-        for route in routes
-    ]
+class SegmentSpeedUpdate(BaseModel):
+    """Speed between two consecutive stops of a route, configured or measured."""
+    from_stop_id: int
+    to_stop_id: int
+    speed_kmh: float = Field(gt=0)
 
 
-@router.get("/{route_id}", response_model=RouteResponse)
-async def get_route(route_id: int, db: Session = Depends(get_db)) -> RouteResponse:
-    """Get details of a specific route."""
-    route = crud.get_route(db, route_id)
-    if not route:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
-    
+class RouteOptimization(BaseModel):
+    """A proposed stop order for a route and the distance it saves."""
+    route_id: int
+    stops: list[RouteStop]  # in the proposed order, numbered from 1
+    original_distance_m: float
+    optimized_distance_m: float
+    distance_saved_m: float
+    applied: bool
+
+
+class NearbyStop(BaseModel):
+    """A stop returned by a proximity query."""
+    stop_id: int
+    route_id: int
+    route_name: str
+    stop_name: str
+    latitude: float
+    longitude: float
+    order: int
+    distance_m: float
+
+
+class NearbyBus(BaseModel):
+    """A live bus returned by a proximity query."""
+    bus_id: int
+    lat: float
+    lng: float
+    speed: float | None
+    timestamp: str
+    distance_m: float
+
+
+def route_response(route) -> RouteResponse:
+    """Build the response schema for a route and its stops."""
     return RouteResponse(
         id=route.id,
         route_name=route.route_name,
         description=route.description or "",
         stops=[
             RouteStop(
+                id=stop.id,
                 stop_name=stop.stop_name,
                 latitude=stop.latitude,
                 longitude=stop.longitude,
@@ -81,95 +103,239 @@ async def get_route(route_id: int, db: Session = Depends(get_db)) -> RouteRespon
     )
 
 
-@router.post("/", response_model=RouteResponse, status_code=status.HTTP_201_CREATED)
-async def create_route(route: RouteCreate, db: Session = Depends(get_db)) -> RouteResponse:
-    """Create a new transportation route."""
-    # Create the route
-    db_route = crud.create_route(db, route.route_name, route.description)
-    
-    # Create all stops for the route
-    for stop in route.stops:
-        crud.create_route_stop(
-            db,
-            route_id=db_route.id,
-            stop_name=stop.stop_name,
-            latitude=stop.latitude,
-            longitude=stop.longitude,
-            order=stop.order
-        )
-    
-    # Refresh to get the stops
-    db.refresh(db_route)
-    
-    return RouteResponse(
-        id=db_route.id,
-        route_name=db_route.route_name,
-        description=db_route.description or "",
-        stops=[
-            RouteStop(
-                stop_name=stop.stop_name,
-                latitude=stop.latitude,
-                longitude=stop.longitude,
-                order=stop.order
-            )
-            for stop in db_route.stops
-        ],
-        status=db_route.status
+route_list_adapter = TypeAdapter(list[RouteResponse])
+
+
+def invalidate_route_caches(route_id: int) -> None:
+    """Drop every cached view of a route after it changes."""
+    response_cache.bump("routes")
+    response_cache.bump("schedules")  # arrival times follow the stops
+    eta_engine.invalidate(route_id)
+
+
+@router.get("/", response_model=list[RouteResponse])
+async def list_routes(request: Request, cursor: str | None = None,
+                      limit: int | None = Query(None, ge=1, le=1000),
+                      db: Session = Depends(get_db)) -> Response:
+    """
+    List configured routes.
+
+    Without paging parameters the whole catalogue is returned. With `limit`
+    or `cursor`, one page is returned and the next page cursor is in
+    X-Next-Cursor. Bodies are served from the response cache and
+    revalidated with ETag / If-None-Match.
+    """
+    after_id = decode_cursor(cursor)
+    page_limit = None if cursor is None and limit is None else limit or 100
+
+    def serialize_page() -> tuple[bytes, dict[str, str]]:
+        routes, next_id = crud.get_routes(db, after_id, page_limit)
+        return route_list_adapter.dump_json([route_response(r) for r in routes]), next_cursor_headers(next_id)
+
+    return await cached_response(request, "routes", f"{after_id}:{page_limit}", serialize_page)
+
+
+@router.get("/export", response_model=list[RouteResponse])
+async def export_routes() -> StreamingResponse:
+    """Stream every route with its stops as one JSON array."""
+    return StreamingResponse(
+        stream_json_array(
+            lambda db: crud.export_query(db, Route).options(selectinload(Route.stops)),
+            lambda r: route_response(r).model_dump_json()
+        ),
+        media_type="application/json"
     )
 
 
-@router.put("/{route_id}", response_model=RouteResponse)
-async def update_route(route_id: int, route: RouteCreate, db: Session = Depends(get_db)) -> RouteResponse:
-    """Update an existing route."""
-    db_route = crud.get_route(db, route_id)
-    if not db_route:
+@router.get("/stops/nearest", response_model=list[NearbyStop])
+async def nearest_stops(lat: float, lng: float, k: int = Query(5, ge=1, le=100)) -> list[NearbyStop]:
+    """Return the `k` stops closest to a point."""
+    return [NearbyStop(**stop) for stop in spatial_index.nearest_stops(lat, lng, k)]
+
+
+@router.get("/stops/within", response_model=list[NearbyStop])
+async def stops_within(lat: float, lng: float, radius_m: float = Query(500, gt=0, le=50000)) -> list[NearbyStop]:
+    """Return every stop within `radius_m` metres of a point, closest first."""
+    return [NearbyStop(**stop) for stop in spatial_index.stops_within(lat, lng, radius_m)]
+
+
+def describe_buses(hits: list[tuple[float, int]]) -> list[NearbyBus]:
+    """Attach live position details to bus hits."""
+    buses = []
+    for distance, bus_id in hits:
+        position = live_positions.get(bus_id)
+        if position:
+            buses.append(NearbyBus(**position.to_dict(), distance_m=round(distance, 1)))
+    return buses
+
+
+@router.get("/buses/nearest", response_model=list[NearbyBus])
+async def nearest_buses(lat: float, lng: float, k: int = Query(5, ge=1, le=100)) -> list[NearbyBus]:
+    """Return the `k` live buses closest to a point."""
+    return describe_buses(spatial_index.buses.nearest(lat, lng, k))
+
+
+@router.get("/buses/within", response_model=list[NearbyBus])
+async def buses_within(lat: float, lng: float, radius_m: float = Query(1000, gt=0, le=50000)) -> list[NearbyBus]:
+    """Return every live bus within `radius_m` metres of a point, closest first."""
+    return describe_buses(spatial_index.buses.within(lat, lng, radius_m))
+
+
+@router.get("/{route_id}", response_model=RouteResponse)
+async def get_route(route_id: int, db: Session = Depends(get_db)) -> RouteResponse:
+    """Get details of a specific route."""
+    def load() -> RouteResponse | None:
+        route = crud.get_route(db, route_id)
+        return route_response(route) if route else None
+
+    response = await run_db(load)
+    if not response:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
     
-    # Update route details
-    db_route.route_name = route.route_name
-    db_route.description = route.description
-    
-    # Delete existing stops
-    for stop in db_route.stops:
-        db.delete(stop)
-    
-    # Create new stops
-    for stop in route.stops:
-        crud.create_route_stop(
-            db,
-            route_id=db_route.id,
-            stop_name=stop.stop_name,
-            latitude=stop.latitude,
-            longitude=stop.longitude,
-            order=stop.order
+    return response
+
+
+@router.post("/", response_model=RouteResponse, status_code=status.HTTP_201_CREATED)
+async def create_route(route: RouteCreate) -> RouteResponse:
+    """Create a new transportation route with its stops in one transaction."""
+    def save(db: Session) -> RouteResponse:
+        db_route = crud.create_route(
+            db, route.route_name, route.description, [stop.model_dump() for stop in route.stops]
         )
+        spatial_index.set_route(db_route)
+        return route_response(db_route)
+
+    response = await run_write(save)
+    invalidate_route_caches(response.id)
     
-    db.commit()
-    db.refresh(db_route)
+    return response
+
+
+@router.put("/{route_id}", response_model=RouteResponse)
+async def update_route(route_id: int, route: RouteCreate) -> RouteResponse:
+    """
+    Update an existing route.
+
+    Stops are diffed against the stored ones, matching by `id` or by name
+    and order, so unchanged stops keep their ids.
+    """
+    def save(db: Session) -> RouteResponse | None:
+        db_route = crud.get_route(db, route_id)
+        if not db_route:
+            return None
+        crud.update_route(
+            db, db_route, route.route_name, route.description, [stop.model_dump() for stop in route.stops]
+        )
+        spatial_index.set_route(db_route)
+        schedule_conflicts.refresh_routes(db, [route_id])
+        return route_response(db_route)
+
+    response = await run_write(save)
+    if not response:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+    invalidate_route_caches(route_id)
     
-    return RouteResponse(
-        id=db_route.id,
-        route_name=db_route.route_name,
-        description=db_route.description or "",
+    return response
+
+
+@router.put("/{route_id}/segment-speeds", response_model=dict)
+async def update_segment_speeds(route_id: int, speeds: list[SegmentSpeedUpdate]) -> dict:
+    """
+    Set speeds between stops of a route and regenerate its schedules' stop times.
+
+    Segments without a speed use the default; historical averages can be
+    loaded through the same endpoint.
+    """
+    def save(db: Session) -> int | None:
+        db_route = crud.get_route(db, route_id)
+        if not db_route:
+            return None
+        stop_ids = {s.from_stop_id for s in speeds} | {s.to_stop_id for s in speeds}
+        if not stop_ids <= {stop.id for stop in db_route.stops}:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Stops must belong to this route")
+        set_segment_speeds(db, [s.model_dump() for s in speeds])
+        written = stop_times.regenerate(db, route_ids=[route_id])
+        schedule_conflicts.refresh_routes(db, [route_id])
+        return written
+
+    written = await run_write(save)
+    if written is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+    response_cache.bump("schedules")
+    return {"segments": len(speeds), "stop_times": written}
+
+
+def optimize_route(route, time_budget_ms: int | None) -> RouteOptimization:
+    """Propose a shorter order for a route's stops, keeping the first and last in place."""
+    stops = list(route.stops)
+    result = route_optimizer.optimize(
+        [stop.latitude for stop in stops], [stop.longitude for stop in stops], time_budget_ms
+    )
+    return RouteOptimization(
+        route_id=route.id,
         stops=[
-            RouteStop(
-                stop_name=stop.stop_name,
-                latitude=stop.latitude,
-                longitude=stop.longitude,
-                order=stop.order
-            )
-            for stop in db_route.stops
+            RouteStop(id=stop.id, stop_name=stop.stop_name, latitude=stop.latitude,
+                      longitude=stop.longitude, order=position)
+            for position, stop in enumerate((stops[index] for index in result.order), start=1)
         ],
-        status=db_route.status
+        original_distance_m=round(result.original_m, 1),
+        optimized_distance_m=round(result.optimized_m, 1),
+        distance_saved_m=round(result.saved_m, 1),
+        applied=False
     )
 
 
+@router.post("/{route_id}/optimize", response_model=RouteOptimization)
+async def optimize_stop_order(route_id: int, apply: bool = False,
+                              time_budget_ms: int | None = Query(None, ge=10, le=5000),
+                              db: Session = Depends(get_db)) -> RouteOptimization:
+    """
+    Propose the stop order that shortens a route most, with the first stop
+    (depot) and last stop (campus) fixed.
+
+    With `apply=true` a shorter order is saved: stops keep their ids and are
+    renumbered, and the route's stop times are regenerated.
+    """
+    if not apply:
+        def propose() -> RouteOptimization | None:
+            route = crud.get_route(db, route_id)
+            return optimize_route(route, time_budget_ms) if route else None
+
+        response = await run_db(propose)
+    else:
+        def save(write_db: Session) -> RouteOptimization | None:
+            route = crud.get_route(write_db, route_id)
+            if not route:
+                return None
+            proposal = optimize_route(route, time_budget_ms)
+            if proposal.distance_saved_m > 0:
+                crud.reorder_route_stops(write_db, route, [stop.id for stop in proposal.stops])
+                spatial_index.set_route(route)
+                schedule_conflicts.refresh_routes(write_db, [route_id])
+                proposal.applied = True
+            return proposal
+
+        response = await run_write(save)
+        if response and response.applied:
+            invalidate_route_caches(route_id)
+    if response is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+    return response
+
+
 @router.delete("/{route_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_route(route_id: int, db: Session = Depends(get_db)) -> None:
-    """Delete a route."""
-    route = crud.get_route(db, route_id)
-    if not route:
+async def delete_route(route_id: int) -> None:
+    """Delete a route; 409 while schedules still run on it."""
+    def remove(db: Session) -> bool:
+        if db.query(Schedule.id).filter(Schedule.route_id == route_id).first():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Route has schedules; delete or reassign them first"
+            )
+        return crud.delete_route(db, route_id)
+
+    if not await run_write(remove):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
     
-    db.delete(route)
-    db.commit()
+    invalidate_route_caches(route_id)
+    spatial_index.remove_route(route_id)
@@ -1,83 +1,345 @@
 """Scheduling module endpoints."""
-from fastapi import APIRouter, status
-from pydantic import BaseModel
-from datetime import time
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db, run_db, run_write
+from app.models.models import Bus, Route, RouteStop, Schedule
+from app.services import crud
+from app.services.broadcast import broadcaster
+from app.services.pagination import decode_cursor, next_cursor_headers
+from app.services.response_cache import cached_response, response_cache
+from app.services.schedule_conflicts import schedule_conflicts
+from app.services.stop_times import stop_times
+from app.services.timetable import WEEKDAYS, format_departure, parse_days, parse_departure, timetable
 
 router = APIRouter(prefix="/schedules", tags=["schedule"])
 
 
 class ScheduleCreate(BaseModel):
-    """Schema for creating a schedule."""
+    """Schema for creating or replacing a schedule."""
     bus_id: int
     route_id: int
-    departure_time: str
-    days_of_week: list[str]
+    departure_time: str  # "07:00 AM" or "19:30"
+    days_of_week: list[str] = list(WEEKDAYS[:5])
+    status: str | None = None
 
 
 class ScheduleResponse(BaseModel):
     """Schema for schedule response."""
     id: int
+    bus_id: int
+    route_id: int
     bus_number: str
     route_name: str
     departure_time: str
+    departure_minute: int | None
+    arrival_time: str | None  # at the route's last stop
     days_of_week: list[str]
+    days_mask: int | None
     status: str
 
 
+class StopTimeResponse(BaseModel):
+    """Generated arrival of a schedule at one stop."""
+    schedule_id: int
+    stop_id: int
+    stop_name: str
+    order: int
+    arrival_time: str
+    arrival_minute: int
+
+
+class ConflictResponse(BaseModel):
+    """Two schedules booking the same bus, and when they overlap."""
+    bus_id: int
+    schedule_ids: list[int]
+    day: str
+    start_minute: int
+    end_minute: int
+    start_time: str
+    end_time: str
+
+
+class DepartureResponse(BaseModel):
+    """A departure found in the timetable."""
+    schedule_id: int
+    route_id: int
+    bus_id: int
+    departure_time: str
+    departure_minute: int
+
+
+def schedule_response(schedule) -> ScheduleResponse:
+    """Build the response schema for a schedule loaded with its bus, route and stop times."""
+    last_stop = schedule.stop_times[-1] if schedule.stop_times else None
+    return ScheduleResponse(
+        id=schedule.id,
+        bus_id=schedule.bus_id,
+        route_id=schedule.route_id,
+        bus_number=schedule.bus.bus_number if schedule.bus else str(schedule.bus_id),
+        route_name=schedule.route.route_name if schedule.route else str(schedule.route_id),
+        departure_time=schedule.departure_time,
+        departure_minute=schedule.departure_minute,
+        arrival_time=format_departure(last_stop.arrival_minute) if last_stop else None,
+        days_of_week=[day for day in schedule.days_of_week.split(",") if day],
+        days_mask=schedule.days_mask,
+        status=schedule.status
+    )
+
+
+schedule_list_adapter = TypeAdapter(list[ScheduleResponse])
+
+
+def parse_day(day: str | None) -> int:
+    """Return the weekday index (0 = Monday) of a day name, number or today."""
+    if day is None:
+        return datetime.now().weekday()
+    if day.isdigit() and int(day) < len(WEEKDAYS):
+        return int(day)
+    try:
+        mask = parse_days(day)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if mask & (mask - 1):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give a single day")
+    return mask.bit_length() - 1
+
+
+def parse_minute(text: str | None, default: int) -> int:
+    """Return minutes after midnight of a query time, or `default` if absent."""
+    if text is None:
+        return default
+    try:
+        return parse_departure(text)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
 @router.get("/", response_model=list[ScheduleResponse])
-async def list_schedules() -> list[ScheduleResponse]:
-    """List all bus schedules."""
-    # TODO: Replace with database query
+async def list_schedules(request: Request, cursor: str | None = None,
+                         limit: int | None = Query(None, ge=1, le=1000),
+                         db: Session = Depends(get_db)) -> Response:
+    """
+    List bus schedules.
+
+    Without paging parameters every schedule is returned; with `limit` or
+    `cursor`, one page and the next page cursor in X-Next-Cursor. Bodies are
+    revalidated with ETag / If-None-Match.
+    """
+    after_id = decode_cursor(cursor)
+    page_limit = None if cursor is None and limit is None else limit or 100
+
+    def serialize_page() -> tuple[bytes, dict[str, str]]:
+        schedules, next_id = crud.get_schedules(db, after_id, page_limit)
+        return (
+            schedule_list_adapter.dump_json([schedule_response(s) for s in schedules]),
+            next_cursor_headers(next_id)
+        )
+
+    return await cached_response(request, "schedules", f"{after_id}:{page_limit}", serialize_page)
+
+
+def conflict_response(conflict) -> ConflictResponse:
+    """Build the response schema for a schedule conflict."""
+    return ConflictResponse(
+        **conflict.to_dict(),
+        start_time=format_departure(conflict.start_minute),
+        end_time=format_departure(conflict.end_minute)
+    )
+
+
+@router.get("/conflicts", response_model=list[ConflictResponse])
+async def audit_conflicts() -> list[ConflictResponse]:
+    """
+    Every pair of active schedules that book the same bus at the same time.
+
+    Reported from the in-memory interval index in one sweep per bus; use
+    it to find double bookings that predate conflict checks or that appeared
+    when a route got longer.
+    """
+    return [conflict_response(c) for c in schedule_conflicts.audit()]
+
+
+@router.get("/departures", response_model=list[DepartureResponse])
+async def list_departures(day: str | None = None,
+                          start: str | None = Query(None, alias="from"),
+                          end: str | None = Query(None, alias="to"),
+                          route_id: int | None = None) -> list[DepartureResponse]:
+    """
+    Departures on a day between two times, from the in-memory timetable.
+
+    `day` is a weekday name or 0-6 (Monday first) and defaults to today;
+    `from` and `to` accept "07:30", "7:30 AM" and default to the whole day.
+    """
+    departures = timetable.departures(
+        parse_day(day), parse_minute(start, 0), parse_minute(end, 24 * 60 - 1), route_id
+    )
     return [
-        ScheduleResponse(
-            id=1,
-            bus_number="BUS-001",
-            route_name="Route A - Main Campus",
-            departure_time="07:00 AM",
-            days_of_week=["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
-            status="active"
-        ),
-        ScheduleResponse(
-            id=2,
-            bus_number="BUS-002",
-            route_name="Route B - Hostel",
-            departure_time="08:00 AM",
-            days_of_week=["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
-            status="active"
+        DepartureResponse(
+            schedule_id=d.schedule_id,
+            route_id=d.route_id,
+            bus_id=d.bus_id,
+            departure_time=format_departure(d.minute),
+            departure_minute=d.minute
         )
+        for d in departures
     ]
 
 
+def stop_time_responses(db: Session, rows) -> list[StopTimeResponse]:
+    """Attach stop names to generated stop times."""
+    stop_ids = {row.stop_id for row in rows}
+    names = dict(db.query(RouteStop.id, RouteStop.stop_name).filter(RouteStop.id.in_(stop_ids))) if stop_ids else {}
+    return [
+        StopTimeResponse(
+            schedule_id=row.schedule_id,
+            stop_id=row.stop_id,
+            stop_name=names.get(row.stop_id, ""),
+            order=row.stop_order,
+            arrival_time=format_departure(row.arrival_minute),
+            arrival_minute=row.arrival_minute
+        )
+        for row in rows
+    ]
+
+
+@router.get("/stops/{stop_id}/arrivals", response_model=list[StopTimeResponse])
+async def list_stop_arrivals(stop_id: int, day: str | None = None,
+                             start: str | None = Query(None, alias="from"),
+                             end: str | None = Query(None, alias="to"),
+                             db: Session = Depends(get_db)) -> list[StopTimeResponse]:
+    """
+    Scheduled arrivals at a stop on a day between two times.
+
+    Served from the generated stop times with one indexed query; `day`,
+    `from` and `to` work as for `/schedules/departures`.
+    """
+    weekday, first, last = parse_day(day), parse_minute(start, 0), parse_minute(end, 24 * 60 - 1)
+    return await run_db(lambda: stop_time_responses(db, stop_times.arrivals(db, stop_id, weekday, first, last)))
+
+
+@router.get("/{schedule_id}/stops", response_model=list[StopTimeResponse])
+async def list_schedule_stops(schedule_id: int, db: Session = Depends(get_db)) -> list[StopTimeResponse]:
+    """When a schedule reaches each stop of its route."""
+    def load() -> list[StopTimeResponse] | None:
+        schedule = crud.get_schedule(db, schedule_id)
+        return stop_time_responses(db, schedule.stop_times) if schedule else None
+
+    response = await run_db(load)
+    if response is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Schedule not found")
+    return response
+
+
 @router.get("/{schedule_id}", response_model=ScheduleResponse)
-async def get_schedule(schedule_id: int) -> ScheduleResponse:
+async def get_schedule(schedule_id: int, db: Session = Depends(get_db)) -> ScheduleResponse:
     """Get a specific schedule."""
-    # TODO: Fetch from database
-    return ScheduleResponse(
-        id=schedule_id,
-        bus_number="BUS-001",
-        route_name="Route A - Main Campus",
-        departure_time="07:00 AM",
-        days_of_week=["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
-        status="active"
-    )
+    def load() -> ScheduleResponse | None:
+        schedule = crud.get_schedule(db, schedule_id)
+        return schedule_response(schedule) if schedule else None
+
+    response = await run_db(load)
+    if not response:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Schedule not found")
+    return response
+
+
+def check_references(db: Session, schedule: ScheduleCreate) -> None:
+    """Reject schedules naming a bus or route that does not exist."""
+    if not db.get(Bus, schedule.bus_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bus not found")
+    if not db.get(Route, schedule.route_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+
+
+def check_conflicts(db: Session, schedule: ScheduleCreate, schedule_status: str,
+                    schedule_id: int | None = None) -> None:
+    """Reject an active schedule whose bus is already booked while it runs."""
+    if schedule_status != "active":
+        return
+    try:
+        days_mask, minute = parse_days(schedule.days_of_week), parse_departure(schedule.departure_time)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    duration = schedule_conflicts.duration(stop_times.route_minutes(db, schedule.route_id))
+    conflicts = schedule_conflicts.check(schedule.bus_id, minute, days_mask, duration, schedule_id)
+    if conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Bus is already scheduled at that time",
+                "conflicts": [conflict_response(c).model_dump() for c in conflicts],
+            }
+        )
 
 
 @router.post("/", response_model=ScheduleResponse, status_code=status.HTTP_201_CREATED)
 async def create_schedule(schedule: ScheduleCreate) -> ScheduleResponse:
-    """Create a new bus schedule."""
-    # TODO: Save to database
-    return ScheduleResponse(
-        id=3,
-        bus_number=f"BUS-{schedule.bus_id:03d}",
-        route_name=f"Route-{schedule.route_id}",
-        departure_time=schedule.departure_time,
-        days_of_week=schedule.days_of_week,
-        status="active"
-    )
+    """Create a new bus schedule; 409 if its bus is already booked while it runs."""
+    def save(db: Session) -> ScheduleResponse:
+        check_references(db, schedule)
+        check_conflicts(db, schedule, schedule.status or "active")
+        try:
+            db_schedule = crud.create_schedule(
+                db, schedule.bus_id, schedule.route_id, schedule.departure_time,
+                schedule.days_of_week, schedule.status
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+        timetable.set(db_schedule)
+        schedule_conflicts.set(db_schedule)
+        broadcaster.refresh_buses(db, [db_schedule.bus_id])
+        return schedule_response(db_schedule)
+
+    response = await run_write(save)
+    response_cache.bump("schedules")
+    return response
+
+
+@router.put("/{schedule_id}", response_model=ScheduleResponse)
+async def update_schedule(schedule_id: int, schedule: ScheduleCreate) -> ScheduleResponse:
+    """Replace a schedule's bus, route, departure time and days; 409 on a double booking."""
+    def save(db: Session) -> ScheduleResponse | None:
+        db_schedule = crud.get_schedule(db, schedule_id)
+        if not db_schedule:
+            return None
+        check_references(db, schedule)
+        check_conflicts(db, schedule, schedule.status or db_schedule.status, schedule_id)
+        previous_bus_id = db_schedule.bus_id
+        try:
+            db_schedule = crud.update_schedule(
+                db, db_schedule, schedule.bus_id, schedule.route_id,
+                schedule.departure_time, schedule.days_of_week, schedule.status
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+        timetable.set(db_schedule)
+        schedule_conflicts.set(db_schedule)
+        broadcaster.refresh_buses(db, {previous_bus_id, db_schedule.bus_id})
+        return schedule_response(db_schedule)
+
+    response = await run_write(save)
+    if not response:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Schedule not found")
+    response_cache.bump("schedules")
+    return response
 
 
 @router.delete("/{schedule_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_schedule(schedule_id: int) -> None:
     """Delete a schedule."""
-    # TODO: Delete from database
-    pass
+    def remove(db: Session) -> bool:
+        bus_id = db.query(Schedule.bus_id).filter(Schedule.id == schedule_id).scalar()
+        if bus_id is None or not crud.delete_schedule(db, schedule_id):
+            return False
+        broadcaster.refresh_buses(db, [bus_id])
+        return True
+
+    if not await run_write(remove):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Schedule not found")
+    timetable.remove(schedule_id)
+    schedule_conflicts.remove(schedule_id)
+    response_cache.bump("schedules")
@@ -1,11 +1,20 @@
 """Student-facing endpoints."""
-from fastapi import APIRouter, HTTPException, status, Depends
+import asyncio
+
+from fastapi import APIRouter, HTTPException, status, Depends, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.core.security import verify_password
+from app.core.config import get_settings
+from app.core.database import get_db, run_db
+from app.core.tokens import Principal, token_authority
+from app.models.models import Student
 from app.services import crud
+from app.services.auth import authenticate, check_password, require_role
+from app.services.broadcast import broadcaster, Subscription
+from app.services.eta import eta_engine, format_eta
+from app.services.live_positions import live_positions
 
 router = APIRouter(prefix="/students", tags=["student"])
 
@@ -30,20 +39,21 @@ class BusTrackingInfo(BaseModel):
     current_location: dict
     estimated_arrival: str
     status: str
+    stop_etas: list[dict] = []
 
 
 @router.post("/login", response_model=StudentLoginResponse)
 async def student_login(credentials: StudentLoginRequest, db: Session = Depends(get_db)) -> StudentLoginResponse:
     """Authenticate student users."""
-    student = crud.get_student_by_email(db, credentials.email)
-    if not student or not verify_password(credentials.password, student.password):
+    student = await run_db(crud.get_student_by_email, db, credentials.email)
+    if not await check_password(Student, student, credentials.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
     return StudentLoginResponse(
-        access_token=f"student_token_{student.id}_{student.email}",
+        access_token=token_authority.issue(student.id, "student"),
         token_type="bearer",
         student={
             "id": student.id,
@@ -68,14 +78,166 @@ async def student_dashboard() -> dict:
     }
 
 
+async def student_route(db: Session, principal: Principal, route_id: int | None) -> int | None:
+    """Return a student's assigned route, refusing a `route_id` that is not it."""
+    student = await run_db(crud.get_student, db, principal.user_id)
+    if not student:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Student not found")
+    if route_id not in (None, student.route_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Route is not assigned to this student")
+    return student.route_id
+
+
 @router.get("/track-bus", response_model=BusTrackingInfo)
-async def track_bus() -> BusTrackingInfo:
-    """Get real-time bus location for the student's route."""
-    # TODO: Integrate with GPS tracking system
+async def track_bus(route_id: int | None = None, student_id: int | None = None,
+                    stop_id: int | None = None, db: Session = Depends(get_db),
+                    principal: Principal = Depends(require_role("student", "admin"))) -> BusTrackingInfo:
+    """
+    Get real-time bus location and ETAs for a route.
+
+    The route is taken from `route_id` or the student's assigned route;
+    students may only look up their own assignment, and a `route_id` they
+    pass must be that route.
+    `estimated_arrival` refers to `stop_id` if given, otherwise to the next
+    stop ahead of the bus; `stop_etas` lists every stop still to be reached.
+    """
+    if principal.role == "student":
+        if student_id not in (None, principal.user_id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token belongs to another student")
+        route_id = await student_route(db, principal, route_id)
+    elif route_id is None and student_id is not None:
+        student = await run_db(crud.get_student, db, student_id)
+        if not student:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Student not found")
+        route_id = student.route_id
+    if route_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No route to track")
+
+    positions = [p for p in map(live_positions.get, broadcaster.buses_for_route(route_id)) if p]
+    if not positions:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No live bus on this route")
+    position = max(positions, key=lambda p: p.timestamp)
+
+    geometry = await run_db(eta_engine.get_geometry, db, route_id)
+    if not geometry:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Route not found")
+    etas = eta_engine.estimate(geometry, position)
+
+    if stop_id is not None:
+        target = next((e for e in etas if e.stop_id == stop_id), None)
+        estimated_arrival = format_eta(target.eta_seconds) if target else "Departed"
+    else:
+        estimated_arrival = format_eta(etas[0].eta_seconds) if etas else "Arrived"
+
+    bus = await run_db(crud.get_bus, db, position.bus_id)
     return BusTrackingInfo(
-        bus_number="BUS-001",
-        route_name="Route A - Main Campus",
-        current_location={"lat": 11.0168, "lng": 76.9558},
-        estimated_arrival="10 minutes",
-        status="on_route"
+        bus_number=bus.bus_number if bus else str(position.bus_id),
+        route_name=geometry.route_name,
+        current_location={"lat": position.latitude, "lng": position.longitude},
+        estimated_arrival=estimated_arrival,
+        status="on_route" if etas else "arrived",
+        stop_etas=[e.to_dict() for e in etas]
+    )
+
+
+async def authorize_live(db: Session, principal: Principal, route_id: int | None,
+                         bus_id: int | None) -> tuple[int | None, int | None]:
+    """
+    Check what a live subscription may follow and return its (route_id, bus_id).
+
+    Students follow their assigned route, or a bus currently serving it;
+    without either they get their route. Admins may follow anything.
+    """
+    if principal.role == "student":
+        route = await student_route(db, principal, route_id)
+        if bus_id is None:
+            route_id = route
+        elif route is None or route not in broadcaster.routes_for_bus(bus_id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Bus does not serve this student's route")
+    if route_id is None and bus_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="route_id or bus_id is required")
+    return route_id, bus_id
+
+
+def open_subscription(route_id: int | None, bus_id: int | None) -> Subscription:
+    """Subscribe to a route or bus and queue the current positions as the first frames."""
+    subscription = broadcaster.subscribe(route_id=route_id, bus_id=bus_id)
+    if route_id is not None:
+        positions = [p for p in live_positions.all() if route_id in broadcaster.routes_for_bus(p.bus_id)]
+    else:
+        position = live_positions.get(bus_id)
+        positions = [position] if position else []
+    for position in positions:
+        subscription.offer(broadcaster.encode(position))
+    return subscription
+
+
+@router.websocket("/live")
+async def live_positions_socket(websocket: WebSocket, route_id: int | None = None,
+                                bus_id: int | None = None, token: str | None = None,
+                                db: Session = Depends(get_db)) -> None:
+    """
+    Push live positions for a route or bus over a WebSocket.
+
+    Browsers cannot set headers on a WebSocket, so the access token is
+    passed as the `token` query parameter.
+    """
+    try:
+        principal = authenticate(token, ("student", "admin"))
+        route_id, bus_id = await authorize_live(db, principal, route_id, bus_id)
+    except HTTPException as exc:
+        await websocket.close(code=1008, reason=exc.detail)
+        return
+    finally:
+        # The socket may stay open for hours; don't hold a read session for it.
+        db.close()
+
+    await websocket.accept()
+    subscription = open_subscription(route_id, bus_id)
+
+    async def pump() -> None:
+        while True:
+            await websocket.send_text(await subscription.get())
+
+    sender = asyncio.create_task(pump())
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        broadcaster.unsubscribe(subscription)
+
+
+@router.get("/live/stream")
+async def live_positions_stream(route_id: int | None = None, bus_id: int | None = None,
+                                db: Session = Depends(get_db),
+                                principal: Principal = Depends(require_role("student", "admin"))
+                                ) -> StreamingResponse:
+    """Server-Sent Events fallback for clients that cannot open a WebSocket."""
+    try:
+        route_id, bus_id = await authorize_live(db, principal, route_id, bus_id)
+    finally:
+        db.close()
+
+    keepalive = get_settings().live_stream_keepalive
+    subscription = open_subscription(route_id, bus_id)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscription.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {frame}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
@@ -0,0 +1,60 @@
+"""Measure password verification throughput and event loop stalls during a login burst."""
+import asyncio
+import sys
+import time
+
+from app.core.security import get_password_hash, password_hasher, verify_password
+
+
+async def _watch_loop(lags: list[float], interval: float = 0.005) -> None:
+    """Record how late the event loop wakes a sleeping task."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def burst(logins: int, offload: bool) -> dict:
+    """Verify `logins` passwords concurrently, on the hashing pool or on the event loop."""
+    stored = get_password_hash("benchmark-password")
+    if offload:
+        await password_hasher.verify("warm-up", stored)
+
+    async def login() -> float:
+        await asyncio.sleep(0)
+        if offload:
+            await password_hasher.verify("benchmark-password", stored)
+        else:
+            verify_password("benchmark-password", stored)
+        return time.perf_counter() - start
+
+    lags: list[float] = []
+    watcher = asyncio.create_task(_watch_loop(lags))
+    await asyncio.sleep(0)
+    start = time.perf_counter()  # latencies include time spent waiting for the loop or a worker
+    latencies = sorted(await asyncio.gather(*(login() for _ in range(logins))))
+    elapsed = time.perf_counter() - start
+    watcher.cancel()
+    return {
+        "logins_per_s": logins / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max_loop_lag_ms": max(lags, default=elapsed) * 1000,
+    }
+
+
+async def main(logins: int) -> None:
+    print(f"Verifying {logins} concurrent logins with {password_hasher.max_workers} hashing workers")
+    for label, offload in (("event loop", False), ("process pool", True)):
+        result = await burst(logins, offload)
+        print(f"{label:>12}: {result['logins_per_s']:.1f} logins/s, "
+              f"p50 {result['p50_ms']:.0f} ms, p95 {result['p95_ms']:.0f} ms, "
+              f"max loop lag {result['max_loop_lag_ms']:.0f} ms")
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print("Usage: python -m app.benchmark_login [LOGINS]")
+        sys.exit(1)
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) == 2 else 50))
@@ -1,5 +1,8 @@
 """Application configuration for TCE EduRide backend."""
+import secrets
 from functools import lru_cache
+
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -13,6 +16,77 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./tce_eduride.db"
+    db_access_mode: str = "threadpool"  # "threadpool" or "inline" (on the event loop)
+    db_pool_size: int = 4  # threads running database work for async endpoints
+    
+    # SQLite storage profile
+    sqlite_storage_profile: str = "tuned"  # "tuned" (WAL and pragmas below) or "default"
+    sqlite_synchronous: str = "NORMAL"  # durable at checkpoints; FULL syncs every commit
+    sqlite_cache_size_kb: int = 65536  # page cache per connection
+    sqlite_mmap_size: int = 268435456  # bytes of the file read through mmap
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_read_pool_size: int = 8  # read-only connections
+    write_queue_max_batch: int = 64  # queued writes handled per writer round
+    
+    # Live GPS tracking
+    location_flush_interval: float = 2.0  # seconds between bulk inserts
+    location_flush_batch_size: int = 500
+    location_queue_max_size: int = 10000
+    location_batch_max_points: int = 1000  # per POST /drivers/location/batch
+    location_seq_window: int = 4096  # recent client sequence numbers kept per driver
+    
+    # Location history partitions
+    location_partition_interval: str = "day"  # "day" or "week"
+    location_full_resolution_days: int = 7  # then one point per bus per minute
+    location_retention_days: int = 180  # older partitions are dropped
+    location_maintenance_interval: float = 3600.0  # seconds between maintenance runs
+    trajectory_archive_dir: str = "./archive"  # columnar bus-day trajectory files
+    live_subscriber_buffer: int = 8  # frames buffered per WebSocket/SSE client
+    live_stream_keepalive: float = 15.0  # seconds between SSE keepalive comments
+    
+    # ETA estimation (speeds in km/h)
+    eta_default_speed_kmh: float = 25.0
+    eta_min_speed_kmh: float = 5.0  # slower readings use the default speed
+    
+    # Response cache
+    response_cache_max_bytes: int = 8 * 1024 * 1024  # serialized catalogue bodies kept in memory
+    
+    # Per-stop timetables
+    timetable_dwell_seconds: int = 30  # time spent at each intermediate stop
+    schedule_turnaround_minutes: int = 10  # bus kept busy after reaching the last stop
+    schedule_default_duration_minutes: int = 60  # trip length assumed for routes without stops
+    
+    # Route stop-order optimizer
+    route_optimizer_time_budget_ms: int = 200  # search time per request
+    
+    # Student-to-route assignment
+    assignment_max_walk_m: float = 2000.0  # farthest a student is expected to walk to a stop
+    assignment_time_budget_ms: int = 5000  # repair time per run
+    
+    # Spatial index
+    spatial_cell_deg: float = 0.01  # grid cell size (~1.1 km)
+    
+    # Dashboard statistics
+    stats_reconcile_interval: float = 300.0  # seconds between full recounts
+    
+    # Password hashing (scrypt cost; n must be a power of two)
+    password_scrypt_n: int = 16384
+    password_scrypt_r: int = 8
+    password_scrypt_p: int = 1
+    password_hash_workers: int = 2  # processes in the hashing pool
+    
+    # Access tokens
+    # HMAC key signing access tokens. Unset, a random key is drawn at startup, so
+    # tokens stop verifying after a restart and differ between worker processes.
+    token_secret_key: str = Field(default_factory=lambda: secrets.token_urlsafe(32))
+    access_token_ttl: int = 43200  # seconds a token stays valid
+    token_cache_size: int = 4096  # decoded tokens kept in memory
+    
+    # Bulk CSV import
+    import_chunk_size: int = 500  # rows validated and inserted per round trip
+    
+    # Feedback analytics
+    feedback_recent_buffer: int = 50  # newest entries kept in memory
     
     # CORS
     cors_origins: list[str] = ["http://localhost:3000", "http://localhost:8081"]
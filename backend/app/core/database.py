@@ -1,37 +1,170 @@
 """Database configuration and session management."""
-from sqlalchemy import create_engine
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
+from app.core.write_queue import WriteQueue
 
 settings = get_settings()
 
-# Create SQLite engine
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
 
-# Create session factory
+def is_memory_database(url: str) -> bool:
+    """Return True for SQLite URLs that do not name a file."""
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def apply_storage_profile(engine: Engine, config: Settings, writer: bool) -> None:
+    """
+    Configure every new connection of an engine for the SQLite storage profile.
+
+    Writer connections switch the file to WAL, so readers keep reading the
+    last committed snapshot while the writer appends. They also take over
+    transaction control from pysqlite and open each transaction with BEGIN
+    IMMEDIATE, which makes SAVEPOINTs reliable and claims the write lock up
+    front. Reader connections are made read-only with query_only.
+    """
+    @event.listens_for(engine, "connect")
+    def configure(dbapi_connection, connection_record) -> None:
+        if writer:
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if config.sqlite_storage_profile == "tuned":
+            if writer:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={config.sqlite_synchronous}")
+            cursor.execute(f"PRAGMA cache_size=-{config.sqlite_cache_size_kb}")
+            cursor.execute(f"PRAGMA mmap_size={config.sqlite_mmap_size}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA busy_timeout={config.sqlite_busy_timeout_ms}")
+        if not writer:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    if writer:
+        @event.listens_for(engine, "begin")
+        def begin(connection) -> None:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+if is_memory_database(settings.database_url):
+    # One in-memory database shared by every session.
+    engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    read_engine = engine
+else:
+    # The only connection allowed to write.
+    engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},  # Needed for SQLite
+        pool_size=1,
+        max_overflow=0
+    )
+    apply_storage_profile(engine, settings, writer=True)
+    read_engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=0
+    )
+    apply_storage_profile(read_engine, settings, writer=False)
+
+# Create session factories: writes go through SessionLocal, request handlers read through ReadSessionLocal
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+write_queue = WriteQueue(SessionLocal, max_batch=settings.write_queue_max_batch)
+run_write = write_queue.run
+run_write_batched = write_queue.run_batched
 
 # Base class for models
 Base = declarative_base()
 
 
+class DatabaseExecutor:
+    """
+    Runs blocking database work for async endpoints.
+
+    In "threadpool" mode calls go to a bounded pool of dedicated threads, so
+    the event loop keeps serving other requests while one waits on SQLite;
+    the pool size also caps how many sessions are busy at once. In "inline"
+    mode calls run directly on the event loop.
+    """
+
+    def __init__(self, mode: str = "threadpool", max_workers: int = 4):
+        if mode not in ("threadpool", "inline"):
+            raise ValueError("mode must be 'threadpool' or 'inline'")
+        self.mode = mode
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call `fn(*args, **kwargs)` and return its result."""
+        if self.mode == "inline":
+            return fn(*args, **kwargs)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        return await asyncio.get_running_loop().run_in_executor(self._pool, partial(fn, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        """Wait for queued work and stop the pool threads."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+db_executor = DatabaseExecutor(mode=settings.db_access_mode, max_workers=settings.db_pool_size)
+run_db = db_executor.run
+
+
 def get_db():
-    """Dependency for getting database session."""
-    db = SessionLocal()
+    """Dependency for getting a read-only database session; writes go through `run_write`."""
+    db = ReadSessionLocal()
     try:
         yield db
     finally:
         db.close()
 
 
+def upgrade_schema(bind: Engine) -> list[str]:
+    """
+    Add columns and indexes that models gained after their table was created.
+
+    `create_all` only creates missing tables, so nullable columns added to an
+    existing model are appended with ALTER TABLE and its missing indexes are
+    created. Returns the added "table.column" names.
+    """
+    added = []
+    with bind.begin() as connection:
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+                    added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+    return added
+
+
 def init_db():
     """Initialize database tables and seed initial data."""
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
     
     # Seed default accounts
     from app.services.crud import (
@@ -1,11 +1,120 @@
-"""Security utilities for password verification."""
+"""Security utilities for password hashing and verification."""
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.core.config import get_settings
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, maxmem=2 * 128 * r * (n + p + 2), dklen=KEY_BYTES
+    )
+
+
+def hash_password(password: str, n: int, r: int, p: int) -> str:
+    """Return a salted scrypt hash encoded as `scrypt$n$r$p$salt$key`."""
+    salt = os.urandom(SALT_BYTES)
+    return f"{SCHEME}${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+
+
+def is_password_hash(stored_password: str) -> bool:
+    """Return True if a stored password is a hash rather than legacy plain text."""
+    return stored_password.startswith(f"{SCHEME}$")
 
 
 def verify_password(plain_password: str, stored_password: str) -> bool:
-    """Verify a password against stored password (plain text comparison)."""
-    return plain_password == stored_password
+    """
+    Verify a password against a stored hash.
+
+    Rows created before hashing was introduced still hold plain text; they
+    are compared in constant time and rehashed by the login endpoints.
+    """
+    if not is_password_hash(stored_password):
+        return hmac.compare_digest(plain_password.encode(), stored_password.encode())
+    try:
+        _, n, r, p, salt, key = stored_password.split("$")
+        expected = _unb64(key)
+        actual = _scrypt(plain_password, _unb64(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(stored_password: str) -> bool:
+    """Return True if a stored password is plain text or uses other cost parameters."""
+    if not is_password_hash(stored_password):
+        return True
+    settings = get_settings()
+    params = stored_password.split("$")[1:4]
+    return params != [str(settings.password_scrypt_n), str(settings.password_scrypt_r),
+                      str(settings.password_scrypt_p)]
 
 
 def get_password_hash(password: str) -> str:
-    """Return password as-is (no hashing)."""
-    return password
+    """Hash a password with the configured cost parameters."""
+    settings = get_settings()
+    return hash_password(password, settings.password_scrypt_n, settings.password_scrypt_r,
+                         settings.password_scrypt_p)
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification on a bounded process pool.
+
+    Each scrypt call costs tens of milliseconds of CPU, so running it on the
+    event loop would stall every other request during login bursts. Worker
+    processes are started with "spawn" because the API process runs
+    database threads that must not be forked.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured cost parameters."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), get_password_hash, password)
+
+    async def verify(self, plain_password: str, stored_password: str) -> bool:
+        """Verify a password against a stored hash."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor(), verify_password, plain_password, stored_password
+        )
+
+    def hash_many(self, passwords: list[str]) -> list[str]:
+        """Hash several passwords in parallel, blocking until all are done."""
+        return list(self._executor().map(get_password_hash, passwords, chunksize=8))
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+password_hasher = PasswordHasher(max_workers=get_settings().password_hash_workers)
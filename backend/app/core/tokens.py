@@ -0,0 +1,138 @@
+"""Stateless HMAC-signed access tokens."""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import get_settings
+
+
+class TokenError(Exception):
+    """Raised when a token is malformed, forged, expired or revoked."""
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The authenticated user a token was issued to."""
+    user_id: int
+    role: str  # "admin", "student" or "driver"
+    issued_at: int
+    expires_at: int
+    token_id: str
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class TokenAuthority:
+    """
+    Issues and verifies `payload.signature` tokens signed with HMAC-SHA256.
+
+    Verification needs no database: the payload carries the user id, role,
+    expiry and a random token id. Decoded principals are kept in a bounded
+    LRU cache, so a token seen before costs one dictionary lookup plus the
+    expiry and revocation checks. Revocations are held in memory: single
+    tokens by id until they expire, and every token of a user issued before
+    a cutoff, which is how deleted accounts are locked out.
+    """
+
+    def __init__(self, secret: str, ttl: int = 43200, cache_size: int = 4096):
+        self._key = secret.encode()
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, Principal] = OrderedDict()
+        self._revoked: dict[str, int] = {}  # token id -> expiry
+        self._cutoffs: dict[tuple[str, int], int] = {}  # (role, user id) -> issued-before time
+        self.hits = 0
+        self.misses = 0
+
+    def _sign(self, payload: str) -> str:
+        return _b64(hmac.new(self._key, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, user_id: int, role: str, now: Optional[float] = None) -> str:
+        """Return a signed token for a user."""
+        issued_at = int(time.time() if now is None else now)
+        payload = _b64(json.dumps(
+            {"sub": user_id, "role": role, "iat": issued_at, "exp": issued_at + self.ttl, "jti": os.urandom(8).hex()},
+            separators=(",", ":")
+        ).encode())
+        return f"{payload}.{self._sign(payload)}"
+
+    def _decode(self, token: str) -> Principal:
+        payload, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(signature, self._sign(payload)):
+            raise TokenError("Invalid token signature")
+        try:
+            claims = json.loads(_unb64(payload))
+            return Principal(
+                user_id=int(claims["sub"]),
+                role=str(claims["role"]),
+                issued_at=int(claims["iat"]),
+                expires_at=int(claims["exp"]),
+                token_id=str(claims["jti"]),
+            )
+        except (ValueError, KeyError, TypeError) as exc:
+            raise TokenError("Malformed token") from exc
+
+    def verify(self, token: str, now: Optional[float] = None) -> Principal:
+        """Return the principal of a valid token or raise TokenError."""
+        principal = self._cache.get(token)
+        if principal is None:
+            self.misses += 1
+            principal = self._decode(token)
+            self._cache[token] = principal
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self.hits += 1
+            self._cache.move_to_end(token)
+
+        if principal.expires_at <= (time.time() if now is None else now):
+            self._cache.pop(token, None)
+            raise TokenError("Token has expired")
+        if principal.token_id in self._revoked:
+            raise TokenError("Token has been revoked")
+        cutoff = self._cutoffs.get((principal.role, principal.user_id))
+        if cutoff is not None and principal.issued_at <= cutoff:
+            raise TokenError("Token has been revoked")
+        return principal
+
+    def revoke(self, principal: Principal) -> None:
+        """Reject one token until it expires."""
+        self._prune()
+        self._revoked[principal.token_id] = principal.expires_at
+
+    def revoke_user(self, role: str, user_id: int, now: Optional[float] = None) -> None:
+        """Reject every token issued to a user so far."""
+        self._prune()
+        self._cutoffs[(role, user_id)] = int(time.time() if now is None else now)
+
+    def _prune(self) -> None:
+        """Forget revocations that only cover tokens which have expired anyway."""
+        now = time.time()
+        self._revoked = {token_id: expiry for token_id, expiry in self._revoked.items() if expiry > now}
+        self._cutoffs = {user: cutoff for user, cutoff in self._cutoffs.items() if cutoff + self.ttl > now}
+
+    def stats(self) -> dict:
+        """Return cache and revocation counters."""
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revoked_tokens": len(self._revoked),
+            "revoked_users": len(self._cutoffs),
+        }
+
+
+settings = get_settings()
+token_authority = TokenAuthority(settings.token_secret_key, settings.access_token_ttl, settings.token_cache_size)
@@ -0,0 +1,159 @@
+"""Single-writer queue for database writes."""
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from sqlalchemy.orm import Session, sessionmaker
+
+
+class WriteJob:
+    """A write waiting for the writer thread."""
+    __slots__ = ("fn", "args", "kwargs", "batched", "future")
+
+    def __init__(self, fn: Callable[..., Any], args: tuple, kwargs: dict, batched: bool):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.batched = batched
+        self.future: Future = Future()
+
+
+class WriteQueue:
+    """
+    Funnels every write through one thread and one database connection.
+
+    Jobs are callables taking a session as their first argument. A plain
+    job runs in its own transaction, which is committed when it returns if
+    it did not commit itself. Consecutive batched jobs, such as GPS inserts
+    from many drivers, share one transaction: each runs inside a SAVEPOINT
+    so a failing job is rolled back alone, and the group is committed once.
+
+    Sessions do not expire on commit and are emptied after every job, so
+    returned ORM objects are detached but keep their loaded attributes.
+    """
+
+    def __init__(self, session_factory: sessionmaker, max_batch: int = 64):
+        self._session_factory = session_factory
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.jobs = 0
+        self.commits = 0
+
+    # Submitting
+    def submit(self, fn: Callable[..., Any], *args, batched: bool = False, **kwargs) -> Future:
+        """Queue `fn(session, *args, **kwargs)` and return a future for its result."""
+        job = WriteJob(fn, args, kwargs, batched)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="db-writer", daemon=True)
+                self._thread.start()
+            self._queue.put(job)
+        return job.future
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Await a write in its own transaction."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def run_batched(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Await a write that may share a transaction with other batched writes; `fn` must not commit."""
+        return await asyncio.wrap_future(self.submit(fn, *args, batched=True, **kwargs))
+
+    def shutdown(self) -> None:
+        """Finish queued writes and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def stats(self) -> dict:
+        """Return queue depth and throughput counters."""
+        return {"queued": self._queue.qsize(), "jobs": self.jobs, "commits": self.commits}
+
+    # Writer thread
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            jobs = [job]
+            stop = False
+            while len(jobs) < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                jobs.append(job)
+            self._process(jobs)
+            if stop:
+                return
+
+    def _process(self, jobs: list[WriteJob]) -> None:
+        session = self._session_factory(expire_on_commit=False)
+        try:
+            group: list[WriteJob] = []
+            for job in jobs:
+                if job.batched:
+                    group.append(job)
+                    continue
+                self._run_group(session, group)
+                group = []
+                self._run_single(session, job)
+            self._run_group(session, group)
+        finally:
+            session.close()
+        self.jobs += len(jobs)
+
+    def _run_single(self, session: Session, job: WriteJob) -> None:
+        if not job.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = job.fn(session, *job.args, **job.kwargs)
+            session.commit()
+        except Exception as exc:
+            session.rollback()
+            job.future.set_exception(exc)
+        else:
+            self.commits += 1
+            job.future.set_result(result)
+        finally:
+            session.expunge_all()
+
+    def _run_group(self, session: Session, group: list[WriteJob]) -> None:
+        if not group:
+            return
+        done = []
+        for job in group:
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            try:
+                with session.begin_nested():
+                    result = job.fn(session, *job.args, **job.kwargs)
+            except Exception as exc:
+                job.future.set_exception(exc)
+            else:
+                done.append((job, result))
+        if not done:
+            session.rollback()
+            return
+
+        try:
+            session.commit()
+        except Exception as exc:
+            session.rollback()
+            for job, _ in done:
+                job.future.set_exception(exc)
+            return
+        finally:
+            session.expunge_all()
+        self.commits += 1
+        for job, result in done:
+            job.future.set_result(result)
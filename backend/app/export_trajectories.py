@@ -0,0 +1,30 @@
+"""Export location history into the columnar trajectory archive."""
+import sys
+from datetime import date, timedelta
+
+from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.services.trajectory_archive import export_day
+
+
+def export_range(start: date, end: date) -> None:
+    """Export every day from `start` to `end` inclusive."""
+    directory = get_settings().trajectory_archive_dir
+    db = SessionLocal()
+    try:
+        day = start
+        while day <= end:
+            path = export_day(db, day, directory)
+            print(f"✅ Exported {day.isoformat()} -> {path}")
+            day += timedelta(days=1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python -m app.export_trajectories START_DATE [END_DATE]")
+        sys.exit(1)
+    first = date.fromisoformat(sys.argv[1])
+    last = date.fromisoformat(sys.argv[2]) if len(sys.argv) == 3 else first
+    export_range(first, last)
@@ -3,8 +3,19 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import get_settings
-from app.core.database import init_db
-from app.api.routes import admin, bus, driver, feedback, route, schedule, student
+from app.core.database import SessionLocal, db_executor, init_db, write_queue
+from app.core.security import password_hasher
+from app.api.routes import admin, auth, bus, driver, feedback, route, schedule, student
+from app.services.broadcast import broadcaster
+from app.services import feedback_search
+from app.services.feedback_analytics import feedback_analytics
+from app.services.live_positions import live_positions
+from app.services.location_history import location_history
+from app.services.spatial_index import spatial_index
+from app.services.stats import dashboard_stats
+from app.services.schedule_conflicts import schedule_conflicts
+from app.services.stop_times import stop_times
+from app.services.timetable import migrate_schedules, timetable
 
 settings = get_settings()
 
@@ -22,6 +33,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 
@@ -30,9 +42,40 @@ async def startup_event():
     """Initialize database on startup."""
     init_db()
     print("✅ Database initialized successfully!")
+    db = SessionLocal()
+    try:
+        broadcaster.refresh_bus_routes(db)
+        spatial_index.load(db)
+        location_history.adopt_legacy(db)
+        dashboard_stats.reconcile(db)
+        feedback_analytics.load(db)
+        feedback_search.ensure_index(db)
+        compiled, invalid = migrate_schedules(db)
+        if compiled or invalid:
+            print(f"✅ Compiled {compiled} schedules" + (f"; unparseable: {invalid}" if invalid else ""))
+        timetable.load(db)
+        stop_times.generate_missing(db)
+        schedule_conflicts.load(db)
+    finally:
+        db.close()
+    live_positions.start()
+    location_history.start()
+    dashboard_stats.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered GPS points before exiting."""
+    await live_positions.stop()
+    await location_history.stop()
+    await dashboard_stats.stop()
+    db_executor.shutdown()
+    write_queue.shutdown()
+    password_hasher.shutdown()
 
 # Include API routers
 app.include_router(admin.router, prefix=settings.api_v1_prefix)
+app.include_router(auth.router, prefix=settings.api_v1_prefix)
 app.include_router(bus.router, prefix=settings.api_v1_prefix)
 app.include_router(route.router, prefix=settings.api_v1_prefix)
 app.include_router(schedule.router, prefix=settings.api_v1_prefix)
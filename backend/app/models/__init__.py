@@ -7,8 +7,12 @@ from app.models.models import (
     Route,
     RouteStop,
     Schedule,
+    ScheduleStopTime,
+    SegmentSpeed,
     Feedback,
-    Location
+    FeedbackDailyRollup,
+    Location,
+    LocationPartition
 )
 
 __all__ = [
@@ -19,6 +23,10 @@ __all__ = [
     "Route",
     "RouteStop",
     "Schedule",
+    "ScheduleStopTime",
+    "SegmentSpeed",
     "Feedback",
-    "Location"
+    "FeedbackDailyRollup",
+    "Location",
+    "LocationPartition"
 ]
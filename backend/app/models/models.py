@@ -1,6 +1,6 @@
 """Database models for TCE EduRide."""
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -28,6 +28,8 @@ class Student(Base):
     phone = Column(String(15), nullable=False)
     password = Column(String(255), nullable=False)
     route_id = Column(Integer, ForeignKey("routes.id"), nullable=True)
+    home_latitude = Column(Float, nullable=True)  # used to assign a route near home
+    home_longitude = Column(Float, nullable=True)
     status = Column(String(20), default="active")
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -77,7 +79,9 @@ class Route(Base):
     status = Column(String(20), default="active")
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    stops = relationship("RouteStop", back_populates="route", cascade="all, delete-orphan")
+    stops = relationship(
+        "RouteStop", back_populates="route", cascade="all, delete-orphan", order_by="RouteStop.order"
+    )
     students = relationship("Student", back_populates="route")
     schedules = relationship("Schedule", back_populates="route")
 
@@ -105,11 +109,54 @@ class Schedule(Base):
     route_id = Column(Integer, ForeignKey("routes.id"), nullable=False)
     departure_time = Column(String(20), nullable=False)
     days_of_week = Column(String(100), nullable=False)  # Comma-separated
+    days_mask = Column(Integer, nullable=True)  # bit 0 = Monday ... bit 6 = Sunday
+    departure_minute = Column(Integer, nullable=True)  # minutes after midnight
     status = Column(String(20), default="active")
     created_at = Column(DateTime, default=datetime.utcnow)
 
     bus = relationship("Bus", back_populates="schedules")
     route = relationship("Route", back_populates="schedules")
+    stop_times = relationship(
+        "ScheduleStopTime", cascade="all, delete-orphan", order_by="ScheduleStopTime.stop_order"
+    )
+
+    __table_args__ = (
+        Index("ix_schedules_departure_minute_days_mask", "departure_minute", "days_mask"),
+        Index("ix_schedules_days_mask", "days_mask"),
+    )
+
+
+class ScheduleStopTime(Base):
+    """
+    Generated arrival time of a schedule at one of its route's stops.
+
+    `arrival_minute` counts from midnight of the departure day and may pass
+    1440 for trips running past midnight; `days_mask` is copied from the
+    schedule so arrivals at a stop are found with one indexed query.
+    """
+    __tablename__ = "schedule_stop_times"
+
+    id = Column(Integer, primary_key=True)
+    schedule_id = Column(Integer, ForeignKey("schedules.id"), nullable=False)
+    stop_id = Column(Integer, ForeignKey("route_stops.id"), nullable=False)
+    stop_order = Column(Integer, nullable=False)
+    arrival_minute = Column(Integer, nullable=False)
+    days_mask = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_schedule_stop_times_schedule_id", "schedule_id"),
+        Index("ix_schedule_stop_times_stop_id_arrival_minute", "stop_id", "arrival_minute"),
+    )
+
+
+class SegmentSpeed(Base):
+    """Configured or historically measured speed between two consecutive stops."""
+    __tablename__ = "segment_speeds"
+
+    from_stop_id = Column(Integer, ForeignKey("route_stops.id"), primary_key=True)
+    to_stop_id = Column(Integer, ForeignKey("route_stops.id"), primary_key=True)
+    speed_kmh = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
 class Feedback(Base):
@@ -126,8 +173,24 @@ class Feedback(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class FeedbackDailyRollup(Base):
+    """Feedback count and rating sum per day, category and user type."""
+    __tablename__ = "feedback_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    category = Column(String(50), primary_key=True)
+    user_type = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+
+
 class Location(Base):
-    """Real-time location tracking model."""
+    """
+    Real-time location tracking model.
+
+    Unpartitioned legacy table; new points are stored in per-period
+    partitions listed in `location_partitions`.
+    """
     __tablename__ = "locations"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -137,3 +200,18 @@ class Location(Base):
     longitude = Column(Float, nullable=False)
     speed = Column(Float, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        Index("ix_locations_bus_id_timestamp", "bus_id", "timestamp"),
+    )
+
+
+class LocationPartition(Base):
+    """Registry of time-partitioned location tables."""
+    __tablename__ = "location_partitions"
+
+    name = Column(String(50), primary_key=True)
+    period_start = Column(DateTime, nullable=False, index=True)
+    period_end = Column(DateTime, nullable=False, index=True)
+    downsampled = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,69 @@
+"""Login helpers and access token dependencies shared by the API routers."""
+from typing import Callable, Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.core.database import run_write
+from app.core.security import needs_rehash, password_hasher
+from app.core.tokens import Principal, TokenError, token_authority
+from app.services import crud
+
+bearer = HTTPBearer(auto_error=False)
+
+
+async def check_password(model, user: Optional[object], password: str) -> bool:
+    """
+    Verify a login password on the hashing pool.
+
+    Plain-text rows and hashes made with older cost parameters are rehashed
+    with the current ones after a successful login.
+    """
+    if user is None or not await password_hasher.verify(password, user.password):
+        return False
+    if needs_rehash(user.password):
+        await run_write(crud.set_password_hash, model, user.id, await password_hasher.hash(password))
+    return True
+
+
+def authenticate(token: str | None, roles: tuple[str, ...] = ()) -> Principal:
+    """
+    Resolve a raw access token to a Principal.
+
+    Missing or invalid tokens raise 401; tokens of a role not in `roles`
+    raise 403. Used directly where a token cannot travel in a header, such
+    as WebSocket query parameters.
+    """
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    try:
+        principal = token_authority.verify(token)
+    except TokenError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(exc),
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    if roles and principal.role not in roles:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed for this role")
+    return principal
+
+
+def require_role(*roles: str) -> Callable:
+    """
+    Return a dependency resolving the bearer token to a Principal.
+
+    Tokens are verified from their signature and the in-memory cache, so
+    authenticated endpoints never query the database for it. Missing or
+    invalid tokens get 401; tokens of a role not in `roles` get 403.
+    """
+    async def current_principal(
+        credentials: HTTPAuthorizationCredentials | None = Depends(bearer)
+    ) -> Principal:
+        return authenticate(credentials.credentials if credentials else None, roles)
+
+    return current_principal
@@ -0,0 +1,144 @@
+"""Fan-out of live bus positions to WebSocket and SSE subscribers."""
+import asyncio
+import json
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Schedule
+from app.services.live_positions import BusPosition
+
+
+class Subscription:
+    """A single subscriber with a small bounded frame buffer."""
+    __slots__ = ("key", "queue", "dropped")
+
+    def __init__(self, key: tuple[str, int], max_frames: int):
+        self.key = key
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_frames)
+        self.dropped = 0
+
+    def offer(self, frame: str) -> None:
+        """Queue a frame, discarding the stalest one if the buffer is full."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+    async def get(self) -> str:
+        """Wait for the next frame."""
+        return await self.queue.get()
+
+
+class PositionBroadcaster:
+    """
+    Routes live position updates to subscribers keyed by route or bus.
+
+    Each update is serialized once and the same frame is handed to every
+    interested subscriber. Subscribers that fall behind lose their oldest
+    frames instead of growing their buffer.
+    """
+
+    def __init__(self, max_frames: int = 8):
+        self.max_frames = max_frames
+        self._subscribers: dict[tuple[str, int], set[Subscription]] = {}
+        self._bus_routes: dict[int, set[int]] = {}
+        self.published = 0
+
+    def subscribe(self, route_id: Optional[int] = None, bus_id: Optional[int] = None) -> Subscription:
+        """Register a subscriber for a route or a single bus."""
+        key = ("route", route_id) if route_id is not None else ("bus", bus_id)
+        subscription = Subscription(key, self.max_frames)
+        self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscriber."""
+        subscribers = self._subscribers.get(subscription.key)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.key]
+
+    def set_bus_routes(self, bus_id: int, route_ids: set[int]) -> None:
+        """Set the routes a bus serves."""
+        if route_ids:
+            self._bus_routes[bus_id] = set(route_ids)
+        else:
+            self._bus_routes.pop(bus_id, None)
+
+    def routes_for_bus(self, bus_id: int) -> set[int]:
+        """Return the routes a bus serves."""
+        return self._bus_routes.get(bus_id, set())
+
+    def buses_for_route(self, route_id: int) -> list[int]:
+        """Return the buses serving a route."""
+        return [bus_id for bus_id, routes in self._bus_routes.items() if route_id in routes]
+
+    def refresh_buses(self, db: Session, bus_ids) -> None:
+        """Re-read the routes of some buses, such as after a schedule write."""
+        routes: dict[int, set[int]] = {bus_id: set() for bus_id in bus_ids}
+        rows = (
+            db.query(Schedule.bus_id, Schedule.route_id)
+            .filter(Schedule.status == "active", Schedule.bus_id.in_(routes))
+            .distinct()
+        )
+        for bus_id, route_id in rows:
+            routes[bus_id].add(route_id)
+        # Swapped in whole, as readers on the event loop iterate the mapping.
+        bus_routes = {bus_id: route_ids for bus_id, route_ids in self._bus_routes.items() if bus_id not in routes}
+        bus_routes.update((bus_id, route_ids) for bus_id, route_ids in routes.items() if route_ids)
+        self._bus_routes = bus_routes
+
+    def refresh_bus_routes(self, db: Session) -> None:
+        """Reload the bus-to-route mapping from active schedules."""
+        bus_routes: dict[int, set[int]] = {}
+        rows = (
+            db.query(Schedule.bus_id, Schedule.route_id)
+            .filter(Schedule.status == "active")
+            .distinct()
+        )
+        for bus_id, route_id in rows:
+            bus_routes.setdefault(bus_id, set()).add(route_id)
+        self._bus_routes = bus_routes
+
+    def publish(self, position: BusPosition) -> int:
+        """Send a position to every matching subscriber; return the fan-out count."""
+        targets = [("bus", position.bus_id)]
+        targets.extend(("route", route_id) for route_id in self.routes_for_bus(position.bus_id))
+
+        frame = None
+        delivered = 0
+        for key in targets:
+            subscribers = self._subscribers.get(key)
+            if not subscribers:
+                continue
+            if frame is None:
+                frame = self.encode(position)
+            for subscription in subscribers:
+                subscription.offer(frame)
+                delivered += 1
+        self.published += 1
+        return delivered
+
+    def encode(self, position: BusPosition) -> str:
+        """Serialize a position as a JSON frame."""
+        payload = position.to_dict()
+        payload["type"] = "position"
+        payload["route_ids"] = sorted(self.routes_for_bus(position.bus_id))
+        return json.dumps(payload, separators=(",", ":"))
+
+    def stats(self) -> dict:
+        """Return subscriber and delivery counters."""
+        subscriptions = [s for group in self._subscribers.values() for s in group]
+        return {
+            "channels": len(self._subscribers),
+            "subscribers": len(subscriptions),
+            "published": self.published,
+            "dropped_frames": sum(s.dropped for s in subscriptions),
+        }
+
+
+broadcaster = PositionBroadcaster(max_frames=get_settings().live_subscriber_buffer)
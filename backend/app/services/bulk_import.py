@@ -0,0 +1,206 @@
+"""Bulk CSV import of student and driver accounts."""
+import asyncio
+import csv
+import io
+from dataclasses import dataclass
+from itertools import islice
+from typing import BinaryIO, Iterator
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.core.security import password_hasher
+from app.models.models import Bus, Driver, Route, Student
+from app.services.stats import dashboard_stats
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    """Columns and constraints of one importable model."""
+    model: type
+    required: tuple[str, ...]
+    unique: tuple[str, ...]
+    reference: tuple[str, type]  # optional foreign key column and its model
+    coordinates: tuple[str, str] | None = None  # optional latitude and longitude columns
+
+
+STUDENTS = ImportSpec(
+    model=Student,
+    required=("name", "email", "roll_number", "phone", "password"),
+    unique=("email", "roll_number"),
+    reference=("route_id", Route),
+    coordinates=("home_latitude", "home_longitude"),
+)
+
+DRIVERS = ImportSpec(
+    model=Driver,
+    required=("name", "email", "phone", "license_number", "password"),
+    unique=("email", "license_number"),
+    reference=("bus_id", Bus),
+)
+
+
+def read_rows(file: BinaryIO) -> Iterator[tuple[int, dict]]:
+    """Yield (line number, row) pairs of an uploaded CSV file as it is read."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    finally:
+        text.detach()
+
+
+class BulkImport:
+    """
+    Validates CSV rows a chunk at a time on a read session, then inserts the
+    valid ones in one write transaction.
+
+    Each chunk costs one query per unique column and one for the referenced
+    ids, whatever its size. Passwords are hashed between the two phases on
+    the password hashing pool, so the writer only runs one executemany per
+    chunk. Since other writes may land in between, the writer repeats the
+    database checks for the valid rows and reports any that now conflict.
+    Rows that fail validation are reported and skipped; dry runs stop after
+    validating.
+    """
+
+    def __init__(self, spec: ImportSpec, chunk_size: int = 500):
+        self.spec = spec
+        self.chunk_size = chunk_size
+        self.valid = 0
+        self.errors: list[dict] = []
+        self.chunks: list[list[tuple[int, dict]]] = []  # valid (line number, row) pairs
+        self._seen: dict[str, set] = {column: set() for column in spec.unique}
+
+    def _parse(self, raw: dict) -> tuple[dict, list[str]]:
+        problems = []
+        row = {}
+        for column in self.spec.required:
+            value = (raw.get(column) or "").strip()
+            if not value:
+                problems.append(f"{column} is required")
+            row[column] = value
+        if row.get("email") and "@" not in row["email"]:
+            problems.append("email is invalid")
+
+        column = self.spec.reference[0]
+        value = (raw.get(column) or "").strip()
+        row[column] = None
+        if value:
+            try:
+                row[column] = int(value)
+            except ValueError:
+                problems.append(f"{column} must be an integer")
+
+        if self.spec.coordinates:
+            problems.extend(self._parse_coordinates(raw, row))
+        return row, problems
+
+    def _parse_coordinates(self, raw: dict, row: dict) -> list[str]:
+        latitude, longitude = self.spec.coordinates
+        problems = []
+        for column, limit in ((latitude, 90.0), (longitude, 180.0)):
+            value = (raw.get(column) or "").strip()
+            row[column] = None
+            if not value:
+                continue
+            try:
+                row[column] = float(value)
+            except ValueError:
+                problems.append(f"{column} must be a number")
+                continue
+            if not -limit <= row[column] <= limit:
+                problems.append(f"{column} is out of range")
+        if not problems and (row[latitude] is None) != (row[longitude] is None):
+            problems.append(f"{latitude} and {longitude} go together")
+        return problems
+
+    def _lookup(self, db: Session, rows: list[dict]) -> tuple[dict[str, set], set]:
+        """Return the rows' unique values already stored, and their referenced ids that exist."""
+        taken = {}
+        for column in self.spec.unique:
+            values = {row[column] for row in rows if row[column]}
+            attribute = getattr(self.spec.model, column)
+            taken[column] = set(db.scalars(select(attribute).where(attribute.in_(values)))) if values else set()
+
+        column, target = self.spec.reference
+        ids = {row[column] for row in rows if row[column] is not None}
+        known = set(db.scalars(select(target.id).where(target.id.in_(ids)))) if ids else set()
+        return taken, known
+
+    def _conflicts(self, row: dict, taken: dict[str, set], known: set) -> list[str]:
+        problems = [f"{unique} already exists" for unique in self.spec.unique if row[unique] in taken[unique]]
+        column = self.spec.reference[0]
+        if row[column] is not None and row[column] not in known:
+            problems.append(f"{column} {row[column]} does not exist")
+        return problems
+
+    def _check_chunk(self, db: Session, chunk: list[tuple[int, dict]]) -> list[tuple[int, dict]]:
+        parsed = [(line, *self._parse(raw)) for line, raw in chunk]
+        taken, known = self._lookup(db, [row for _, row, _ in parsed])
+
+        valid = []
+        for line, row, problems in parsed:
+            for unique in self.spec.unique:
+                if row[unique] in self._seen[unique]:
+                    problems.append(f"{unique} is duplicated in the file")
+            problems.extend(self._conflicts(row, taken, known))
+            if problems:
+                self.errors.append({"row": line, "errors": problems})
+                continue
+            for unique in self.spec.unique:
+                self._seen[unique].add(row[unique])
+            valid.append((line, row))
+        return valid
+
+    def validate(self, db: Session, rows: Iterator[tuple[int, dict]]) -> None:
+        """Check every row against the file and the database without writing."""
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            valid = self._check_chunk(db, chunk)
+            if valid:
+                self.chunks.append(valid)
+            self.valid += len(valid)
+
+    async def hash_passwords(self) -> None:
+        """Replace the passwords of valid rows with their hashes, a chunk at a time."""
+        for chunk in self.chunks:
+            hashes = await asyncio.gather(*(password_hasher.hash(row["password"]) for _, row in chunk))
+            for (_, row), password_hash in zip(chunk, hashes):
+                row["password"] = password_hash
+
+    def insert(self, db: Session) -> None:
+        """Insert the validated rows that still pass the database checks, and commit."""
+        inserted = []
+        try:
+            for chunk in self.chunks:
+                taken, known = self._lookup(db, [row for _, row in chunk])
+                rows = []
+                for line, row in chunk:
+                    problems = self._conflicts(row, taken, known)
+                    if problems:
+                        self.errors.append({"row": line, "errors": problems})
+                        self.valid -= 1
+                    else:
+                        rows.append(row)
+                if rows:
+                    db.execute(insert(self.spec.model), rows)
+                    inserted.extend(rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if inserted:
+            dashboard_stats.record_inserted(self.spec.model, inserted)
+
+    def report(self, dry_run: bool = False) -> dict:
+        """Return counts and the problems of each rejected row."""
+        return {
+            "imported": 0 if dry_run else self.valid,
+            "valid": self.valid,
+            "failed": len(self.errors),
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
@@ -1,9 +1,19 @@
 """CRUD operations for database models."""
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import Optional
 
 from app.models.models import Admin, Student, Driver, Bus, Route, RouteStop, Schedule, Feedback
 from app.core.security import get_password_hash
+from app.services.feedback_analytics import feedback_analytics
+from app.services.location_history import location_history
+from app.services.pagination import keyset_page
+from app.services.stop_times import delete_segment_speeds, stop_times
+from app.services.timetable import days_from_mask, format_departure, parse_days, parse_departure
+
+
+def export_query(db: Session, model):
+    """Query every row of a model in id order, for streamed exports."""
+    return db.query(model).order_by(model.id)
 
 
 # Admin CRUD
@@ -22,10 +32,23 @@ def create_admin(db: Session, username: str, password: str, name: str) -> Admin:
     return admin
 
 
+def set_password_hash(db: Session, model, user_id: int, password_hash: str) -> None:
+    """Store a new password hash for an admin, student or driver."""
+    db.query(model).filter(model.id == user_id).update(
+        {model.password: password_hash}, synchronize_session=False
+    )
+    db.commit()
+
+
 # Student CRUD
-def get_students(db: Session, skip: int = 0, limit: int = 100):
-    """Get all students."""
-    return db.query(Student).offset(skip).limit(limit).all()
+def get_students(db: Session, after_id: Optional[int] = None, limit: Optional[int] = 100):
+    """Get a page of students ordered by id, and the id to continue after."""
+    return keyset_page(db.query(Student), Student.id, after_id, limit)
+
+
+def get_student(db: Session, student_id: int) -> Optional[Student]:
+    """Get student by ID."""
+    return db.query(Student).filter(Student.id == student_id).first()
 
 
 def get_student_by_email(db: Session, email: str) -> Optional[Student]:
@@ -34,16 +57,20 @@ def get_student_by_email(db: Session, email: str) -> Optional[Student]:
 
 
 def create_student(db: Session, name: str, email: str, roll_number: str, 
-                   phone: str, password: str, route_id: Optional[int] = None) -> Student:
-    """Create a new student."""
-    hashed_password = get_password_hash(password)
+                   phone: str, password: Optional[str] = None, route_id: Optional[int] = None,
+                   password_hash: Optional[str] = None, home_latitude: Optional[float] = None,
+                   home_longitude: Optional[float] = None) -> Student:
+    """Create a new student; pass `password_hash` if it was hashed elsewhere."""
+    hashed_password = password_hash or get_password_hash(password)
     student = Student(
         name=name,
         email=email,
         roll_number=roll_number,
         phone=phone,
         password=hashed_password,
-        route_id=route_id
+        route_id=route_id,
+        home_latitude=home_latitude,
+        home_longitude=home_longitude
     )
     db.add(student)
     db.commit()
@@ -62,9 +89,14 @@ def delete_student(db: Session, student_id: int) -> bool:
 
 
 # Driver CRUD
-def get_drivers(db: Session, skip: int = 0, limit: int = 100):
-    """Get all drivers."""
-    return db.query(Driver).offset(skip).limit(limit).all()
+def get_drivers(db: Session, after_id: Optional[int] = None, limit: Optional[int] = 100):
+    """Get a page of drivers ordered by id, and the id to continue after."""
+    return keyset_page(db.query(Driver), Driver.id, after_id, limit)
+
+
+def get_driver(db: Session, driver_id: int) -> Optional[Driver]:
+    """Get driver by ID."""
+    return db.query(Driver).filter(Driver.id == driver_id).first()
 
 
 def get_driver_by_email(db: Session, email: str) -> Optional[Driver]:
@@ -73,9 +105,10 @@ def get_driver_by_email(db: Session, email: str) -> Optional[Driver]:
 
 
 def create_driver(db: Session, name: str, email: str, phone: str, 
-                  license_number: str, password: str, bus_id: Optional[int] = None) -> Driver:
-    """Create a new driver."""
-    hashed_password = get_password_hash(password)
+                  license_number: str, password: Optional[str] = None, bus_id: Optional[int] = None,
+                  password_hash: Optional[str] = None) -> Driver:
+    """Create a new driver; pass `password_hash` if it was hashed elsewhere."""
+    hashed_password = password_hash or get_password_hash(password)
     driver = Driver(
         name=name,
         email=email,
@@ -101,9 +134,9 @@ def delete_driver(db: Session, driver_id: int) -> bool:
 
 
 # Bus CRUD
-def get_buses(db: Session, skip: int = 0, limit: int = 100):
-    """Get all buses."""
-    return db.query(Bus).offset(skip).limit(limit).all()
+def get_buses(db: Session, after_id: Optional[int] = None, limit: Optional[int] = 100):
+    """Get a page of buses ordered by id, and the id to continue after."""
+    return keyset_page(db.query(Bus), Bus.id, after_id, limit)
 
 
 def get_bus(db: Session, bus_id: int) -> Optional[Bus]:
@@ -137,9 +170,13 @@ def delete_bus(db: Session, bus_id: int) -> bool:
 
 
 # Route CRUD
-def get_routes(db: Session, skip: int = 0, limit: int = 100):
-    """Get all routes."""
-    return db.query(Route).offset(skip).limit(limit).all()
+def get_routes(db: Session, after_id: Optional[int] = None, limit: Optional[int] = 100):
+    """
+    Get a page of routes ordered by id, and the id to continue after.
+
+    Stops are loaded for the whole page in one extra query.
+    """
+    return keyset_page(db.query(Route).options(selectinload(Route.stops)), Route.id, after_id, limit)
 
 
 def get_route(db: Session, route_id: int) -> Optional[Route]:
@@ -147,61 +184,179 @@ def get_route(db: Session, route_id: int) -> Optional[Route]:
     return db.query(Route).filter(Route.id == route_id).first()
 
 
-def create_route(db: Session, route_name: str, description: str) -> Route:
-    """Create a new route."""
+STOP_FIELDS = ("stop_name", "latitude", "longitude", "order")
+
+
+def create_route(db: Session, route_name: str, description: str, stops: list[dict] = ()) -> Route:
+    """Create a new route and its stops in one transaction."""
     route = Route(route_name=route_name, description=description)
+    route.stops = [RouteStop(**{field: stop[field] for field in STOP_FIELDS}) for stop in stops]
     db.add(route)
     db.commit()
     db.refresh(route)
     return route
 
 
-def create_route_stop(db: Session, route_id: int, stop_name: str, 
-                      latitude: float, longitude: float, order: int) -> RouteStop:
-    """Create a route stop."""
-    stop = RouteStop(
-        route_id=route_id,
-        stop_name=stop_name,
-        latitude=latitude,
-        longitude=longitude,
-        order=order
-    )
-    db.add(stop)
+def sync_route_stops(db: Session, route: Route, stops: list[dict]) -> dict[str, int]:
+    """
+    Make the stops of a route match `stops` without committing.
+
+    Each incoming stop is matched to an existing one by `id`, or failing
+    that by name and position. Matched stops keep their id and are only
+    updated if a field changed; unmatched existing stops are deleted and
+    unmatched incoming stops inserted, together with any segment speeds
+    measured from or to them.
+    """
+    existing = {stop.id: stop for stop in route.stops}
+    by_name_and_order = {(stop.stop_name, stop.order): stop for stop in route.stops}
+    matched: set[int] = set()
+    kept = []
+    counts = {"inserted": 0, "updated": 0, "deleted": 0}
+
+    for incoming in stops:
+        stop = existing.get(incoming.get("id"))
+        if stop is None or stop.id in matched:
+            stop = by_name_and_order.get((incoming["stop_name"], incoming["order"]))
+        if stop is None or stop.id in matched:
+            kept.append(RouteStop(**{field: incoming[field] for field in STOP_FIELDS}))
+            counts["inserted"] += 1
+            continue
+
+        matched.add(stop.id)
+        changed = False
+        for field in STOP_FIELDS:
+            if getattr(stop, field) != incoming[field]:
+                setattr(stop, field, incoming[field])
+                changed = True
+        counts["updated"] += changed
+        kept.append(stop)
+
+    counts["deleted"] = len(existing) - len(matched)
+    delete_segment_speeds(db, existing.keys() - matched)
+    # Assigning the collection deletes orphaned stops and inserts new ones.
+    route.stops = kept
+    db.flush()
+    return counts
+
+
+def update_route(db: Session, route: Route, route_name: str, description: str,
+                 stops: list[dict]) -> dict[str, int]:
+    """Update a route and diff its stops in one transaction."""
+    route.route_name = route_name
+    route.description = description
+    counts = sync_route_stops(db, route, stops)
+    db.flush()
+    stop_times.regenerate(db, route_ids=[route.id])
+    db.commit()
+    db.refresh(route)
+    return counts
+
+
+def reorder_route_stops(db: Session, route: Route, stop_ids: list[int]) -> None:
+    """Renumber a route's stops in the order of `stop_ids` and regenerate its stop times."""
+    position = {stop_id: index for index, stop_id in enumerate(stop_ids, start=1)}
+    for stop in route.stops:
+        stop.order = position[stop.id]
+    # The loaded collection keeps its old order; stop times are generated from it.
+    route.stops = sorted(route.stops, key=lambda stop: stop.order)
+    db.flush()
+    stop_times.regenerate(db, route_ids=[route.id])
     db.commit()
-    db.refresh(stop)
-    return stop
+    db.refresh(route)
+
+
+def delete_route(db: Session, route_id: int) -> bool:
+    """Delete a route, its stops and their segment speeds."""
+    route = db.query(Route).filter(Route.id == route_id).first()
+    if route:
+        delete_segment_speeds(db, [stop.id for stop in route.stops])
+        db.delete(route)
+        db.commit()
+        return True
+    return False
 
 
 # Schedule CRUD
-def get_schedules(db: Session, skip: int = 0, limit: int = 100):
-    """Get all schedules."""
-    return db.query(Schedule).offset(skip).limit(limit).all()
+def get_schedules(db: Session, after_id: Optional[int] = None, limit: Optional[int] = 100):
+    """Get a page of schedules ordered by id with their bus, route and stop times, and the id to continue after."""
+    query = db.query(Schedule).options(
+        joinedload(Schedule.bus), joinedload(Schedule.route), selectinload(Schedule.stop_times)
+    )
+    return keyset_page(query, Schedule.id, after_id, limit)
 
 
-def create_schedule(db: Session, bus_id: int, route_id: int, 
-                    departure_time: str, days_of_week: str) -> Schedule:
-    """Create a new schedule."""
-    schedule = Schedule(
-        bus_id=bus_id,
-        route_id=route_id,
-        departure_time=departure_time,
-        days_of_week=days_of_week
+def get_schedule(db: Session, schedule_id: int) -> Optional[Schedule]:
+    """Get schedule by ID with its bus, route and stop times."""
+    return (
+        db.query(Schedule)
+        .options(joinedload(Schedule.bus), joinedload(Schedule.route), selectinload(Schedule.stop_times))
+        .filter(Schedule.id == schedule_id)
+        .first()
     )
+
+
+def set_schedule_times(schedule: Schedule, departure_time: str, days_of_week) -> None:
+    """
+    Compile and store a schedule's departure time and days.
+
+    The text columns are rewritten in canonical form ("07:00 AM",
+    "Monday,Tuesday") next to the minute and bitmask columns. Raises
+    ValueError for unparseable input.
+    """
+    minute = parse_departure(departure_time)
+    mask = parse_days(days_of_week)
+    schedule.departure_minute = minute
+    schedule.departure_time = format_departure(minute)
+    schedule.days_mask = mask
+    schedule.days_of_week = ",".join(days_from_mask(mask))
+
+
+def create_schedule(db: Session, bus_id: int, route_id: int, 
+                    departure_time: str, days_of_week, status: Optional[str] = None) -> Schedule:
+    """Create a new schedule; `days_of_week` is a list or a comma-separated string."""
+    schedule = Schedule(bus_id=bus_id, route_id=route_id, status=status or "active")
+    set_schedule_times(schedule, departure_time, days_of_week)
     db.add(schedule)
+    db.flush()
+    stop_times.regenerate(db, schedule_ids=[schedule.id])
+    db.commit()
+    return get_schedule(db, schedule.id)
+
+
+def update_schedule(db: Session, schedule: Schedule, bus_id: int, route_id: int,
+                    departure_time: str, days_of_week, status: Optional[str] = None) -> Schedule:
+    """Replace a schedule's bus, route, times and optionally status."""
+    schedule.bus_id = bus_id
+    schedule.route_id = route_id
+    set_schedule_times(schedule, departure_time, days_of_week)
+    if status is not None:
+        schedule.status = status
+    db.flush()
+    stop_times.regenerate(db, schedule_ids=[schedule.id])
     db.commit()
-    db.refresh(schedule)
-    return schedule
+    db.expire(schedule, ["bus", "route"])
+    return get_schedule(db, schedule.id)
+
+
+def delete_schedule(db: Session, schedule_id: int) -> bool:
+    """Delete a schedule."""
+    schedule = db.query(Schedule).filter(Schedule.id == schedule_id).first()
+    if schedule:
+        db.delete(schedule)
+        db.commit()
+        return True
+    return False
 
 
 # Feedback CRUD
-def get_feedbacks(db: Session, skip: int = 0, limit: int = 100):
-    """Get all feedbacks."""
-    return db.query(Feedback).offset(skip).limit(limit).all()
+def get_feedbacks(db: Session, after_id: Optional[int] = None, limit: Optional[int] = 100):
+    """Get a page of feedbacks ordered by id, and the id to continue after."""
+    return keyset_page(db.query(Feedback), Feedback.id, after_id, limit)
 
 
 def create_feedback(db: Session, user_id: int, user_type: str, 
                     rating: int, category: str, message: str) -> Feedback:
-    """Create a new feedback."""
+    """Create a new feedback and count it in the feedback rollups."""
     feedback = Feedback(
         user_id=user_id,
         user_type=user_type,
@@ -210,6 +365,17 @@ def create_feedback(db: Session, user_id: int, user_type: str,
         message=message
     )
     db.add(feedback)
+    db.flush()
+    feedback_analytics.add_rollup(db, feedback)
     db.commit()
     db.refresh(feedback)
+    feedback_analytics.record(feedback)
     return feedback
+
+
+# Location CRUD
+def create_locations(db: Session, rows: list[dict]) -> int:
+    """Insert location rows into their history partitions; the caller commits."""
+    if not rows:
+        return 0
+    return location_history.insert(db, rows)
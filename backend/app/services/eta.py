@@ -0,0 +1,189 @@
+"""Route-geometry ETA engine for live bus positions."""
+import math
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Route, RouteStop
+from app.services.live_positions import BusPosition
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres; inputs in radians, scalars or arrays."""
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class RouteGeometry:
+    """Ordered stops of a route with precomputed cumulative distances."""
+    __slots__ = ("route_id", "route_name", "stop_ids", "stop_names", "orders",
+                 "lat", "lng", "segment_m", "cumulative_m")
+
+    def __init__(self, route_id: int, route_name: str, stops: list[RouteStop]):
+        self.route_id = route_id
+        self.route_name = route_name
+        self.stop_ids = [s.id for s in stops]
+        self.stop_names = [s.stop_name for s in stops]
+        self.orders = [s.order for s in stops]
+        self.lat = np.radians(np.array([s.latitude for s in stops], dtype=np.float64))
+        self.lng = np.radians(np.array([s.longitude for s in stops], dtype=np.float64))
+        self.segment_m = haversine(self.lat[:-1], self.lng[:-1], self.lat[1:], self.lng[1:])
+        self.cumulative_m = np.concatenate(([0.0], np.cumsum(self.segment_m)))
+
+    @property
+    def length_m(self) -> float:
+        """Total route length in metres."""
+        return float(self.cumulative_m[-1]) if len(self.cumulative_m) else 0.0
+
+    def project(self, latitude: float, longitude: float) -> tuple[float, float]:
+        """
+        Snap a point onto the route polyline.
+
+        Returns (distance along the route, distance off the route), both in
+        metres. Every segment is tested at once on a local equirectangular
+        plane; the chosen point is then measured with haversine.
+        """
+        lat0 = math.radians(latitude)
+        lng0 = math.radians(longitude)
+        if len(self.stop_ids) < 2:
+            off = float(haversine(lat0, lng0, self.lat, self.lng)[0]) if self.stop_ids else 0.0
+            return 0.0, off
+
+        scale = math.cos(lat0)
+        x = (self.lng - lng0) * scale
+        y = self.lat - lat0
+        ax, ay = x[:-1], y[:-1]
+        dx, dy = x[1:] - ax, y[1:] - ay
+        length_sq = dx * dx + dy * dy
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(length_sq > 0, -(ax * dx + ay * dy) / length_sq, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+
+        px = ax + t * dx
+        py = ay + t * dy
+        best = int(np.argmin(px * px + py * py))
+
+        snapped_lat = lat0 + py[best]
+        snapped_lng = lng0 + px[best] / scale
+        off = float(haversine(lat0, lng0, snapped_lat, snapped_lng))
+        along = float(self.cumulative_m[best] + t[best] * self.segment_m[best])
+        return along, off
+
+
+class StopEta:
+    """Estimated arrival of a bus at one stop."""
+    __slots__ = ("stop_id", "stop_name", "order", "distance_m", "eta_seconds")
+
+    def __init__(self, stop_id: int, stop_name: str, order: int, distance_m: float, eta_seconds: float):
+        self.stop_id = stop_id
+        self.stop_name = stop_name
+        self.order = order
+        self.distance_m = distance_m
+        self.eta_seconds = eta_seconds
+
+    def to_dict(self) -> dict:
+        """Return the ETA as a JSON-friendly dict."""
+        return {
+            "stop_id": self.stop_id,
+            "stop_name": self.stop_name,
+            "order": self.order,
+            "distance_m": round(self.distance_m, 1),
+            "eta_seconds": round(self.eta_seconds),
+        }
+
+
+class EtaEngine:
+    """
+    Caches route geometry and the ETAs derived from each bus position.
+
+    Geometry is built once per route and dropped by `invalidate` whenever the
+    route's stops change. ETAs for every downstream stop are computed in one
+    pass per (route, bus position) and reused by all readers until the bus
+    reports again.
+    """
+
+    def __init__(self, default_speed_kmh: float = 25.0, min_speed_kmh: float = 5.0):
+        self.default_speed_kmh = default_speed_kmh
+        self.min_speed_kmh = min_speed_kmh
+        self._geometry: dict[int, RouteGeometry] = {}
+        self._etas: dict[tuple[int, int], tuple[datetime, list[StopEta]]] = {}
+
+    def get_geometry(self, db: Session, route_id: int) -> Optional[RouteGeometry]:
+        """Return the cached geometry of a route, loading it if needed."""
+        geometry = self._geometry.get(route_id)
+        if geometry is not None:
+            return geometry
+
+        route = db.query(Route).filter(Route.id == route_id).first()
+        if not route:
+            return None
+        stops = (
+            db.query(RouteStop)
+            .filter(RouteStop.route_id == route_id)
+            .order_by(RouteStop.order)
+            .all()
+        )
+        geometry = RouteGeometry(route.id, route.route_name, stops)
+        self._geometry[route_id] = geometry
+        return geometry
+
+    def invalidate(self, route_id: int) -> None:
+        """Forget cached geometry and ETAs of a route."""
+        self._geometry.pop(route_id, None)
+        for key in [k for k in self._etas if k[0] == route_id]:
+            del self._etas[key]
+
+    def speed_mps(self, position: BusPosition) -> float:
+        """Speed used for ETAs; slow or missing readings fall back to the default."""
+        speed_kmh = position.speed
+        if speed_kmh is None or speed_kmh < self.min_speed_kmh:
+            speed_kmh = self.default_speed_kmh
+        return speed_kmh / 3.6
+
+    def estimate(self, geometry: RouteGeometry, position: BusPosition) -> list[StopEta]:
+        """Return ETAs for every stop still ahead of the bus."""
+        key = (geometry.route_id, position.bus_id)
+        cached = self._etas.get(key)
+        if cached is not None and cached[0] == position.timestamp:
+            return cached[1]
+
+        along, _ = geometry.project(position.latitude, position.longitude)
+        remaining = geometry.cumulative_m - along
+        seconds = remaining / self.speed_mps(position)
+        ahead = np.nonzero(remaining > 0)[0]
+        etas = [
+            StopEta(
+                geometry.stop_ids[i],
+                geometry.stop_names[i],
+                geometry.orders[i],
+                float(remaining[i]),
+                float(seconds[i])
+            )
+            for i in ahead
+        ]
+        self._etas[key] = (position.timestamp, etas)
+        return etas
+
+
+def format_eta(seconds: float) -> str:
+    """Render an ETA the way the mobile app displays it."""
+    minutes = round(seconds / 60)
+    if minutes < 1:
+        return "Arriving"
+    if minutes == 1:
+        return "1 minute"
+    return f"{minutes} minutes"
+
+
+settings = get_settings()
+eta_engine = EtaEngine(
+    default_speed_kmh=settings.eta_default_speed_kmh,
+    min_speed_kmh=settings.eta_min_speed_kmh,
+)
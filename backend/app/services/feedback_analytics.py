@@ -0,0 +1,191 @@
+"""Running feedback aggregates, daily rollups and recent feedback."""
+import threading
+from collections import Counter, deque
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Feedback, FeedbackDailyRollup
+
+
+def snapshot(feedback: Feedback) -> dict:
+    """Return the fields of a feedback entry shown in summaries."""
+    return {
+        "id": feedback.id,
+        "user_id": feedback.user_id,
+        "user_type": feedback.user_type,
+        "rating": feedback.rating,
+        "category": feedback.category,
+        "message": feedback.message,
+        "created_at": feedback.created_at.isoformat(),
+        "status": feedback.status,
+    }
+
+
+def _average(rating_sum: int, count: int) -> float:
+    return round(rating_sum / count, 2) if count else 0.0
+
+
+class FeedbackAnalytics:
+    """
+    Feedback aggregates that never scan the `feedbacks` table per request.
+
+    All-time counts and rating sums per category and user type are kept in
+    memory and bumped as feedback is submitted. Each submission also upserts
+    its (day, category, user_type) row in `feedback_daily_rollups` within
+    the same transaction, so windowed summaries read at most a few rows per
+    day. The most recent entries are kept in a bounded ring buffer.
+    """
+
+    def __init__(self, recent_size: int = 50):
+        self._lock = threading.Lock()
+        self._recent: deque[dict] = deque(maxlen=recent_size)
+        self._count = 0
+        self._rating_sum = 0
+        self._by_category: Counter = Counter()
+        self._by_user_type: Counter = Counter()
+
+    # Writes
+    def add_rollup(self, db: Session, feedback: Feedback) -> None:
+        """Add a new feedback entry to its daily rollup row without committing."""
+        created = feedback.created_at or datetime.utcnow()
+        statement = insert(FeedbackDailyRollup).values(
+            day=created.date(),
+            category=feedback.category,
+            user_type=feedback.user_type,
+            count=1,
+            rating_sum=feedback.rating,
+        )
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["day", "category", "user_type"],
+            set_={
+                "count": FeedbackDailyRollup.count + 1,
+                "rating_sum": FeedbackDailyRollup.rating_sum + feedback.rating,
+            },
+        ))
+
+    def record(self, feedback: Feedback) -> None:
+        """Count a committed feedback entry in the running aggregates."""
+        with self._lock:
+            self._count += 1
+            self._rating_sum += feedback.rating
+            self._by_category[feedback.category] += 1
+            self._by_user_type[feedback.user_type] += 1
+            self._recent.append(snapshot(feedback))
+
+    # Loading
+    def rebuild_rollups(self, db: Session) -> None:
+        """Recompute every rollup row from `feedbacks`."""
+        db.query(FeedbackDailyRollup).delete(synchronize_session=False)
+        day = func.date(Feedback.created_at)
+        db.execute(insert(FeedbackDailyRollup).from_select(
+            ["day", "category", "user_type", "count", "rating_sum"],
+            select(day, Feedback.category, Feedback.user_type, func.count(Feedback.id), func.sum(Feedback.rating))
+            .where(Feedback.created_at.isnot(None))
+            .group_by(day, Feedback.category, Feedback.user_type)
+        ))
+        db.commit()
+
+    def load(self, db: Session) -> None:
+        """
+        Load the running aggregates from the rollup table.
+
+        Rollups are rebuilt first when they do not account for every
+        feedback row, e.g. on the first start after upgrading.
+        """
+        rolled_up = db.query(func.coalesce(func.sum(FeedbackDailyRollup.count), 0)).scalar()
+        if rolled_up != db.query(func.count(Feedback.id)).scalar():
+            self.rebuild_rollups(db)
+
+        rows = (
+            db.query(
+                FeedbackDailyRollup.category,
+                FeedbackDailyRollup.user_type,
+                func.sum(FeedbackDailyRollup.count),
+                func.sum(FeedbackDailyRollup.rating_sum),
+            )
+            .group_by(FeedbackDailyRollup.category, FeedbackDailyRollup.user_type)
+            .all()
+        )
+        recent = (
+            db.query(Feedback)
+            .order_by(Feedback.id.desc())
+            .limit(self._recent.maxlen)
+            .all()
+        )
+        with self._lock:
+            self._count = self._rating_sum = 0
+            self._by_category = Counter()
+            self._by_user_type = Counter()
+            for category, user_type, count, rating_sum in rows:
+                self._count += count
+                self._rating_sum += rating_sum
+                self._by_category[category] += count
+                self._by_user_type[user_type] += count
+            self._recent.clear()
+            self._recent.extend(snapshot(f) for f in reversed(recent))
+
+    # Reads
+    def recent(self, limit: int) -> list[dict]:
+        """Return up to `limit` of the newest feedback entries, newest first."""
+        with self._lock:
+            entries = list(self._recent)
+        return entries[::-1][:limit]
+
+    def totals(self) -> dict:
+        """Return all-time aggregates from memory."""
+        with self._lock:
+            return {
+                "total_feedback": self._count,
+                "average_rating": _average(self._rating_sum, self._count),
+                "feedback_by_category": dict(self._by_category),
+                "feedback_by_user_type": dict(self._by_user_type),
+            }
+
+    def window(self, db: Session, days: int, today: Optional[date] = None) -> dict:
+        """Return aggregates of the last `days` days, including today, from rollup rows."""
+        today = today or datetime.utcnow().date()
+        rows = (
+            db.query(FeedbackDailyRollup)
+            .filter(FeedbackDailyRollup.day > today - timedelta(days=days))
+            .all()
+        )
+        count = sum(r.count for r in rows)
+        by_category: Counter = Counter()
+        by_user_type: Counter = Counter()
+        for r in rows:
+            by_category[r.category] += r.count
+            by_user_type[r.user_type] += r.count
+        return {
+            "total_feedback": count,
+            "average_rating": _average(sum(r.rating_sum for r in rows), count),
+            "feedback_by_category": dict(by_category),
+            "feedback_by_user_type": dict(by_user_type),
+        }
+
+    def daily(self, db: Session, days: int, today: Optional[date] = None) -> list[dict]:
+        """Return the count and average rating of each of the last `days` days with feedback."""
+        today = today or datetime.utcnow().date()
+        rows = (
+            db.query(
+                FeedbackDailyRollup.day,
+                func.sum(FeedbackDailyRollup.count),
+                func.sum(FeedbackDailyRollup.rating_sum),
+            )
+            .filter(FeedbackDailyRollup.day > today - timedelta(days=days))
+            .group_by(FeedbackDailyRollup.day)
+            .order_by(FeedbackDailyRollup.day)
+            .all()
+        )
+        return [
+            {"day": day.isoformat(), "count": count, "average_rating": _average(rating_sum, count)}
+            for day, count, rating_sum in rows
+        ]
+
+
+settings = get_settings()
+feedback_analytics = FeedbackAnalytics(recent_size=settings.feedback_recent_buffer)
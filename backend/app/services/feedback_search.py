@@ -0,0 +1,96 @@
+"""Full-text search over feedback messages with an SQLite FTS5 index."""
+from typing import Optional
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.orm import Session
+
+FTS_TABLE = "feedbacks_fts"
+
+# External-content FTS5 table: it stores only the index and reads message
+# text from `feedbacks`. The triggers keep it in step with every write.
+SCHEMA = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        message, content='feedbacks', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS feedbacks_fts_insert AFTER INSERT ON feedbacks BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, message) VALUES (new.id, new.message);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS feedbacks_fts_delete AFTER DELETE ON feedbacks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message) VALUES ('delete', old.id, old.message);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS feedbacks_fts_update AFTER UPDATE OF message ON feedbacks BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message) VALUES ('delete', old.id, old.message);
+        INSERT INTO {FTS_TABLE}(rowid, message) VALUES (new.id, new.message);
+    END""",
+)
+
+
+def ensure_index(db: Session) -> bool:
+    """
+    Create the FTS index and its triggers if they do not exist.
+
+    A newly created index is filled from the existing feedback rows.
+    Returns True when the index was created.
+    """
+    exists = db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE}
+    ).first()
+    for statement in SCHEMA:
+        db.execute(text(statement))
+    if not exists:
+        db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    db.commit()
+    return not exists
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word is quoted so FTS5 operators in user input are matched as
+    text, and the last word matches as a prefix for search-as-you-type.
+    """
+    words = query.split()
+    if not words:
+        return None
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(db: Session, query: str, category: Optional[str] = None, rating: Optional[int] = None,
+           status: Optional[str] = None, limit: int = 20, offset: int = 0) -> list:
+    """
+    Return feedback rows matching `query`, best match first.
+
+    Filters are applied in the same statement as the MATCH, so only
+    matching rows are joined and ranked. Each row carries `snippet`, the
+    matched part of the message with hits wrapped in <mark> tags, and
+    `rank`, its bm25 score (lower is better).
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+
+    filters = []
+    params = {"match": expression, "limit": limit, "offset": offset}
+    if category is not None:
+        filters.append("AND f.category = :category")
+        params["category"] = category
+    if rating is not None:
+        filters.append("AND f.rating = :rating")
+        params["rating"] = rating
+    if status is not None:
+        filters.append("AND f.status = :status")
+        params["status"] = status
+
+    statement = text(
+        f"SELECT f.id, f.user_id, f.user_type, f.rating, f.category, f.message, f.status, f.created_at, "
+        f"snippet({FTS_TABLE}, 0, '<mark>', '</mark>', '…', 12) AS snippet, "
+        f"bm25({FTS_TABLE}) AS rank "
+        f"FROM {FTS_TABLE} JOIN feedbacks AS f ON f.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :match {' '.join(filters)} "
+        "ORDER BY rank LIMIT :limit OFFSET :offset"
+    ).columns(created_at=DateTime)
+    return db.execute(statement, params).all()
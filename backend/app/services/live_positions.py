@@ -0,0 +1,285 @@
+"""In-memory live bus positions with write-behind persistence."""
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.services.location_history import location_history
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert a timezone-aware timestamp to naive UTC, the form positions are stored and compared in."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class BusPosition:
+    """Latest known position of a single bus."""
+    __slots__ = ("bus_id", "driver_id", "latitude", "longitude", "speed", "timestamp")
+
+    def __init__(self, bus_id: int, driver_id: int, latitude: float, longitude: float,
+                 speed: Optional[float], timestamp: datetime):
+        self.bus_id = bus_id
+        self.driver_id = driver_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.speed = speed
+        self.timestamp = timestamp
+
+    def to_row(self) -> dict:
+        """Return the position as a location history row."""
+        return {
+            "bus_id": self.bus_id,
+            "driver_id": self.driver_id,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "speed": self.speed,
+            "timestamp": self.timestamp,
+        }
+
+    def to_dict(self) -> dict:
+        """Return the position as a JSON-friendly dict."""
+        return {
+            "bus_id": self.bus_id,
+            "driver_id": self.driver_id,
+            "lat": self.latitude,
+            "lng": self.longitude,
+            "speed": self.speed,
+            "timestamp": self.timestamp.isoformat(),
+        }
+
+
+class LivePositionStore:
+    """
+    Process-local store of the latest position per bus.
+
+    Reads are served from memory. Every accepted point is also queued and
+    written to location history in bulk by a background task. The queue
+    is bounded: once full, a new point replaces the pending point of the same
+    bus (coalesced) or is dropped if that bus has nothing pending.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None,
+                 flush_interval: float = 2.0, batch_size: int = 500,
+                 max_pending: int = 10000, seq_window: int = 4096,
+                 writer: Optional[Callable[[Callable[[Session], int]], Awaitable[int]]] = None):
+        self._session_factory = session_factory
+        self._writer = writer
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.seq_window = seq_window
+
+        self._lock = threading.Lock()
+        self._latest: dict[int, BusPosition] = {}
+        self._pending: list[BusPosition] = []
+        self._pending_index: dict[int, int] = {}
+        self._driver_buses: dict[int, int] = {}
+        self._driver_seqs: dict[int, tuple[set[int], deque]] = {}
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.accepted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.flush_errors = 0
+
+    # Reads
+    def get(self, bus_id: int) -> Optional[BusPosition]:
+        """Return the latest position of a bus, if any."""
+        return self._latest.get(bus_id)
+
+    def all(self) -> list[BusPosition]:
+        """Return the latest position of every bus."""
+        return list(self._latest.values())
+
+    def bus_for_driver(self, driver_id: int) -> Optional[int]:
+        """Return the bus last used by a driver."""
+        return self._driver_buses.get(driver_id)
+
+    def remember_driver_bus(self, driver_id: int, bus_id: int) -> None:
+        """Cache the bus assigned to a driver."""
+        self._driver_buses[driver_id] = bus_id
+
+    def forget_driver(self, driver_id: int) -> None:
+        """Drop the cached bus assignment of a driver."""
+        self._driver_buses.pop(driver_id, None)
+        self._driver_seqs.pop(driver_id, None)
+
+    def claim_sequence(self, driver_id: int, seq: int) -> bool:
+        """
+        Mark a client sequence number as seen for a driver.
+
+        Returns False if the (driver_id, seq) pair was already claimed within
+        the last `seq_window` sequence numbers of that driver.
+        """
+        with self._lock:
+            seen, order = self._driver_seqs.setdefault(driver_id, (set(), deque()))
+            if seq in seen:
+                return False
+            seen.add(seq)
+            order.append(seq)
+            if len(order) > self.seq_window:
+                seen.discard(order.popleft())
+            return True
+
+    def release_sequences(self, driver_id: int, seqs: list[int]) -> None:
+        """Forget claimed sequence numbers whose points could not be stored."""
+        with self._lock:
+            entry = self._driver_seqs.get(driver_id)
+            if entry is not None:
+                entry[0].difference_update(seqs)
+
+    # Writes
+    def update(self, bus_id: int, driver_id: int, latitude: float, longitude: float,
+               speed: Optional[float] = None, timestamp: Optional[datetime] = None,
+               persist: bool = True) -> BusPosition:
+        """
+        Record a new position for a bus.
+
+        The point is queued for write-behind persistence unless `persist` is
+        False, which callers use when they have already written it themselves.
+        """
+        position = BusPosition(
+            bus_id, driver_id, latitude, longitude, speed,
+            timestamp or datetime.utcnow()
+        )
+        with self._lock:
+            self.accepted += 1
+            current = self._latest.get(bus_id)
+            if current is None or current.timestamp <= position.timestamp:
+                self._latest[bus_id] = position
+
+            if not persist:
+                return position
+            if len(self._pending) < self.max_pending:
+                self._pending_index[bus_id] = len(self._pending)
+                self._pending.append(position)
+            elif bus_id in self._pending_index:
+                self._pending[self._pending_index[bus_id]] = position
+                self.coalesced += 1
+            else:
+                self.dropped += 1
+            pending = len(self._pending)
+
+        if pending >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return position
+
+    def drain(self) -> list[BusPosition]:
+        """Take every pending point out of the queue."""
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+            self._pending_index = {}
+        return pending
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """
+        Write pending points to the database in bulk; return rows written.
+
+        Uses `db` if given, such as the writer queue's session, and otherwise
+        a session of its own.
+        """
+        points = self.drain()
+        if not points or (db is None and self._session_factory is None):
+            return 0
+
+        own_session = db is None
+        if own_session:
+            db = self._session_factory()
+        try:
+            for start in range(0, len(points), self.batch_size):
+                chunk = points[start:start + self.batch_size]
+                location_history.insert(db, [p.to_row() for p in chunk])
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self.flush_errors += 1
+                self.dropped += len(points)
+            raise
+        finally:
+            if own_session:
+                db.close()
+
+        with self._lock:
+            self.flushed += len(points)
+        return len(points)
+
+    def stats(self) -> dict:
+        """Return queue and persistence counters."""
+        with self._lock:
+            return {
+                "tracked_buses": len(self._latest),
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "accepted": self.accepted,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "flushed": self.flushed,
+                "flush_errors": self.flush_errors,
+            }
+
+    # Background flushing
+    async def _write(self, flush: Callable[..., int]) -> int:
+        """Run a flush through the writer if there is one, else on a worker thread."""
+        if self._writer is not None:
+            return await self._writer(flush)
+        return await asyncio.to_thread(flush)
+
+    async def _run(self) -> None:
+        """Flush pending points every interval or once a batch is full."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._write(self.flush)
+            except Exception as exc:
+                print(f"⚠️ Location flush failed: {exc}")
+
+    def start(self) -> None:
+        """Start the background flush task on the running event loop."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and flush whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        await self._write(self.flush)
+
+
+def _create_store() -> LivePositionStore:
+    """Build the application-wide store from settings."""
+    from app.core.database import SessionLocal, write_queue
+
+    settings = get_settings()
+    return LivePositionStore(
+        session_factory=SessionLocal,
+        writer=write_queue.run,
+        flush_interval=settings.location_flush_interval,
+        batch_size=settings.location_flush_batch_size,
+        max_pending=settings.location_queue_max_size,
+        seq_window=settings.location_seq_window,
+    )
+
+
+live_positions = _create_store()
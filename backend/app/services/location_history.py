@@ -0,0 +1,294 @@
+"""Time-partitioned storage for GPS location history."""
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import (
+    Column, DateTime, Float, Index, Integer, MetaData, Table, event, func, insert, select, text
+)
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Location, LocationPartition
+
+# Keeps multi-row INSERTs well below SQLite's bound-parameter limit.
+MAX_ROWS_PER_INSERT = 1000
+
+LOCATION_COLUMNS = ("bus_id", "driver_id", "latitude", "longitude", "speed", "timestamp")
+
+_metadata = MetaData()
+_tables: dict[str, Table] = {}
+_tables_lock = threading.Lock()
+
+
+def partition_table(name: str) -> Table:
+    """Return the Core table of a partition, defining it on first use."""
+    with _tables_lock:
+        table = _tables.get(name)
+        if table is None:
+            table = Table(
+                name, _metadata,
+                Column("id", Integer, primary_key=True),
+                Column("bus_id", Integer, nullable=False),
+                Column("driver_id", Integer, nullable=False),
+                Column("latitude", Float, nullable=False),
+                Column("longitude", Float, nullable=False),
+                Column("speed", Float, nullable=True),
+                Column("timestamp", DateTime, nullable=False),
+                Index(f"ix_{name}_bus_id_timestamp", "bus_id", "timestamp"),
+                Index(f"ix_{name}_timestamp", "timestamp"),
+            )
+            _tables[name] = table
+        return table
+
+
+def _forget_table(name: str) -> None:
+    with _tables_lock:
+        table = _tables.pop(name, None)
+        if table is not None:
+            _metadata.remove(table)
+
+
+_PENDING_KEY = "location_partitions_pending"
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_partitions(session: Session) -> None:
+    for history, key in session.info.pop(_PENDING_KEY, ()):
+        history._known.add(key)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_partitions(session: Session, previous_transaction) -> None:
+    # A savepoint rollback may have undone the CREATE TABLE; forgetting every
+    # pending partition only costs a registry lookup on the next insert.
+    session.info.pop(_PENDING_KEY, None)
+
+
+class LocationHistory:
+    """
+    Routes location rows to one table per day or ISO week.
+
+    Partitions are listed in the `location_partitions` registry. Inserts are
+    grouped per partition, range reads only touch overlapping partitions, and
+    expiring a partition is a DROP TABLE rather than a DELETE. Partitions
+    older than `full_resolution_days` are thinned to one point per bus per
+    minute by `maintain`, which the background task runs periodically.
+    """
+
+    def __init__(self, interval: str = "day", full_resolution_days: int = 7,
+                 retention_days: int = 180, maintenance_interval: float = 3600.0):
+        if interval not in ("day", "week"):
+            raise ValueError("interval must be 'day' or 'week'")
+        self.interval = interval
+        self.full_resolution_days = full_resolution_days
+        self.retention_days = retention_days
+        self.maintenance_interval = maintenance_interval
+        self._known: set[tuple[int, str]] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    # Partition layout
+    def period_start(self, timestamp: datetime) -> datetime:
+        """Return the start of the partition period containing `timestamp`."""
+        start = datetime(timestamp.year, timestamp.month, timestamp.day)
+        if self.interval == "week":
+            start -= timedelta(days=start.weekday())
+        return start
+
+    def period_end(self, start: datetime) -> datetime:
+        """Return the exclusive end of a partition period."""
+        return start + timedelta(days=7 if self.interval == "week" else 1)
+
+    def partition_name(self, start: datetime) -> str:
+        """Return the table name of the partition starting at `start`."""
+        prefix = "w" if self.interval == "week" else "d"
+        return f"locations_{prefix}{start:%Y%m%d}"
+
+    def ensure_partition(self, db: Session, start: datetime) -> Table:
+        """Create a partition table and its registry row if they do not exist."""
+        name = self.partition_name(start)
+        table = partition_table(name)
+        key = (id(db.get_bind()), name)
+        if key in self._known:
+            return table
+
+        if db.get(LocationPartition, name) is None:
+            table.create(bind=db.connection(), checkfirst=True)
+            db.merge(LocationPartition(
+                name=name,
+                period_start=start,
+                period_end=self.period_end(start),
+                downsampled=False
+            ))
+            db.flush()
+        # Cached once committed, so a rolled back CREATE TABLE is not taken as existing.
+        db.info.setdefault(_PENDING_KEY, set()).add((self, key))
+        return table
+
+    def partitions(self, db: Session, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> list[LocationPartition]:
+        """Return registered partitions overlapping [start, end), oldest first."""
+        query = db.query(LocationPartition)
+        if start is not None:
+            query = query.filter(LocationPartition.period_end > start)
+        if end is not None:
+            query = query.filter(LocationPartition.period_start < end)
+        return query.order_by(LocationPartition.period_start).all()
+
+    # Writes
+    def insert(self, db: Session, rows: list[dict]) -> int:
+        """
+        Insert location rows into their partitions without committing.
+
+        Each partition receives multi-row INSERT statements of up to
+        MAX_ROWS_PER_INSERT rows.
+        """
+        grouped: dict[datetime, list[dict]] = {}
+        for row in rows:
+            if row.get("timestamp") is None:
+                row = {**row, "timestamp": datetime.utcnow()}
+            grouped.setdefault(self.period_start(row["timestamp"]), []).append(row)
+
+        for start, group in grouped.items():
+            table = self.ensure_partition(db, start)
+            for offset in range(0, len(group), MAX_ROWS_PER_INSERT):
+                db.execute(insert(table).values(group[offset:offset + MAX_ROWS_PER_INSERT]))
+        return len(rows)
+
+    # Reads
+    def iter_rows(self, db: Session, start: datetime, end: datetime,
+                  bus_id: Optional[int] = None, chunk_size: int = 1000) -> Iterator:
+        """Yield rows in [start, end) ordered by timestamp, one partition at a time."""
+        for partition in self.partitions(db, start, end):
+            table = partition_table(partition.name)
+            query = (
+                select(*(table.c[c] for c in LOCATION_COLUMNS))
+                .where(table.c.timestamp >= start, table.c.timestamp < end)
+                .order_by(table.c.timestamp)
+            )
+            if bus_id is not None:
+                query = query.where(table.c.bus_id == bus_id)
+            result = db.execute(query.execution_options(yield_per=chunk_size))
+            yield from result
+
+    def count(self, db: Session, start: datetime, end: datetime, bus_id: Optional[int] = None) -> int:
+        """Count rows in [start, end) using the partition indexes."""
+        total = 0
+        for partition in self.partitions(db, start, end):
+            table = partition_table(partition.name)
+            query = (
+                select(func.count())
+                .select_from(table)
+                .where(table.c.timestamp >= start, table.c.timestamp < end)
+            )
+            if bus_id is not None:
+                query = query.where(table.c.bus_id == bus_id)
+            total += db.execute(query).scalar_one()
+        return total
+
+    # Maintenance
+    def adopt_legacy(self, db: Session) -> int:
+        """Move rows from the unpartitioned `locations` table into partitions."""
+        days = [
+            row[0] for row in
+            db.query(func.date(Location.timestamp)).filter(Location.timestamp.isnot(None)).distinct()
+        ]
+        starts = sorted({self.period_start(datetime.fromisoformat(day)) for day in days})
+        columns = ", ".join(f'"{c}"' for c in LOCATION_COLUMNS)
+        moved = 0
+        for start in starts:
+            table = self.ensure_partition(db, start)
+            result = db.execute(
+                text(
+                    f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM locations '
+                    "WHERE timestamp >= :start AND timestamp < :end"
+                ),
+                {"start": start, "end": self.period_end(start)}
+            )
+            moved += result.rowcount
+        db.query(Location).filter(Location.timestamp.isnot(None)).delete(synchronize_session=False)
+        db.commit()
+        return moved
+
+    def drop_expired(self, db: Session, now: datetime) -> list[str]:
+        """Drop partitions that ended before the retention window."""
+        cutoff = now - timedelta(days=self.retention_days)
+        expired = (
+            db.query(LocationPartition)
+            .filter(LocationPartition.period_end <= cutoff)
+            .all()
+        )
+        names = []
+        for partition in expired:
+            db.execute(text(f'DROP TABLE IF EXISTS "{partition.name}"'))
+            db.delete(partition)
+            names.append(partition.name)
+        db.commit()
+        for name in names:
+            self._known = {key for key in self._known if key[1] != name}
+            _forget_table(name)
+        return names
+
+    def downsample(self, db: Session, now: datetime) -> list[str]:
+        """Keep one point per bus per minute in partitions past full resolution."""
+        cutoff = now - timedelta(days=self.full_resolution_days)
+        stale = (
+            db.query(LocationPartition)
+            .filter(LocationPartition.period_end <= cutoff, LocationPartition.downsampled.is_(False))
+            .all()
+        )
+        names = []
+        for partition in stale:
+            db.execute(text(
+                f'DELETE FROM "{partition.name}" WHERE id NOT IN ('
+                f'SELECT MIN(id) FROM "{partition.name}" '
+                "GROUP BY bus_id, substr(timestamp, 1, 16))"
+            ))
+            partition.downsampled = True
+            db.commit()
+            names.append(partition.name)
+        return names
+
+    def maintain(self, db: Session, now: Optional[datetime] = None) -> dict:
+        """Run retention and downsampling once."""
+        now = now or datetime.utcnow()
+        return {
+            "dropped": self.drop_expired(db, now),
+            "downsampled": self.downsample(db, now),
+        }
+
+    # Background maintenance
+    async def _run(self) -> None:
+        from app.core.database import write_queue
+
+        while True:
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                await write_queue.run(self.maintain)
+            except Exception as exc:
+                print(f"⚠️ Location history maintenance failed: {exc}")
+
+    def start(self) -> None:
+        """Start periodic maintenance on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop periodic maintenance."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+settings = get_settings()
+location_history = LocationHistory(
+    interval=settings.location_partition_interval,
+    full_resolution_days=settings.location_full_resolution_days,
+    retention_days=settings.location_retention_days,
+    maintenance_interval=settings.location_maintenance_interval,
+)
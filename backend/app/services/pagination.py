@@ -0,0 +1,88 @@
+"""Keyset pagination cursors and streamed JSON exports."""
+import base64
+import json
+from typing import Callable, Iterator, Optional
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy.orm import Query, Session
+
+from app.core.database import ReadSessionLocal
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    """Return an opaque cursor pointing after `last_id`."""
+    raw = json.dumps({"after": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Return the id a cursor points after, or None for the first page."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        after = json.loads(base64.urlsafe_b64decode(padded))["after"]
+        if not isinstance(after, int):
+            raise ValueError
+        return after
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset_page(query: Query, id_column, after_id: Optional[int], limit: Optional[int]) -> tuple[list, Optional[int]]:
+    """
+    Return one page ordered by id and the id to continue after, if any.
+
+    One extra row is fetched to tell whether another page exists, so the
+    last page never costs a second request.
+    """
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    query = query.order_by(id_column)
+    if limit is None:
+        return query.all(), None
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+
+def set_next_cursor(response: Response, next_id: Optional[int]) -> None:
+    """Expose the next page cursor as a response header."""
+    response.headers.update(next_cursor_headers(next_id))
+
+
+def next_cursor_headers(next_id: Optional[int]) -> dict[str, str]:
+    """Return the next page cursor header, if there is a next page."""
+    return {NEXT_CURSOR_HEADER: encode_cursor(next_id)} if next_id is not None else {}
+
+
+def stream_json_array(build_query: Callable[[Session], Query], serialize: Callable[[object], str],
+                      chunk_size: int = 500) -> Iterator[str]:
+    """
+    Yield a JSON array of every row of a query, `chunk_size` rows at a time.
+
+    Rows are fetched with yield_per, so memory use does not grow with the
+    table. The generator owns its session because it outlives the request
+    handler.
+    """
+    db = ReadSessionLocal()
+    try:
+        yield "["
+        separator = ""
+        batch: list[str] = []
+        for row in build_query(db).yield_per(chunk_size):
+            batch.append(serialize(row))
+            if len(batch) == chunk_size:
+                yield separator + ",".join(batch)
+                separator = ","
+                batch = []
+        if batch:
+            yield separator + ",".join(batch)
+        yield "]"
+    finally:
+        db.close()
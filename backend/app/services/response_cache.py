@@ -0,0 +1,130 @@
+"""Cache of serialized catalogue responses with ETag revalidation."""
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from fastapi import Request, Response, status
+
+from app.core.config import get_settings
+from app.core.database import run_db
+
+Builder = Callable[[], tuple[bytes, dict[str, str]]]
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A serialized body with its ETag and extra headers such as X-Next-Cursor."""
+    etag: str
+    body: bytes
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class ResponseCache:
+    """
+    Serialized response bodies per collection, bounded by total body size.
+
+    Every collection ("buses", "routes", "schedules") has a version counter
+    that routers bump after each write; the ETag is derived from the
+    counter alone, so `If-None-Match` is answered without building a body
+    or touching the database. Bodies are kept per request key (such as a
+    page cursor) and evicted least recently used once `max_bytes` is
+    exceeded. A build that races with a write is returned to its caller
+    but not kept.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._boot = os.urandom(4).hex()  # keeps tags from a previous process from matching
+        self._versions: dict[str, int] = {}
+        self._entries: OrderedDict[tuple[str, str], CachedResponse] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def etag(self, collection: str) -> str:
+        """Return the current strong ETag of a collection."""
+        return f'"{collection}-{self._boot}-{self._versions.get(collection, 0)}"'
+
+    def bump(self, collection: str) -> None:
+        """Record a write to a collection, dropping its cached bodies."""
+        with self._lock:
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+            for entry_key in [k for k in self._entries if k[0] == collection]:
+                self._size -= len(self._entries.pop(entry_key).body)
+
+    def lookup(self, collection: str, key: str) -> Optional[CachedResponse]:
+        """Return a cached response if one is stored."""
+        with self._lock:
+            entry = self._entries.get((collection, key))
+            if entry is not None:
+                self._entries.move_to_end((collection, key))
+                self.hits += 1
+            return entry
+
+    def build(self, collection: str, key: str, builder: Builder) -> CachedResponse:
+        """Build a response body, keeping it unless the collection changed meanwhile."""
+        with self._lock:
+            version = self._versions.get(collection, 0)
+            etag = self.etag(collection)
+            self.misses += 1
+        body, headers = builder()
+        entry = CachedResponse(etag, body, headers)
+        with self._lock:
+            if self._versions.get(collection, 0) != version or len(body) > self.max_bytes:
+                return entry
+            previous = self._entries.pop((collection, key), None)
+            if previous is not None:
+                self._size -= len(previous.body)
+            self._entries[(collection, key)] = entry
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+        return entry
+
+    def stats(self) -> dict:
+        """Return entry, size and hit counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "versions": dict(self._versions),
+            }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compare an If-None-Match header with an ETag using weak comparison."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+async def cached_response(request: Request, collection: str, key: str, builder: Builder) -> Response:
+    """
+    Serve a catalogue response from the cache.
+
+    Returns 304 when the client already holds the current version; otherwise
+    the cached body, building it on the database executor if needed.
+    """
+    etag = response_cache.etag(collection)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        response_cache.not_modified += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    entry = response_cache.lookup(collection, key) or await run_db(response_cache.build, collection, key, builder)
+    return Response(
+        content=entry.body,
+        media_type="application/json",
+        headers={"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    )
+
+
+response_cache = ResponseCache(max_bytes=get_settings().response_cache_max_bytes)
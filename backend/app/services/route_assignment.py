@@ -0,0 +1,312 @@
+"""Capacity-aware assignment of students to routes near their homes."""
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Bus, RouteStop, Schedule, Student
+from app.services.spatial_index import GridIndex
+from app.services.stats import dashboard_stats
+
+UNASSIGNED = -1
+_EPSILON_M = 1e-6
+
+
+class _Residual:
+    """
+    Residual graph of an assignment with one node per route, plus a pool of
+    unassigned students and a node for spare seats.
+
+    Edge a -> b costs the cheapest change in walking distance of moving one
+    student from route a to route b. Edges from the pool put an unassigned
+    student on a route, edges to the pool take one off. A route with a spare
+    seat has an edge to the spare node, which has edges back to every route,
+    so a student can move without anyone making room. Each edge remembers
+    the student realizing its cost.
+    """
+
+    def __init__(self, distances: np.ndarray, capacities: np.ndarray, assignment: np.ndarray):
+        self.distances = distances
+        self.capacities = capacities
+        self.assignment = assignment
+        self.routes = len(capacities)
+        self.pool, self.spare = self.routes, self.routes + 1
+        size = self.routes + 2
+        self.cost = np.full((size, size), np.inf)
+        self.student = np.full((size, size), UNASSIGNED)
+        self.loads = np.bincount(assignment[assignment >= 0], minlength=self.routes)
+        self.cost[self.spare, :self.routes] = 0.0
+        for node in range(self.routes + 1):
+            self._rebuild(node)
+
+    def _rebuild(self, node: int) -> None:
+        """Recompute the edges leaving a route or the pool."""
+        self.cost[node, :self.spare] = np.inf
+        self.student[node, :self.spare] = UNASSIGNED
+        members = np.flatnonzero(self.assignment == (UNASSIGNED if node == self.pool else node))
+        if len(members):
+            if node == self.pool:
+                gains = self.distances[members]
+            else:
+                current = self.distances[members, node]
+                gains = np.column_stack((self.distances[members] - current[:, None], -current))
+            best = gains.argmin(axis=0)
+            self.cost[node, :gains.shape[1]] = gains[best, np.arange(gains.shape[1])]
+            self.student[node, :gains.shape[1]] = members[best]
+        if node != self.pool:
+            self.cost[node, node] = np.inf
+            self.cost[node, self.spare] = 0.0 if self.loads[node] < self.capacities[node] else np.inf
+
+    def move(self, path: list[int]) -> None:
+        """Apply the moves along consecutive nodes of a path or cycle."""
+        touched = set()
+        for source, target in zip(path[:-1], path[1:]):
+            if source == self.spare or target == self.spare:
+                continue
+            student = self.student[source, target]
+            if source != self.pool:
+                self.loads[source] -= 1
+            if target != self.pool:
+                self.loads[target] += 1
+            self.assignment[student] = UNASSIGNED if target == self.pool else target
+            touched.update((source, target))
+        for node in touched:
+            self._rebuild(node)
+
+    def negative_cycle(self) -> Optional[list[int]]:
+        """Return the nodes of a cycle with negative total cost, first node repeated at the end."""
+        size = len(self.cost)
+        distance = np.zeros(size)
+        parent = np.full(size, -1)
+        changed = -1
+        for _ in range(size):
+            through = distance[:, None] + self.cost
+            best = through.argmin(axis=0)
+            shorter = through[best, np.arange(size)] < distance - _EPSILON_M
+            if not shorter.any():
+                return None
+            distance[shorter] = through[best, np.arange(size)][shorter]
+            parent[shorter] = best[shorter]
+            changed = int(np.flatnonzero(shorter)[0])
+        node = changed
+        for _ in range(size):  # step back until inside the cycle
+            node = parent[node]
+            if node < 0:
+                return None
+        cycle = [node]
+        while len(cycle) <= size:
+            cycle.append(int(parent[cycle[-1]]))
+            if cycle[-1] == node:
+                break
+        else:
+            return None
+        cycle.reverse()
+        total = sum(self.cost[a, b] for a, b in zip(cycle[:-1], cycle[1:]))
+        return cycle if total < -_EPSILON_M else None
+
+    def augmenting_path(self) -> Optional[list[int]]:
+        """Return the cheapest path putting one more pooled student on a route with a spare seat."""
+        size = len(self.cost)
+        distance = np.full(size, np.inf)
+        distance[self.pool] = 0.0
+        parent = np.full(size, -1)
+        cost = self.cost.copy()
+        cost[self.spare, :] = np.inf  # the path ends at the spare node
+        for _ in range(size - 1):
+            through = distance[:, None] + cost
+            best = through.argmin(axis=0)
+            shorter = through[best, np.arange(size)] < distance - _EPSILON_M
+            if not shorter.any():
+                break
+            distance[shorter] = through[best, np.arange(size)][shorter]
+            parent[shorter] = best[shorter]
+        if not np.isfinite(distance[self.spare]):
+            return None
+        path = [self.spare]
+        while path[-1] != self.pool:
+            path.append(int(parent[path[-1]]))
+        return path[::-1]
+
+
+def assign(distances: np.ndarray, capacities: np.ndarray, time_budget_ms: int = 5000) -> np.ndarray:
+    """
+    Assign each student (row) to a route (column) within route capacities.
+
+    `distances` holds walking metres, `inf` where a route is out of reach.
+    As many students as possible are assigned, and among such assignments
+    the total walking distance is minimized. Returns the route column of
+    each student or -1.
+
+    A greedy pass takes the shortest walks first while seats remain. It is
+    then repaired as a min-cost flow over a graph with one node per route:
+    negative cycles (chains of moves that shorten walks) are cancelled, then
+    pooled students are added along cheapest augmenting paths, which
+    displace others to their next best route. Each step is a Bellman-Ford
+    search over R + 2 nodes plus rebuilding the edges of the routes it
+    touched. The repair stops at the time budget, keeping the best
+    assignment found so far.
+    """
+    students, routes = distances.shape
+    assignment = np.full(students, UNASSIGNED)
+    if not students or not routes:
+        return assignment
+    deadline = time.perf_counter() + time_budget_ms / 1000.0
+
+    loads = np.zeros(routes, dtype=int)
+    rows, columns = np.nonzero(np.isfinite(distances))
+    for index in np.argsort(distances[rows, columns], kind="stable"):
+        student, route = rows[index], columns[index]
+        if assignment[student] == UNASSIGNED and loads[route] < capacities[route]:
+            assignment[student] = route
+            loads[route] += 1
+
+    residual = _Residual(distances, capacities, assignment)
+    while time.perf_counter() < deadline:
+        cycle = residual.negative_cycle()
+        if cycle is None:
+            break
+        residual.move(cycle)
+    while time.perf_counter() < deadline:
+        path = residual.augmenting_path()
+        if path is None:
+            break
+        residual.move(path)
+    return residual.assignment
+
+
+@dataclass
+class AssignmentPlan:
+    """Proposed routes of students who have home coordinates."""
+    student_ids: list[int]
+    current: list[Optional[int]]
+    proposed: list[Optional[int]]
+    walk_m: list[Optional[float]]
+    capacity: dict[int, int] = field(default_factory=dict)  # seats per route left for these students
+
+    @property
+    def changes(self) -> list[tuple[int, Optional[int], Optional[int]]]:
+        """(student id, old route, new route) of students whose route changes."""
+        return [
+            (student_id, old, new)
+            for student_id, old, new in zip(self.student_ids, self.current, self.proposed)
+            if old != new
+        ]
+
+    def summary(self) -> dict:
+        """Return counts, walking distances and per-route loads."""
+        walks = [walk for walk in self.walk_m if walk is not None]
+        loads: dict[int, int] = {route_id: 0 for route_id in self.capacity}
+        for route_id in self.proposed:
+            if route_id is not None:
+                loads[route_id] = loads.get(route_id, 0) + 1
+        return {
+            "students": len(self.student_ids),
+            "assigned": len(walks),
+            "unassigned": [s for s, route_id in zip(self.student_ids, self.proposed) if route_id is None],
+            "moved": len(self.changes),
+            "total_walk_m": round(sum(walks), 1),
+            "mean_walk_m": round(sum(walks) / len(walks), 1) if walks else 0.0,
+            "routes": [
+                {"route_id": route_id, "capacity": self.capacity.get(route_id, 0), "load": load}
+                for route_id, load in sorted(loads.items())
+            ],
+        }
+
+
+class RouteAssigner:
+    """
+    Assigns active students with home coordinates to the route whose
+    nearest stop is the shortest walk, within the seats of the buses
+    scheduled on that route.
+
+    A route's seats are the capacities of the distinct buses with an active
+    schedule on it, less the active students without coordinates already
+    riding it, who keep their route. Routes within `max_walk_m` of a home
+    are found with a grid index over the stops.
+    """
+
+    def __init__(self, max_walk_m: float = 2000.0, cell_deg: float = 0.01, time_budget_ms: int = 5000):
+        self.max_walk_m = max_walk_m
+        self.cell_deg = cell_deg
+        self.time_budget_ms = time_budget_ms
+
+    @staticmethod
+    def capacities(db: Session) -> dict[int, int]:
+        """Return the seats of the buses with an active schedule on each route."""
+        serving = (
+            select(Schedule.route_id, Schedule.bus_id)
+            .where(Schedule.status == "active")
+            .distinct()
+            .subquery()
+        )
+        seats = dict(db.execute(
+            select(serving.c.route_id, func.sum(Bus.capacity))
+            .join(Bus, Bus.id == serving.c.bus_id)
+            .group_by(serving.c.route_id)
+        ).all())
+        riding = dict(db.execute(
+            select(Student.route_id, func.count(Student.id))
+            .where(Student.status == "active", Student.route_id.isnot(None))
+            .where(Student.home_latitude.is_(None) | Student.home_longitude.is_(None))
+            .group_by(Student.route_id)
+        ).all())
+        return {route_id: max(int(total or 0) - riding.get(route_id, 0), 0) for route_id, total in seats.items()}
+
+    def plan(self, db: Session) -> AssignmentPlan:
+        """Compute assignments without writing them."""
+        students = db.execute(
+            select(Student.id, Student.route_id, Student.home_latitude, Student.home_longitude)
+            .where(Student.status == "active")
+            .where(Student.home_latitude.isnot(None), Student.home_longitude.isnot(None))
+            .order_by(Student.id)
+        ).all()
+        capacity = self.capacities(db)
+        route_ids = sorted(route_id for route_id, seats in capacity.items() if seats > 0)
+        column = {route_id: index for index, route_id in enumerate(route_ids)}
+
+        grid = GridIndex(self.cell_deg)
+        stop_route = {}
+        for stop_id, route_id, latitude, longitude in db.execute(
+            select(RouteStop.id, RouteStop.route_id, RouteStop.latitude, RouteStop.longitude)
+            .where(RouteStop.route_id.in_(route_ids))
+        ):
+            grid.upsert(stop_id, latitude, longitude)
+            stop_route[stop_id] = column[route_id]
+
+        distances = np.full((len(students), len(route_ids)), np.inf)
+        for row, student in enumerate(students):
+            # Hits are sorted by distance, so the first stop of each route is its nearest.
+            for distance, stop_id in reversed(grid.within(student.home_latitude, student.home_longitude,
+                                                          self.max_walk_m)):
+                distances[row, stop_route[stop_id]] = distance
+
+        columns = assign(distances, np.array([capacity[r] for r in route_ids], dtype=int), self.time_budget_ms)
+        return AssignmentPlan(
+            student_ids=[s.id for s in students],
+            current=[s.route_id for s in students],
+            proposed=[route_ids[c] if c != UNASSIGNED else None for c in columns],
+            walk_m=[float(distances[row, c]) if c != UNASSIGNED else None for row, c in enumerate(columns)],
+            capacity=capacity,
+        )
+
+    @staticmethod
+    def apply(db: Session, plan: AssignmentPlan) -> int:
+        """Write changed routes with one bulk UPDATE and commit; returns how many changed."""
+        changes = plan.changes
+        if changes:
+            db.execute(update(Student), [{"id": student_id, "route_id": new} for student_id, _, new in changes])
+        db.commit()
+        dashboard_stats.record_reassigned([(old, new) for _, old, new in changes])
+        return len(changes)
+
+
+settings = get_settings()
+route_assigner = RouteAssigner(
+    max_walk_m=settings.assignment_max_walk_m,
+    cell_deg=settings.spatial_cell_deg,
+    time_budget_ms=settings.assignment_time_budget_ms,
+)
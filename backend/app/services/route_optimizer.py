@@ -0,0 +1,163 @@
+"""Stop-order optimization for routes with a fixed first and last stop."""
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services.eta import haversine
+
+IMPROVEMENT_EPSILON_M = 1e-6
+
+
+def distance_matrix(latitudes, longitudes) -> np.ndarray:
+    """Return great-circle distances in metres between every pair of points given in degrees."""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lng = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return haversine(lat[:, None], lng[:, None], lat[None, :], lng[None, :])
+
+
+def path_length(matrix: np.ndarray, order) -> float:
+    """Return the length of visiting points in `order`."""
+    order = np.asarray(order)
+    return float(matrix[order[:-1], order[1:]].sum()) if len(order) > 1 else 0.0
+
+
+def cheapest_insertion(matrix: np.ndarray) -> list[int]:
+    """
+    Build a path from point 0 to the last point by repeatedly inserting the
+    point that lengthens it least, at the place where it does so.
+    """
+    n = len(matrix)
+    if n <= 2:
+        return list(range(n))
+    path = [0, n - 1]
+    remaining = np.arange(1, n - 1)
+    while len(remaining):
+        tail, head = np.array(path[:-1]), np.array(path[1:])
+        # added[k, e]: extra length of putting remaining[k] on edge e.
+        added = (matrix[tail][:, remaining].T + matrix[remaining][:, head]
+                 - matrix[tail, head][None, :])
+        k, edge = np.unravel_index(np.argmin(added), added.shape)
+        path.insert(edge + 1, int(remaining[k]))
+        remaining = np.delete(remaining, k)
+    return path
+
+
+def two_opt(matrix: np.ndarray, path: list[int], deadline: float) -> list[int]:
+    """
+    Reverse the stretch of the path whose reversal saves most, until none
+    saves anything or the deadline passes; the ends stay in place.
+    """
+    order = np.array(path)
+    n = len(order)
+    if n < 4:
+        return path
+    while time.perf_counter() < deadline:
+        before, first = order[:-2], order[1:-1]  # edge entering position i = 1..n-2
+        last, after = order[1:-1], order[2:]  # edge leaving position j = 1..n-2
+        delta = (matrix[before[:, None], last[None, :]] + matrix[first[:, None], after[None, :]]
+                 - matrix[before, first][:, None] - matrix[last, after][None, :])
+        delta[np.tril_indices(n - 2)] = 0.0  # only j > i
+        i, j = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[i, j] >= -IMPROVEMENT_EPSILON_M:
+            break
+        order[i + 1:j + 2] = order[i + 1:j + 2][::-1]
+    return order.tolist()
+
+
+def or_opt(matrix: np.ndarray, path: list[int], deadline: float, max_segment: int = 3) -> tuple[list[int], bool]:
+    """
+    Move one stretch of up to `max_segment` stops, possibly reversed, to the
+    place where it saves most. Returns the path and whether it changed.
+    """
+    n = len(path)
+    for length in range(1, max_segment + 1):
+        for start in range(1, n - length):
+            if time.perf_counter() >= deadline:
+                return path, False
+            end = start + length  # segment is path[start:end]; path[end] exists as the last point is fixed
+            head, tail = path[start], path[end - 1]
+            removed = (matrix[path[start - 1], head] + matrix[tail, path[end]]
+                       - matrix[path[start - 1], path[end]])
+            rest = np.array(path[:start] + path[end:])
+            left, right = rest[:-1], rest[1:]
+            base = matrix[left, right]
+            forward = matrix[left, head] + matrix[tail, right] - base
+            backward = matrix[left, tail] + matrix[head, right] - base
+            forward[start - 1] = backward[start - 1] = np.inf  # where it came from
+            gain_forward, gain_backward = forward.min(), backward.min()
+            if min(gain_forward, gain_backward) < removed - IMPROVEMENT_EPSILON_M:
+                segment = path[start:end]
+                if gain_backward < gain_forward:
+                    edge, segment = int(backward.argmin()), segment[::-1]
+                else:
+                    edge = int(forward.argmin())
+                rest = rest.tolist()
+                return rest[:edge + 1] + segment + rest[edge + 1:], True
+    return path, False
+
+
+def improve(matrix: np.ndarray, path: list[int], deadline: float) -> list[int]:
+    """Alternate 2-opt and Or-opt until neither helps or the deadline passes."""
+    while True:
+        path = two_opt(matrix, path, deadline)
+        path, moved = or_opt(matrix, path, deadline)
+        if not moved:
+            return path
+
+
+@dataclass(frozen=True)
+class OptimizedOrder:
+    """A proposed visiting order, as positions in the original order."""
+    order: list[int]
+    original_m: float
+    optimized_m: float
+
+    @property
+    def saved_m(self) -> float:
+        """Metres saved over the original order."""
+        return self.original_m - self.optimized_m
+
+    @property
+    def changed(self) -> bool:
+        """Whether the proposed order differs from the original."""
+        return self.order != list(range(len(self.order)))
+
+
+class RouteOptimizer:
+    """
+    Reorders the stops of a route to shorten it, keeping the first stop
+    (the depot) and the last stop (the campus) fixed.
+
+    Distances are great-circle metres from one vectorized haversine call.
+    Both a cheapest-insertion path and the current order are improved by
+    2-opt and Or-opt within the time budget, and the shorter result is
+    proposed; it is never longer than the current order.
+    """
+
+    def __init__(self, time_budget_ms: int = 200):
+        self.time_budget_ms = time_budget_ms
+
+    def optimize(self, latitudes, longitudes, time_budget_ms: int | None = None) -> OptimizedOrder:
+        """Propose an order for points given in their current order."""
+        identity = list(range(len(latitudes)))
+        matrix = distance_matrix(latitudes, longitudes)
+        if len(identity) < 4:  # at most one stop between the fixed ends
+            length = path_length(matrix, identity)
+            return OptimizedOrder(identity, length, length)
+        budget = (self.time_budget_ms if time_budget_ms is None else time_budget_ms) / 1000.0
+        started = time.perf_counter()
+        original_m = path_length(matrix, identity)
+        # The constructed path gets the first half of the budget, the current order the rest.
+        best = improve(matrix, cheapest_insertion(matrix), started + budget / 2)
+        best_m = path_length(matrix, best)
+        current = improve(matrix, identity, started + budget)
+        if path_length(matrix, current) < best_m:
+            best, best_m = current, path_length(matrix, current)
+        if best_m >= original_m - IMPROVEMENT_EPSILON_M:
+            return OptimizedOrder(identity, original_m, original_m)
+        return OptimizedOrder(best, original_m, best_m)
+
+
+route_optimizer = RouteOptimizer(time_budget_ms=get_settings().route_optimizer_time_budget_ms)
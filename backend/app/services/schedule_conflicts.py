@@ -0,0 +1,312 @@
+"""Bus double-booking detection over schedule intervals."""
+import heapq
+import random
+import threading
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Schedule, ScheduleStopTime
+from app.services.timetable import MINUTES_PER_DAY, WEEKDAYS
+
+MINUTES_PER_WEEK = MINUTES_PER_DAY * len(WEEKDAYS)
+
+
+@dataclass(frozen=True, slots=True)
+class Interval:
+    """A bus being busy from `start` to `end` (exclusive), in minutes after Monday midnight."""
+    start: int
+    end: int
+    schedule_id: Optional[int]
+
+
+def week_intervals(schedule_id: Optional[int], departure_minute: int, days_mask: int, duration: int) -> list[Interval]:
+    """Return the intervals a schedule occupies in a week, splitting trips that run past Sunday."""
+    intervals = []
+    for day in range(len(WEEKDAYS)):
+        if not days_mask & (1 << day):
+            continue
+        start = day * MINUTES_PER_DAY + departure_minute
+        end = start + max(duration, 1)
+        if end <= MINUTES_PER_WEEK:
+            intervals.append(Interval(start, end, schedule_id))
+        else:
+            intervals.append(Interval(start, MINUTES_PER_WEEK, schedule_id))
+            intervals.append(Interval(0, end - MINUTES_PER_WEEK, schedule_id))
+    return intervals
+
+
+class _Node:
+    __slots__ = ("interval", "priority", "max_end", "left", "right")
+
+    def __init__(self, interval: Interval):
+        self.interval = interval
+        self.priority = random.random()
+        self.max_end = interval.end
+        self.left: Optional[_Node] = None
+        self.right: Optional[_Node] = None
+
+    def update(self) -> None:
+        self.max_end = max(
+            self.interval.end,
+            self.left.max_end if self.left else 0,
+            self.right.max_end if self.right else 0,
+        )
+
+
+def _key(interval: Interval) -> tuple[int, int, int]:
+    return interval.start, interval.schedule_id, interval.end
+
+
+class IntervalTree:
+    """
+    Intervals in a treap ordered by start, each node holding its subtree's
+    largest end.
+
+    Insert and delete take O(log n) expected time; finding the intervals
+    that overlap a query takes O(log n + k) because subtrees ending before
+    the query starts, or starting after it ends, are skipped.
+    """
+
+    def __init__(self):
+        self._root: Optional[_Node] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def _split(cls, node: Optional[_Node], key: tuple) -> tuple[Optional[_Node], Optional[_Node]]:
+        """Split into nodes with keys < `key` and nodes with keys >= `key`."""
+        if node is None:
+            return None, None
+        if _key(node.interval) < key:
+            node.right, right = cls._split(node.right, key)
+            node.update()
+            return node, right
+        left, node.left = cls._split(node.left, key)
+        node.update()
+        return left, node
+
+    @classmethod
+    def _merge(cls, left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+        if left is None or right is None:
+            return left or right
+        if left.priority > right.priority:
+            left.right = cls._merge(left.right, right)
+            left.update()
+            return left
+        right.left = cls._merge(left, right.left)
+        right.update()
+        return right
+
+    def add(self, interval: Interval) -> None:
+        """Insert an interval."""
+        left, right = self._split(self._root, _key(interval))
+        self._root = self._merge(self._merge(left, _Node(interval)), right)
+        self._size += 1
+
+    def remove(self, interval: Interval) -> bool:
+        """Delete an interval; returns False if it was not stored."""
+        key = _key(interval)
+        left, rest = self._split(self._root, key)
+        middle, right = self._split(rest, (key[0], key[1], key[2] + 1))
+        removed = middle is not None
+        if removed:
+            middle = self._merge(middle.left, middle.right)
+            self._size -= 1
+        self._root = self._merge(self._merge(left, middle), right)
+        return removed
+
+    def overlapping(self, start: int, end: int) -> Iterator[Interval]:
+        """Yield stored intervals overlapping [start, end)."""
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end <= start:
+                continue
+            stack.append(node.left)
+            if node.interval.start < end:
+                if node.interval.end > start:
+                    yield node.interval
+                stack.append(node.right)
+
+
+@dataclass(frozen=True)
+class Conflict:
+    """Two schedules keeping the same bus busy at the same time."""
+    bus_id: int
+    schedule_ids: tuple[int, ...]  # just the booked schedule when checking a new one
+    day: str
+    start_minute: int  # overlap, in minutes after that day's midnight
+    end_minute: int
+
+    def to_dict(self) -> dict:
+        """Return the conflict as a JSON-friendly dict."""
+        return {
+            "bus_id": self.bus_id,
+            "schedule_ids": list(self.schedule_ids),
+            "day": self.day,
+            "start_minute": self.start_minute,
+            "end_minute": self.end_minute,
+        }
+
+
+def _conflict(bus_id: int, first: Interval, second: Interval) -> Conflict:
+    start, end = max(first.start, second.start), min(first.end, second.end)
+    day = start // MINUTES_PER_DAY
+    ids = tuple(sorted({first.schedule_id, second.schedule_id} - {None}))
+    return Conflict(bus_id, ids, WEEKDAYS[day], start - day * MINUTES_PER_DAY, end - day * MINUTES_PER_DAY)
+
+
+class ScheduleConflicts:
+    """
+    Per-bus interval trees of the week minutes each active schedule occupies.
+
+    A schedule occupies its bus from departure until the last stop's
+    generated arrival plus a turnaround buffer, on each of its days. Since
+    every driver drives one bus, a bus conflict is also a driver conflict.
+    Checks run on the single writer thread before the schedule is saved,
+    so check-then-write cannot race.
+    """
+
+    def __init__(self, turnaround_minutes: int = 10, default_duration_minutes: int = 60):
+        self.turnaround_minutes = turnaround_minutes
+        self.default_duration_minutes = default_duration_minutes
+        self._lock = threading.Lock()
+        self._trees: dict[int, IntervalTree] = {}
+        self._placed: dict[int, tuple[int, list[Interval]]] = {}  # schedule id -> (bus id, intervals)
+
+    def duration(self, trip_minutes: Optional[int]) -> int:
+        """Return how long a trip keeps its bus, given its generated travel time."""
+        if trip_minutes is None:
+            return self.default_duration_minutes
+        return trip_minutes + self.turnaround_minutes
+
+    @staticmethod
+    def trip_minutes(db: Session, schedule_ids: Optional[list[int]] = None) -> dict[int, int]:
+        """Return departure-to-last-stop minutes of schedules that have stop times."""
+        query = (
+            db.query(ScheduleStopTime.schedule_id,
+                     func.max(ScheduleStopTime.arrival_minute) - func.min(ScheduleStopTime.arrival_minute))
+            .group_by(ScheduleStopTime.schedule_id)
+        )
+        if schedule_ids is not None:
+            query = query.filter(ScheduleStopTime.schedule_id.in_(schedule_ids))
+        return dict(query.all())
+
+    def load(self, db: Session) -> None:
+        """Rebuild every tree from the active, compiled schedules."""
+        trips = self.trip_minutes(db)
+        with self._lock:
+            self._trees.clear()
+            self._placed.clear()
+            for schedule in db.query(Schedule).filter(
+                Schedule.status == "active", Schedule.departure_minute.isnot(None), Schedule.days_mask.isnot(None)
+            ):
+                self._place(schedule, self.duration(trips.get(schedule.id)))
+
+    def _place(self, schedule: Schedule, duration: int) -> None:
+        intervals = week_intervals(schedule.id, schedule.departure_minute, schedule.days_mask, duration)
+        tree = self._trees.setdefault(schedule.bus_id, IntervalTree())
+        for interval in intervals:
+            tree.add(interval)
+        self._placed[schedule.id] = (schedule.bus_id, intervals)
+
+    def _unplace(self, schedule_id: int) -> None:
+        placed = self._placed.pop(schedule_id, None)
+        if placed is None:
+            return
+        bus_id, intervals = placed
+        tree = self._trees[bus_id]
+        for interval in intervals:
+            tree.remove(interval)
+
+    def check(self, bus_id: int, departure_minute: int, days_mask: int, duration: int,
+              schedule_id: Optional[int] = None) -> list[Conflict]:
+        """Return conflicts a schedule would have on `bus_id`, ignoring its own stored intervals."""
+        candidate = week_intervals(schedule_id, departure_minute, days_mask, duration)
+        conflicts = {}
+        with self._lock:
+            tree = self._trees.get(bus_id)
+            if tree is None:
+                return []
+            for interval in candidate:
+                for other in tree.overlapping(interval.start, interval.end):
+                    if other.schedule_id != schedule_id:
+                        conflict = _conflict(bus_id, interval, other)
+                        conflicts[(other.schedule_id, conflict.day, conflict.start_minute)] = conflict
+        return list(conflicts.values())
+
+    def set(self, schedule: Schedule) -> None:
+        """Add or replace a schedule loaded with its stop times; inactive or uncompiled schedules are removed."""
+        trip = schedule.stop_times[-1].arrival_minute - schedule.stop_times[0].arrival_minute \
+            if schedule.stop_times else None
+        with self._lock:
+            self._unplace(schedule.id)
+            if self._placeable(schedule):
+                self._place(schedule, self.duration(trip))
+
+    @staticmethod
+    def _placeable(schedule: Schedule) -> bool:
+        return schedule.status == "active" and schedule.departure_minute is not None and schedule.days_mask is not None
+
+    def refresh(self, db: Session, schedule_ids: list[int]) -> None:
+        """Re-read schedules, such as after a write or a change to their route's stop times."""
+        schedules = db.query(Schedule).filter(Schedule.id.in_(schedule_ids)).all() if schedule_ids else []
+        trips = self.trip_minutes(db, [s.id for s in schedules])
+        with self._lock:
+            for schedule_id in schedule_ids:
+                self._unplace(schedule_id)
+            for schedule in schedules:
+                if self._placeable(schedule):
+                    self._place(schedule, self.duration(trips.get(schedule.id)))
+
+    def refresh_routes(self, db: Session, route_ids: list[int]) -> None:
+        """Re-read every schedule of the given routes."""
+        self.refresh(db, list(db.scalars(select(Schedule.id).where(Schedule.route_id.in_(route_ids)))))
+
+    def remove(self, schedule_id: int) -> None:
+        """Forget a deleted schedule."""
+        with self._lock:
+            self._unplace(schedule_id)
+
+    def audit(self) -> list[Conflict]:
+        """
+        Report every pair of overlapping schedules on the same bus.
+
+        One sweep per bus over its intervals sorted by start, keeping a heap
+        of the intervals still running: O(n log n + k) for n intervals and
+        k conflicts.
+        """
+        with self._lock:
+            by_bus: dict[int, list[Interval]] = {}
+            for bus_id, intervals in self._placed.values():
+                by_bus.setdefault(bus_id, []).extend(intervals)
+
+        conflicts = []
+        for bus_id, intervals in sorted(by_bus.items()):
+            running: list[tuple[int, int, Interval]] = []
+            for interval in sorted(intervals, key=_key):
+                while running and running[0][0] <= interval.start:
+                    heapq.heappop(running)
+                for _, _, other in running:
+                    if other.schedule_id != interval.schedule_id:
+                        conflicts.append(_conflict(bus_id, other, interval))
+                heapq.heappush(running, (interval.end, id(interval), interval))
+        return conflicts
+
+    def stats(self) -> dict:
+        """Return how many schedules and buses are tracked."""
+        with self._lock:
+            return {"schedules": len(self._placed), "buses": len(self._trees)}
+
+
+settings = get_settings()
+schedule_conflicts = ScheduleConflicts(
+    turnaround_minutes=settings.schedule_turnaround_minutes,
+    default_duration_minutes=settings.schedule_default_duration_minutes,
+)
@@ -0,0 +1,236 @@
+"""In-memory spatial index over route stops and live bus positions."""
+import math
+import threading
+from typing import Iterator, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Route, RouteStop
+from app.services.eta import haversine
+
+METRES_PER_DEGREE = 111194.9
+
+
+class GridIndex:
+    """
+    Uniform lat/lng grid mapping keys to points.
+
+    Points are bucketed into square cells of `cell_deg` degrees, so inserts,
+    moves and removals are O(1) and queries only look at nearby cells.
+    Updates and queries hold a lock, so points can be moved from another
+    thread while queries run.
+    """
+
+    def __init__(self, cell_deg: float = 0.01):
+        self.cell_deg = cell_deg
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._points: dict[int, tuple[float, float]] = {}
+        self._where: dict[int, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        """Return the cell containing a point."""
+        return math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg)
+
+    def upsert(self, key: int, latitude: float, longitude: float) -> None:
+        """Insert a point or move an existing one."""
+        cell = self.cell(latitude, longitude)
+        with self._lock:
+            previous = self._where.get(key)
+            if previous != cell:
+                if previous is not None:
+                    self._discard(previous, key)
+                self._cells.setdefault(cell, set()).add(key)
+                self._where[key] = cell
+            self._points[key] = (latitude, longitude)
+
+    def remove(self, key: int) -> None:
+        """Remove a point if present."""
+        with self._lock:
+            cell = self._where.pop(key, None)
+            if cell is not None:
+                self._discard(cell, key)
+                del self._points[key]
+
+    def _discard(self, cell: tuple[int, int], key: int) -> None:
+        members = self._cells[cell]
+        members.discard(key)
+        if not members:
+            del self._cells[cell]
+
+    def _ring(self, ci: int, cj: int, r: int) -> Iterator[tuple[int, int]]:
+        """Yield the cells at Chebyshev distance `r` from (ci, cj)."""
+        if r == 0:
+            yield ci, cj
+            return
+        for j in range(cj - r, cj + r + 1):
+            yield ci - r, j
+            yield ci + r, j
+        for i in range(ci - r + 1, ci + r):
+            yield i, cj - r
+            yield i, cj + r
+
+    def _measure(self, latitude: float, longitude: float, keys: list[int]) -> list[tuple[float, int]]:
+        """Return (distance in metres, key) for every key, sorted by distance."""
+        if not keys:
+            return []
+        coords = np.radians(np.array([self._points[k] for k in keys], dtype=np.float64))
+        distances = haversine(math.radians(latitude), math.radians(longitude), coords[:, 0], coords[:, 1])
+        return sorted(zip(distances.tolist(), keys))
+
+    def nearest(self, latitude: float, longitude: float, k: int) -> list[tuple[float, int]]:
+        """Return the `k` closest points as (distance in metres, key)."""
+        with self._lock:
+            return self._nearest(latitude, longitude, k)
+
+    def _nearest(self, latitude: float, longitude: float, k: int) -> list[tuple[float, int]]:
+        if k <= 0 or not self._points:
+            return []
+        ci, cj = self.cell(latitude, longitude)
+        ring_m = self.cell_deg * METRES_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+
+        keys: list[int] = []
+        r = 0
+        while True:
+            if 8 * r > len(self._cells):
+                # Remaining rings are mostly empty; finish with a full scan.
+                return self._measure(latitude, longitude, list(self._points))[:k]
+            for cell in self._ring(ci, cj, r):
+                keys.extend(self._cells.get(cell, ()))
+            if len(keys) >= k:
+                found = self._measure(latitude, longitude, keys)
+                # Rings 0..r cover every point closer than r full cells.
+                if found[k - 1][0] <= r * ring_m:
+                    return found[:k]
+            r += 1
+
+    def within(self, latitude: float, longitude: float, radius_m: float) -> list[tuple[float, int]]:
+        """Return every point within `radius_m` metres as (distance, key)."""
+        with self._lock:
+            return self._within(latitude, longitude, radius_m)
+
+    def _within(self, latitude: float, longitude: float, radius_m: float) -> list[tuple[float, int]]:
+        if radius_m < 0 or not self._points:
+            return []
+        dlat = radius_m / METRES_PER_DEGREE
+        dlng = dlat / max(math.cos(math.radians(latitude)), 0.01)
+        imin, jmin = self.cell(latitude - dlat, longitude - dlng)
+        imax, jmax = self.cell(latitude + dlat, longitude + dlng)
+
+        keys: list[int] = []
+        if (imax - imin + 1) * (jmax - jmin + 1) > len(self._cells):
+            keys = list(self._points)
+        else:
+            for i in range(imin, imax + 1):
+                for j in range(jmin, jmax + 1):
+                    keys.extend(self._cells.get((i, j), ()))
+        return [hit for hit in self._measure(latitude, longitude, keys) if hit[0] <= radius_m]
+
+
+class StopEntry:
+    """Indexed copy of a route stop."""
+    __slots__ = ("stop_id", "route_id", "stop_name", "latitude", "longitude", "order")
+
+    def __init__(self, stop: RouteStop):
+        self.stop_id = stop.id
+        self.route_id = stop.route_id
+        self.stop_name = stop.stop_name
+        self.latitude = stop.latitude
+        self.longitude = stop.longitude
+        self.order = stop.order
+
+
+class SpatialIndex:
+    """
+    Grid indexes of route stops and live bus positions.
+
+    Routes are re-indexed from the writer thread while stop queries run on
+    the event loop, so route updates and stop queries share a lock and a
+    query never sees a route half replaced.
+    """
+
+    def __init__(self, cell_deg: float = 0.01):
+        self.stops = GridIndex(cell_deg)
+        self.buses = GridIndex(cell_deg)
+        self._stops: dict[int, StopEntry] = {}
+        self._route_stops: dict[int, list[int]] = {}
+        self._route_names: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> None:
+        """Index every stop in the database."""
+        names = dict(db.query(Route.id, Route.route_name).all())
+        entries = [StopEntry(stop) for stop in db.query(RouteStop).all()]
+        with self._lock:
+            self._route_names = names
+            for entry in entries:
+                self._add_stop(entry)
+
+    def _add_stop(self, entry: StopEntry) -> None:
+        self._stops[entry.stop_id] = entry
+        self._route_stops.setdefault(entry.route_id, []).append(entry.stop_id)
+        self.stops.upsert(entry.stop_id, entry.latitude, entry.longitude)
+
+    def set_route(self, route: Route) -> None:
+        """Replace the indexed stops of a route with its current stops."""
+        entries = [StopEntry(stop) for stop in route.stops]
+        with self._lock:
+            self._remove_route(route.id)
+            self._route_names[route.id] = route.route_name
+            for entry in entries:
+                self._add_stop(entry)
+
+    def remove_route(self, route_id: int) -> None:
+        """Drop every stop of a route from the index."""
+        with self._lock:
+            self._remove_route(route_id)
+
+    def _remove_route(self, route_id: int) -> None:
+        for stop_id in self._route_stops.pop(route_id, []):
+            self._stops.pop(stop_id, None)
+            self.stops.remove(stop_id)
+        self._route_names.pop(route_id, None)
+
+    def move_bus(self, bus_id: int, latitude: float, longitude: float) -> None:
+        """Record the latest position of a bus."""
+        self.buses.upsert(bus_id, latitude, longitude)
+
+    def remove_bus(self, bus_id: int) -> None:
+        """Forget a bus."""
+        self.buses.remove(bus_id)
+
+    def get_stop(self, stop_id: int) -> Optional[StopEntry]:
+        """Return an indexed stop."""
+        return self._stops.get(stop_id)
+
+    def nearest_stops(self, latitude: float, longitude: float, k: int) -> list[dict]:
+        """Return the `k` stops closest to a point, described."""
+        with self._lock:
+            return [self.describe_stop(*hit) for hit in self.stops.nearest(latitude, longitude, k)]
+
+    def stops_within(self, latitude: float, longitude: float, radius_m: float) -> list[dict]:
+        """Return every stop within `radius_m` metres of a point, described."""
+        with self._lock:
+            return [self.describe_stop(*hit) for hit in self.stops.within(latitude, longitude, radius_m)]
+
+    def describe_stop(self, distance_m: float, stop_id: int) -> dict:
+        """Return a stop hit as a JSON-friendly dict."""
+        entry = self._stops[stop_id]
+        return {
+            "stop_id": entry.stop_id,
+            "route_id": entry.route_id,
+            "route_name": self._route_names.get(entry.route_id, ""),
+            "stop_name": entry.stop_name,
+            "latitude": entry.latitude,
+            "longitude": entry.longitude,
+            "order": entry.order,
+            "distance_m": round(distance_m, 1),
+        }
+
+
+spatial_index = SpatialIndex(cell_deg=get_settings().spatial_cell_deg)
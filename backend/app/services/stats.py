@@ -0,0 +1,214 @@
+"""Dashboard counters maintained incrementally from ORM events."""
+import asyncio
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import get_settings
+from app.core.database import ReadSessionLocal, SessionLocal
+from app.models.models import Bus, Driver, Route, Student
+
+TOTALS = {Bus: "total_buses", Route: "total_routes", Student: "total_students", Driver: "total_drivers"}
+ACTIVE = {Bus: "active_buses", Driver: "active_drivers"}
+
+_PENDING_KEY = "dashboard_stats_deltas"
+
+
+def _load_previous(target, value, oldvalue, initiator) -> None:
+    pass
+
+
+# Tracked attributes load their committed value before being overwritten, so
+# flush history knows the old status even when the instance was expired.
+for _attribute in (Bus.status, Driver.status, Student.route_id):
+    event.listen(_attribute, "set", _load_previous, active_history=True)
+
+
+def _status_change(obj) -> tuple[Optional[str], Optional[str]]:
+    """Return the (old, new) status of a flushed object."""
+    history = inspect(obj).attrs.status.history
+    if not history.has_changes():
+        return obj.status, obj.status
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    return old, new
+
+
+def _route_change(student: Student) -> tuple[Optional[int], Optional[int]]:
+    """Return the (old, new) route of a flushed student."""
+    history = inspect(student).attrs.route_id.history
+    if not history.has_changes():
+        return student.route_id, student.route_id
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    return old, new
+
+
+class DashboardCounters:
+    """
+    In-memory dashboard counters.
+
+    Sessions created by a registered session factory record per-flush deltas
+    for inserted, deleted and status-changed rows; the deltas are applied
+    when the transaction commits and discarded on rollback. `reconcile`
+    recounts everything from the database to correct drift from writes that
+    bypass the ORM unit of work.
+    """
+
+    def __init__(self, reconcile_interval: float = 300.0):
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+        self._students_per_route: Counter = Counter()
+        self.reconciled_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # Event wiring
+    def register(self, session_factory: sessionmaker) -> None:
+        """Track commits made through sessions of `session_factory`."""
+        event.listen(session_factory, "after_flush", self._after_flush)
+        event.listen(session_factory, "after_commit", self._after_commit)
+        event.listen(session_factory, "after_rollback", self._after_rollback)
+
+    def _after_flush(self, session: Session, flush_context) -> None:
+        deltas: Counter = session.info.setdefault(_PENDING_KEY, Counter())
+        for obj in session.new:
+            self._count(deltas, obj, 1)
+        for obj in session.deleted:
+            self._count(deltas, obj, -1)
+        for obj in session.dirty:
+            if type(obj) in ACTIVE:
+                old, new = _status_change(obj)
+                if old != new:
+                    deltas[ACTIVE[type(obj)]] += (new == "active") - (old == "active")
+            if isinstance(obj, Student):
+                old, new = _route_change(obj)
+                if old != new:
+                    if old is not None:
+                        deltas[("route", old)] -= 1
+                    if new is not None:
+                        deltas[("route", new)] += 1
+
+    def _count(self, deltas: Counter, obj, sign: int) -> None:
+        kind = type(obj)
+        if kind not in TOTALS:
+            return
+        deltas[TOTALS[kind]] += sign
+        if kind in ACTIVE:
+            status = obj.status if sign > 0 else _status_change(obj)[0]
+            if status == "active":
+                deltas[ACTIVE[kind]] += sign
+        if kind is Student:
+            route_id = obj.route_id if sign > 0 else _route_change(obj)[0]
+            if route_id is not None:
+                deltas[("route", route_id)] += sign
+
+    def _after_commit(self, session: Session) -> None:
+        deltas = session.info.pop(_PENDING_KEY, None)
+        if deltas:
+            self.apply(deltas)
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.pop(_PENDING_KEY, None)
+
+    # Counters
+    def apply(self, deltas: Counter) -> None:
+        """Add committed deltas to the counters."""
+        with self._lock:
+            for key, delta in deltas.items():
+                if isinstance(key, tuple):
+                    self._students_per_route[key[1]] += delta
+                    if self._students_per_route[key[1]] <= 0:
+                        del self._students_per_route[key[1]]
+                else:
+                    self._counts[key] += delta
+
+    def record_inserted(self, model, rows: list[dict]) -> None:
+        """Count rows of `model` committed by a bulk INSERT, which emits no flush events."""
+        deltas: Counter = Counter({TOTALS[model]: len(rows)})
+        for row in rows:
+            if model in ACTIVE and row.get("status", "active") == "active":
+                deltas[ACTIVE[model]] += 1
+            if model is Student and row.get("route_id") is not None:
+                deltas[("route", row["route_id"])] += 1
+        self.apply(deltas)
+
+    def record_reassigned(self, moves: list[tuple[Optional[int], Optional[int]]]) -> None:
+        """Count students moved between routes by a bulk UPDATE, given as (old route, new route)."""
+        deltas: Counter = Counter()
+        for old, new in moves:
+            if old is not None:
+                deltas[("route", old)] -= 1
+            if new is not None:
+                deltas[("route", new)] += 1
+        self.apply(deltas)
+
+    def reconcile(self, db: Session) -> None:
+        """Recount every counter from the database."""
+        counts = Counter({
+            "total_buses": db.query(func.count(Bus.id)).scalar(),
+            "total_routes": db.query(func.count(Route.id)).scalar(),
+            "total_students": db.query(func.count(Student.id)).scalar(),
+            "total_drivers": db.query(func.count(Driver.id)).scalar(),
+            "active_buses": db.query(func.count(Bus.id)).filter(Bus.status == "active").scalar(),
+            "active_drivers": db.query(func.count(Driver.id)).filter(Driver.status == "active").scalar(),
+        })
+        per_route = Counter(dict(
+            db.query(Student.route_id, func.count(Student.id))
+            .filter(Student.route_id.isnot(None))
+            .group_by(Student.route_id)
+            .all()
+        ))
+        with self._lock:
+            self._counts = counts
+            self._students_per_route = per_route
+            self.reconciled_at = datetime.utcnow()
+
+    def snapshot(self) -> dict:
+        """Return every counter."""
+        with self._lock:
+            return {
+                "total_buses": self._counts["total_buses"],
+                "total_routes": self._counts["total_routes"],
+                "total_students": self._counts["total_students"],
+                "total_drivers": self._counts["total_drivers"],
+                "active_buses": self._counts["active_buses"],
+                "active_drivers": self._counts["active_drivers"],
+                "students_per_route": dict(self._students_per_route),
+            }
+
+    # Background reconciliation
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            db = ReadSessionLocal()
+            try:
+                await asyncio.to_thread(self.reconcile, db)
+            except Exception as exc:
+                print(f"⚠️ Dashboard stats reconciliation failed: {exc}")
+            finally:
+                db.close()
+
+    def start(self) -> None:
+        """Start periodic reconciliation on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop periodic reconciliation."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+settings = get_settings()
+dashboard_stats = DashboardCounters(reconcile_interval=settings.stats_reconcile_interval)
+dashboard_stats.register(SessionLocal)
@@ -0,0 +1,161 @@
+"""Per-stop arrival times generated from schedules and route geometry."""
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import get_settings
+from app.models.models import Route, Schedule, ScheduleStopTime, SegmentSpeed
+from app.services.eta import RouteGeometry
+
+
+class StopTimeGenerator:
+    """
+    Materializes when each schedule reaches each stop of its route.
+
+    Segment travel times come from `segment_speeds` where a speed is known
+    for that pair of stops and from the default speed otherwise, plus a
+    fixed dwell at every intermediate stop. Only active schedules get stop
+    times. Regeneration is incremental: it
+    recomputes only the schedules of the given ids, routes or buses, each
+    route's geometry and speeds being loaded once for all of its schedules.
+    """
+
+    def __init__(self, default_speed_kmh: float = 25.0, dwell_seconds: int = 30):
+        self.default_speed_kmh = default_speed_kmh
+        self.dwell_seconds = dwell_seconds
+
+    def offsets(self, geometry: RouteGeometry, speeds: dict[tuple[int, int], float]) -> np.ndarray:
+        """Return seconds from departure to the arrival at each stop."""
+        if not geometry.stop_ids:
+            return np.zeros(0)
+        speed_kmh = np.array([
+            speeds.get(pair, self.default_speed_kmh)
+            for pair in zip(geometry.stop_ids[:-1], geometry.stop_ids[1:])
+        ], dtype=np.float64)
+        travel = geometry.segment_m / (np.maximum(speed_kmh, 1.0) / 3.6)
+        dwell = np.full(len(travel), float(self.dwell_seconds))
+        if len(dwell):
+            dwell[0] = 0.0  # no dwell at the starting point
+        return np.concatenate(([0.0], np.cumsum(travel + dwell)))
+
+    def _route_offsets(self, db: Session, route_ids: set[int]) -> dict[int, tuple[list[int], list[int], np.ndarray]]:
+        routes = db.query(Route).options(selectinload(Route.stops)).filter(Route.id.in_(route_ids)).all()
+        stop_ids = [stop.id for route in routes for stop in route.stops]
+        speeds = {
+            (row.from_stop_id, row.to_stop_id): row.speed_kmh
+            for row in db.query(SegmentSpeed).filter(SegmentSpeed.from_stop_id.in_(stop_ids))
+        } if stop_ids else {}
+        result = {}
+        for route in routes:
+            geometry = RouteGeometry(route.id, route.route_name, list(route.stops))
+            result[route.id] = (geometry.stop_ids, geometry.orders, self.offsets(geometry, speeds))
+        return result
+
+    def route_minutes(self, db: Session, route_id: int) -> int | None:
+        """Return minutes from departure to the last stop of a route, or None if it has no stops."""
+        _, _, offsets = self._route_offsets(db, {route_id}).get(route_id, ([], [], np.zeros(0)))
+        return int(np.rint(offsets[-1] / 60.0)) if len(offsets) else None
+
+    def regenerate(self, db: Session, schedule_ids: Iterable[int] = (), route_ids: Iterable[int] = (),
+                   bus_ids: Iterable[int] = ()) -> int:
+        """
+        Recompute stop times of the matching schedules without committing.
+
+        Returns the number of stop time rows written.
+        """
+        schedule_ids, route_ids, bus_ids = set(schedule_ids), set(route_ids), set(bus_ids)
+        if not (schedule_ids or route_ids or bus_ids):
+            return 0
+        condition = Schedule.id.in_(schedule_ids) | Schedule.route_id.in_(route_ids) | Schedule.bus_id.in_(bus_ids)
+        schedules = db.execute(
+            select(Schedule.id, Schedule.route_id, Schedule.departure_minute, Schedule.days_mask, Schedule.status)
+            .where(condition)
+        ).all()
+        # Explicit ids are cleared even if they no longer match, such as schedules deleted meanwhile.
+        stale = schedule_ids | {s.id for s in schedules}
+        if not stale:
+            return 0
+        db.execute(delete(ScheduleStopTime).where(ScheduleStopTime.schedule_id.in_(stale)))
+
+        routes = self._route_offsets(db, {s.route_id for s in schedules})
+        rows = []
+        for schedule in schedules:
+            if (schedule.status != "active" or schedule.departure_minute is None
+                    or schedule.days_mask is None or schedule.route_id not in routes):
+                continue
+            stop_ids, orders, offsets = routes[schedule.route_id]
+            minutes = schedule.departure_minute + np.rint(offsets / 60.0).astype(int)
+            rows.extend(
+                {
+                    "schedule_id": schedule.id,
+                    "stop_id": stop_id,
+                    "stop_order": order,
+                    "arrival_minute": int(minute),
+                    "days_mask": schedule.days_mask,
+                }
+                for stop_id, order, minute in zip(stop_ids, orders, minutes)
+            )
+        if rows:
+            db.execute(insert(ScheduleStopTime), rows)
+        for obj in list(db.identity_map.values()):
+            if isinstance(obj, Schedule):
+                db.expire(obj, ["stop_times"])
+        return len(rows)
+
+    def generate_missing(self, db: Session) -> int:
+        """Generate and commit stop times for compiled, active schedules that have none."""
+        missing = db.scalars(
+            select(Schedule.id)
+            .where(Schedule.departure_minute.isnot(None), Schedule.status == "active")
+            .where(~Schedule.id.in_(select(ScheduleStopTime.schedule_id)))
+        ).all()
+        written = self.regenerate(db, schedule_ids=missing)
+        db.commit()
+        return written
+
+    @staticmethod
+    def arrivals(db: Session, stop_id: int, day: int, start: int, end: int) -> list[ScheduleStopTime]:
+        """
+        Return arrivals at a stop on weekday `day` between minutes `start` and `end`.
+
+        Trips that left the day before and pass midnight are included; their
+        `arrival_minute` is 1440 or more.
+        """
+        previous = (day - 1) % 7
+        rows = (
+            db.query(ScheduleStopTime)
+            .filter(ScheduleStopTime.stop_id == stop_id)
+            .filter(or_(
+                and_(ScheduleStopTime.arrival_minute.between(start, end),
+                     ScheduleStopTime.days_mask.op("&")(1 << day) != 0),
+                and_(ScheduleStopTime.arrival_minute.between(start + 1440, end + 1440),
+                     ScheduleStopTime.days_mask.op("&")(1 << previous) != 0),
+            ))
+            .all()
+        )
+        return sorted(rows, key=lambda row: row.arrival_minute % 1440)
+
+
+def set_segment_speeds(db: Session, speeds: list[dict]) -> None:
+    """Insert or replace segment speeds given as from_stop_id, to_stop_id and speed_kmh, without committing."""
+    for speed in speeds:
+        db.merge(SegmentSpeed(**speed))
+    db.flush()
+
+
+def delete_segment_speeds(db: Session, stop_ids: Iterable[int]) -> None:
+    """Delete the segment speeds starting or ending at any of `stop_ids`, without committing."""
+    stop_ids = list(stop_ids)
+    if stop_ids:
+        db.execute(delete(SegmentSpeed).where(
+            or_(SegmentSpeed.from_stop_id.in_(stop_ids), SegmentSpeed.to_stop_id.in_(stop_ids))
+        ))
+
+
+settings = get_settings()
+stop_times = StopTimeGenerator(
+    default_speed_kmh=settings.eta_default_speed_kmh,
+    dwell_seconds=settings.timetable_dwell_seconds,
+)
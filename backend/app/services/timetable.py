@@ -0,0 +1,189 @@
+"""Compiled schedule times and an in-memory departure timetable."""
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.models import Schedule
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+ALL_DAYS = (1 << len(WEEKDAYS)) - 1
+MINUTES_PER_DAY = 24 * 60
+
+_DAY_BITS = {}
+for _index, _name in enumerate(WEEKDAYS):
+    _DAY_BITS[_name.lower()] = 1 << _index
+    _DAY_BITS[_name[:3].lower()] = 1 << _index
+_DAY_BITS.update({"weekdays": 0b0011111, "weekends": 0b1100000, "daily": ALL_DAYS})
+
+_TIME = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$")
+
+
+def parse_days(days: str | Iterable[str]) -> int:
+    """
+    Return the weekday bitmask of day names.
+
+    Accepts full or three-letter names, "Weekdays", "Weekends" and "Daily",
+    as a list or a comma-separated string. Raises ValueError otherwise.
+    """
+    names = days.split(",") if isinstance(days, str) else days
+    mask = 0
+    for name in names:
+        key = name.strip().lower()
+        if not key:
+            continue
+        if key not in _DAY_BITS:
+            raise ValueError(f"Unknown day '{name.strip()}'")
+        mask |= _DAY_BITS[key]
+    if not mask:
+        raise ValueError("At least one day is required")
+    return mask
+
+
+def days_from_mask(mask: int) -> list[str]:
+    """Return the day names set in a bitmask, Monday first."""
+    return [name for index, name in enumerate(WEEKDAYS) if mask & (1 << index)]
+
+
+def parse_departure(text: str) -> int:
+    """Return minutes after midnight of "07:00 AM", "7 pm" or "19:30"; raises ValueError."""
+    match = _TIME.match(text)
+    if not match:
+        raise ValueError(f"Invalid time '{text}'")
+    hour, minute, meridiem = int(match[1]), int(match[2] or 0), match[3]
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Invalid time '{text}'")
+        hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Invalid time '{text}'")
+    return hour * 60 + minute
+
+
+def format_departure(minute: int) -> str:
+    """Format minutes after midnight like "07:00 AM"."""
+    hour, minute = divmod(minute % MINUTES_PER_DAY, 60)
+    return f"{(hour - 1) % 12 + 1:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def compile_schedule(schedule: Schedule) -> None:
+    """Fill a schedule's bitmask and minute columns from its text columns."""
+    schedule.days_mask = parse_days(schedule.days_of_week)
+    schedule.departure_minute = parse_departure(schedule.departure_time)
+
+
+def migrate_schedules(db: Session) -> tuple[int, list[int]]:
+    """
+    Compile schedules that predate the bitmask and minute columns.
+
+    Returns how many rows were compiled and the ids of rows whose text could
+    not be parsed; those stay uncompiled and out of the timetable.
+    """
+    compiled, invalid = 0, []
+    pending = db.query(Schedule).filter(
+        (Schedule.days_mask.is_(None)) | (Schedule.departure_minute.is_(None))
+    ).all()
+    for schedule in pending:
+        try:
+            compile_schedule(schedule)
+            compiled += 1
+        except ValueError:
+            invalid.append(schedule.id)
+    db.commit()
+    return compiled, invalid
+
+
+@dataclass(frozen=True, slots=True)
+class Departure:
+    """A timetable entry: a schedule leaving at a minute of a day."""
+    minute: int
+    schedule_id: int
+    route_id: int
+    bus_id: int
+
+
+class TimetableIndex:
+    """
+    Active schedules' departures sorted by minute, one list per weekday.
+
+    "Departures between t0 and t1 on day D" is two binary searches over
+    that day's list. Schedules are added and removed as they are written,
+    so the index never needs a database query after `load`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days: list[list[tuple[int, int]]] = [[] for _ in WEEKDAYS]  # (minute, schedule id)
+        self._entries: dict[int, tuple[Departure, int]] = {}  # schedule id -> (departure, days mask)
+
+    def load(self, db: Session) -> None:
+        """Rebuild the index from every compiled, active schedule."""
+        schedules = db.query(Schedule).filter(
+            Schedule.days_mask.isnot(None), Schedule.departure_minute.isnot(None)
+        ).all()
+        days: list[list[tuple[int, int]]] = [[] for _ in WEEKDAYS]
+        entries = {}
+        for schedule in schedules:
+            if schedule.status != "active":
+                continue
+            entries[schedule.id] = (self._departure(schedule), schedule.days_mask)
+            for day in range(len(WEEKDAYS)):
+                if schedule.days_mask & (1 << day):
+                    days[day].append((schedule.departure_minute, schedule.id))
+        for day_list in days:
+            day_list.sort()
+        with self._lock:
+            self._days, self._entries = days, entries
+
+    @staticmethod
+    def _departure(schedule: Schedule) -> Departure:
+        return Departure(schedule.departure_minute, schedule.id, schedule.route_id, schedule.bus_id)
+
+    def set(self, schedule: Schedule) -> None:
+        """Add or replace a schedule; inactive or uncompiled schedules are removed."""
+        with self._lock:
+            self._remove(schedule.id)
+            if schedule.status != "active" or schedule.days_mask is None or schedule.departure_minute is None:
+                return
+            self._entries[schedule.id] = (self._departure(schedule), schedule.days_mask)
+            for day in range(len(WEEKDAYS)):
+                if schedule.days_mask & (1 << day):
+                    insort(self._days[day], (schedule.departure_minute, schedule.id))
+
+    def remove(self, schedule_id: int) -> None:
+        """Drop a schedule from the index."""
+        with self._lock:
+            self._remove(schedule_id)
+
+    def _remove(self, schedule_id: int) -> None:
+        entry = self._entries.pop(schedule_id, None)
+        if entry is None:
+            return
+        departure, mask = entry
+        for day in range(len(WEEKDAYS)):
+            if mask & (1 << day):
+                day_list = self._days[day]
+                position = bisect_left(day_list, (departure.minute, schedule_id))
+                if position < len(day_list) and day_list[position] == (departure.minute, schedule_id):
+                    del day_list[position]
+
+    def departures(self, day: int, start: int = 0, end: int = MINUTES_PER_DAY - 1,
+                   route_id: Optional[int] = None) -> list[Departure]:
+        """Return departures on weekday `day` (0 = Monday) between minutes `start` and `end` inclusive."""
+        with self._lock:
+            day_list = self._days[day]
+            low = bisect_left(day_list, (start, -1))
+            high = bisect_right(day_list, (end, float("inf")))
+            hits = [self._entries[schedule_id][0] for _, schedule_id in day_list[low:high]]
+        if route_id is not None:
+            hits = [d for d in hits if d.route_id == route_id]
+        return hits
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+timetable = TimetableIndex()
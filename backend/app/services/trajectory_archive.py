@@ -0,0 +1,168 @@
+"""Columnar, memory-mappable archive of daily bus trajectories."""
+import os
+from datetime import date, datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.services.location_history import location_history
+
+MAGIC = b"TRAJ"
+VERSION = 1
+HEADER_DTYPE = np.dtype([("magic", "S4"), ("version", "<u4"), ("bus_count", "<u4"), ("reserved", "<u4")])
+DIRECTORY_DTYPE = np.dtype([("bus_id", "<i8"), ("offset", "<i8"), ("count", "<i8")])
+
+# Column order and dtypes inside each bus block.
+COLUMNS = (
+    ("timestamps", np.dtype("<i8")),  # microseconds since the Unix epoch, UTC
+    ("latitude", np.dtype("<f8")),
+    ("longitude", np.dtype("<f8")),
+    ("speed", np.dtype("<f4")),  # NaN when unknown
+)
+
+
+def _align(offset: int) -> int:
+    """Round up to the next multiple of 8 bytes."""
+    return (offset + 7) & ~7
+
+
+def archive_path(directory: Path, day: date) -> Path:
+    """Return the archive file of a day."""
+    return Path(directory) / f"{day:%Y}" / f"{day:%Y%m%d}.traj"
+
+
+class Trajectory:
+    """Columns of one bus-day, as read-only views into the archive file."""
+    __slots__ = ("bus_id", "day", "timestamps", "latitude", "longitude", "speed")
+
+    def __init__(self, bus_id: int, day: date, timestamps: np.ndarray, latitude: np.ndarray,
+                 longitude: np.ndarray, speed: np.ndarray):
+        self.bus_id = bus_id
+        self.day = day
+        self.timestamps = timestamps
+        self.latitude = latitude
+        self.longitude = longitude
+        self.speed = speed
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def times(self) -> np.ndarray:
+        """Timestamps as a datetime64[us] view."""
+        return self.timestamps.view("datetime64[us]")
+
+
+class ArchiveDay:
+    """A memory-mapped archive file holding every bus trajectory of one day."""
+
+    def __init__(self, path: Path, day: date):
+        self.path = Path(path)
+        self.day = day
+        self._buffer = np.memmap(self.path, dtype=np.uint8, mode="r")
+        header = np.frombuffer(self._buffer, dtype=HEADER_DTYPE, count=1)[0]
+        if header["magic"] != MAGIC or header["version"] != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} trajectory archive")
+        self._directory = np.frombuffer(
+            self._buffer, dtype=DIRECTORY_DTYPE, count=int(header["bus_count"]), offset=HEADER_DTYPE.itemsize
+        )
+        self._slots = {int(bus_id): i for i, bus_id in enumerate(self._directory["bus_id"])}
+
+    @property
+    def bus_ids(self) -> list[int]:
+        """Buses with a trajectory on this day."""
+        return list(self._slots)
+
+    def trajectory(self, bus_id: int) -> Trajectory:
+        """Return the trajectory of a bus without copying its data."""
+        entry = self._directory[self._slots[bus_id]]
+        offset, count = int(entry["offset"]), int(entry["count"])
+        columns = []
+        for _, dtype in COLUMNS:
+            columns.append(np.frombuffer(self._buffer, dtype=dtype, count=count, offset=offset))
+            offset = _align(offset + dtype.itemsize * count)
+        return Trajectory(bus_id, self.day, *columns)
+
+    def __iter__(self) -> Iterator[Trajectory]:
+        for bus_id in self._slots:
+            yield self.trajectory(bus_id)
+
+
+def write_day(path: Path, bus_ids: np.ndarray, timestamps: np.ndarray, latitude: np.ndarray,
+              longitude: np.ndarray, speed: np.ndarray) -> Path:
+    """Write one day of points, sorted by (bus_id, timestamp), as an archive file."""
+    order = np.lexsort((timestamps, bus_ids))
+    bus_ids, timestamps = bus_ids[order], timestamps[order]
+    columns = [timestamps, latitude[order], longitude[order], speed[order]]
+
+    buses, starts, counts = np.unique(bus_ids, return_index=True, return_counts=True)
+    directory = np.zeros(len(buses), dtype=DIRECTORY_DTYPE)
+    directory["bus_id"] = buses
+    directory["count"] = counts
+
+    offset = _align(HEADER_DTYPE.itemsize + DIRECTORY_DTYPE.itemsize * len(buses))
+    for i, count in enumerate(counts):
+        directory["offset"][i] = offset
+        for _, dtype in COLUMNS:
+            offset = _align(offset + dtype.itemsize * int(count))
+
+    header = np.array([(MAGIC, VERSION, len(buses), 0)], dtype=HEADER_DTYPE)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header.tobytes())
+        f.write(directory.tobytes())
+        for i, (start, count) in enumerate(zip(starts, counts)):
+            f.seek(int(directory["offset"][i]))
+            for column, (_, dtype) in zip(columns, COLUMNS):
+                block = column[start:start + count].astype(dtype, copy=False)
+                f.write(block.tobytes())
+                f.seek(_align(f.tell()))
+        f.truncate(offset)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_day(db: Session, day: date, directory: Path, chunk_size: int = 50000) -> Path:
+    """Export every location point of a day from location history."""
+    start = datetime(day.year, day.month, day.day)
+    rows = location_history.iter_rows(db, start, start + timedelta(days=1), chunk_size=chunk_size)
+
+    chunks: list[tuple[np.ndarray, ...]] = []
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            break
+        chunks.append((
+            np.fromiter((r.bus_id for r in batch), dtype=np.int64, count=len(batch)),
+            np.array([r.timestamp for r in batch], dtype="datetime64[us]").astype(np.int64),
+            np.fromiter((r.latitude for r in batch), dtype=np.float64, count=len(batch)),
+            np.fromiter((r.longitude for r in batch), dtype=np.float64, count=len(batch)),
+            np.fromiter(
+                (np.nan if r.speed is None else r.speed for r in batch), dtype=np.float32, count=len(batch)
+            ),
+        ))
+
+    if chunks:
+        columns = [np.concatenate(parts) for parts in zip(*chunks)]
+    else:
+        columns = [np.empty(0, dtype=dtype) for dtype in (np.int64, np.int64, np.float64, np.float64, np.float32)]
+    return write_day(archive_path(directory, day), *columns)
+
+
+def open_day(directory: Path, day: date) -> ArchiveDay:
+    """Memory-map the archive of a day."""
+    return ArchiveDay(archive_path(directory, day), day)
+
+
+def scan(directory: Path, start: date, end: date) -> Iterator[Trajectory]:
+    """Yield every archived trajectory from `start` to `end` inclusive."""
+    day = start
+    while day <= end:
+        if archive_path(directory, day).exists():
+            yield from open_day(directory, day)
+        day += timedelta(days=1)
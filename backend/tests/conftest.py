@@ -0,0 +1,28 @@
+"""Shared fixtures for the backend tests."""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+
+
+@pytest.fixture
+def session_factory() -> sessionmaker:
+    """Return a session factory on a fresh in-memory database."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory: sessionmaker) -> Session:
+    """Return a session on a fresh in-memory database."""
+    session = session_factory()
+    yield session
+    session.close()
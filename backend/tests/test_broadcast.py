@@ -0,0 +1,85 @@
+"""Tests for live position fan-out."""
+import json
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import schedule
+from app.core.write_queue import WriteQueue
+from app.models.models import Bus, Route
+from app.services.broadcast import PositionBroadcaster
+from app.services.live_positions import BusPosition
+from app.services.schedule_conflicts import ScheduleConflicts
+from app.services.timetable import TimetableIndex
+
+
+def make_position(bus_id: int, latitude: float) -> BusPosition:
+    """Build a position for a bus."""
+    return BusPosition(bus_id, 1, latitude, 76.0, None, datetime.utcnow())
+
+
+def test_publish_reaches_route_and_bus_subscribers() -> None:
+    """One update is delivered to bus and route channels with the same frame."""
+    broadcaster = PositionBroadcaster()
+    broadcaster.set_bus_routes(7, {3})
+    by_route = broadcaster.subscribe(route_id=3)
+    by_bus = broadcaster.subscribe(bus_id=7)
+    other = broadcaster.subscribe(route_id=4)
+
+    assert broadcaster.publish(make_position(7, 11.0)) == 2
+
+    frame = by_route.queue.get_nowait()
+    assert frame is by_bus.queue.get_nowait()
+    assert json.loads(frame)["route_ids"] == [3]
+    assert other.queue.empty()
+
+
+def test_slow_subscriber_drops_stale_frames() -> None:
+    """A full buffer keeps only the newest frames."""
+    broadcaster = PositionBroadcaster(max_frames=2)
+    subscription = broadcaster.subscribe(bus_id=1)
+    for latitude in (1.0, 2.0, 3.0):
+        broadcaster.publish(make_position(1, latitude))
+
+    assert subscription.dropped == 1
+    assert [json.loads(subscription.queue.get_nowait())["lat"] for _ in range(2)] == [2.0, 3.0]
+
+    broadcaster.unsubscribe(subscription)
+    assert broadcaster.stats()["subscribers"] == 0
+
+
+def test_schedule_writes_update_bus_routes(session_factory, monkeypatch) -> None:
+    """Creating, moving and deleting schedules keeps the bus-to-route map current."""
+    db = session_factory()
+    db.add_all([
+        Bus(id=1, bus_number="B1", capacity=40, model="M", registration_number="R1"),
+        Bus(id=2, bus_number="B2", capacity=40, model="M", registration_number="R2"),
+        Route(id=1, route_name="North"),
+    ])
+    db.commit()
+    db.close()
+    broadcaster = PositionBroadcaster()
+    writes = WriteQueue(session_factory)
+    monkeypatch.setattr(schedule, "broadcaster", broadcaster)
+    monkeypatch.setattr(schedule, "timetable", TimetableIndex())
+    monkeypatch.setattr(schedule, "schedule_conflicts", ScheduleConflicts())
+    monkeypatch.setattr(schedule, "run_write", writes.run)
+    app = FastAPI()
+    app.include_router(schedule.router)
+    client = TestClient(app)
+    body = {"bus_id": 1, "route_id": 1, "departure_time": "07:00", "days_of_week": ["Monday"]}
+
+    try:
+        schedule_id = client.post("/schedules/", json=body).json()["id"]
+        assert broadcaster.buses_for_route(1) == [1]
+        assert broadcaster.routes_for_bus(1) == {1}
+
+        assert client.put(f"/schedules/{schedule_id}", json={**body, "bus_id": 2}).status_code == 200
+        assert broadcaster.buses_for_route(1) == [2]
+        assert broadcaster.routes_for_bus(1) == set()
+
+        assert client.delete(f"/schedules/{schedule_id}").status_code == 204
+        assert broadcaster.buses_for_route(1) == []
+    finally:
+        writes.shutdown()
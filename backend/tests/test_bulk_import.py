@@ -0,0 +1,93 @@
+"""Tests for bulk CSV import of students and drivers."""
+import asyncio
+import io
+
+from app.core.security import is_password_hash
+from app.models.models import Route, Student
+from app.services.bulk_import import STUDENTS, BulkImport, read_rows
+
+
+def csv_file(lines: list[str]) -> io.BytesIO:
+    """Build an uploaded CSV file of students."""
+    header = "name,email,roll_number,phone,password,route_id"
+    return io.BytesIO("\n".join([header, *lines]).encode())
+
+
+def run_import(db, file: io.BytesIO, dry_run: bool = False, chunk_size: int = 500) -> dict:
+    """Validate, hash and insert a file the way the import endpoints do, on one session."""
+    importer = BulkImport(STUDENTS, chunk_size=chunk_size)
+    importer.validate(db, read_rows(file))
+    if not dry_run:
+        asyncio.run(importer.hash_passwords())
+        importer.insert(db)
+    return importer.report(dry_run)
+
+
+def test_valid_rows_are_imported_and_invalid_rows_reported(db) -> None:
+    """Rows are checked against the database, the file and the referenced routes."""
+    route = Route(route_name="R1")
+    db.add_all([route, Student(name="Old", email="old@tce.edu", roll_number="R0", phone="1", password="x")])
+    db.commit()
+
+    file = csv_file([
+        f"Asha,asha@tce.edu,R1,9000000001,pw,{route.id}",
+        "Bala,old@tce.edu,R2,9000000002,pw,",
+        "Chitra,chitra@tce.edu,R1,9000000003,pw,",
+        "Deepa,deepa@tce.edu,R4,9000000004,pw,999",
+        ",not-an-email,R5,9000000005,pw,x",
+        "Ezhil,ezhil@tce.edu,R6,9000000006,pw,",
+    ])
+    report = run_import(db, file, chunk_size=2)
+
+    assert report["imported"] == 2
+    assert {e["row"]: e["errors"] for e in report["errors"]} == {
+        3: ["email already exists"],
+        4: ["roll_number is duplicated in the file"],
+        5: ["route_id 999 does not exist"],
+        6: ["name is required", "email is invalid", "route_id must be an integer"],
+    }
+    emails = {s.email for s in db.query(Student)}
+    assert emails == {"old@tce.edu", "asha@tce.edu", "ezhil@tce.edu"}
+    asha = db.query(Student).filter_by(email="asha@tce.edu").one()
+    assert asha.route_id == route.id
+    assert is_password_hash(asha.password)
+
+
+def test_rows_taken_after_validation_are_reported(db) -> None:
+    """A row that another write made a duplicate before the insert is skipped and reported."""
+    importer = BulkImport(STUDENTS)
+    importer.validate(db, read_rows(csv_file(["Asha,asha@tce.edu,R1,1,pw,", "Bala,bala@tce.edu,R2,2,pw,"])))
+    db.add(Student(name="Asha", email="asha@tce.edu", roll_number="R9", phone="1", password="x"))
+    db.commit()
+
+    importer.insert(db)
+    report = importer.report()
+    assert (report["imported"], report["failed"]) == (1, 1)
+    assert report["errors"] == [{"row": 2, "errors": ["email already exists"]}]
+    assert db.query(Student).filter_by(email="bala@tce.edu").count() == 1
+
+
+def test_dry_run_validates_without_writing(db) -> None:
+    """A dry run reports what would be imported and leaves the table unchanged."""
+    report = run_import(db, csv_file(["Asha,asha@tce.edu,R1,1,pw,"]), dry_run=True)
+
+    assert (report["imported"], report["valid"], report["failed"]) == (0, 1, 0)
+    assert db.query(Student).count() == 0
+
+
+def test_home_coordinates_are_optional_and_checked(db) -> None:
+    """Home coordinates are parsed when given and must come as a valid pair."""
+    header = "name,email,roll_number,phone,password,home_latitude,home_longitude"
+    file = io.BytesIO("\n".join([
+        header,
+        "Asha,asha@tce.edu,R1,9000000001,pw,9.92,78.11",
+        "Bala,bala@tce.edu,R2,9000000002,pw,,",
+        "Chitra,chitra@tce.edu,R3,9000000003,pw,9.92,",
+        "Deepa,deepa@tce.edu,R4,9000000004,pw,95,east",
+    ]).encode())
+    report = run_import(db, file, dry_run=True)
+
+    assert {e["row"]: e["errors"] for e in report["errors"]} == {
+        4: ["home_latitude and home_longitude go together"],
+        5: ["home_latitude is out of range", "home_longitude must be a number"],
+    }
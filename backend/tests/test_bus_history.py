@@ -0,0 +1,99 @@
+"""Tests for the NDJSON bus history endpoint."""
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import bus
+from app.core.database import get_db
+from app.models.models import Bus
+from app.services.location_history import location_history
+
+BASE = datetime(2026, 3, 2, 23, 55)
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    """A client for the bus router on a database holding bus 1's positions a minute apart."""
+    db = session_factory()
+    db.add(Bus(bus_number="TN01", capacity=40, model="M", registration_number="REG1"))
+    rows = [
+        {"bus_id": bus_id, "driver_id": 1, "latitude": 9.9 + minute / 1000, "longitude": 78.1,
+         "speed": 20.0, "timestamp": BASE + timedelta(minutes=minute)}
+        for minute in range(10) for bus_id in (1, 2)
+    ]
+    location_history.insert(db, rows)
+    db.commit()
+    db.close()
+
+    def get_test_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = FastAPI()
+    app.include_router(bus.router)
+    app.dependency_overrides[get_db] = get_test_db
+    monkeypatch.setattr(bus, "ReadSessionLocal", session_factory)
+    return TestClient(app)
+
+
+def history(client: TestClient, start: datetime, end: datetime, **params):
+    return client.get("/buses/1/history", params={"from": start.isoformat(), "to": end.isoformat(), **params})
+
+
+def timestamps(response) -> list[datetime]:
+    return [datetime.fromisoformat(json.loads(line)["timestamp"]) for line in response.text.splitlines()]
+
+
+def test_range_spans_partitions_in_order(client):
+    """Points on both sides of midnight come back in order, end exclusive, other buses excluded."""
+    response = history(client, BASE + timedelta(minutes=3), BASE + timedelta(minutes=7))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    # 23:58 and 23:59 are in one day's partition, 00:00 and 00:01 in the next.
+    assert timestamps(response) == [BASE + timedelta(minutes=m) for m in (3, 4, 5, 6)]
+
+
+def test_lines_are_newline_delimited_json(client):
+    """Each point is one JSON object on its own line."""
+    response = history(client, BASE, BASE + timedelta(minutes=2))
+
+    assert response.text.endswith("\n")
+    lines = response.text.splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0]) == {"lat": 9.9, "lng": 78.1, "speed": 20.0, "timestamp": BASE.isoformat()}
+
+
+def test_max_points_keeps_first_and_last(client):
+    """Decimation keeps every n-th point plus the final one."""
+    response = history(client, BASE, BASE + timedelta(minutes=10), max_points=3)
+
+    kept = timestamps(response)
+    assert kept == [BASE + timedelta(minutes=m) for m in (0, 4, 8, 9)]
+    assert history(client, BASE, BASE + timedelta(minutes=10), max_points=1).status_code == 422
+
+
+def test_invalid_range_and_unknown_bus(client):
+    """An empty range is rejected and unknown buses are not found."""
+    assert history(client, BASE, BASE).status_code == 400
+    response = client.get("/buses/99/history", params={"from": BASE.isoformat(),
+                                                       "to": (BASE + timedelta(minutes=1)).isoformat()})
+    assert response.status_code == 404
+
+
+def test_bounds_with_offsets_are_read_as_utc(client):
+    """Aware bounds are converted to UTC and may be mixed with naive ones."""
+    ist = timezone(timedelta(hours=5, minutes=30))
+    start = (BASE + timedelta(minutes=3)).replace(tzinfo=timezone.utc).astimezone(ist)
+    end = (BASE + timedelta(minutes=5)).replace(tzinfo=timezone.utc).astimezone(ist)
+
+    assert timestamps(history(client, start, end)) == [BASE + timedelta(minutes=m) for m in (3, 4)]
+    mixed = history(client, start, BASE + timedelta(minutes=5))
+    assert mixed.status_code == 200
+    assert timestamps(mixed) == [BASE + timedelta(minutes=m) for m in (3, 4)]
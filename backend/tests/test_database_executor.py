@@ -0,0 +1,53 @@
+"""Tests for running blocking database work off the event loop."""
+import asyncio
+import threading
+import time
+
+from app.core.database import DatabaseExecutor
+
+
+def test_threadpool_mode_keeps_the_event_loop_responsive() -> None:
+    """Other coroutines run while a call blocks, and the pool bounds concurrency."""
+    executor = DatabaseExecutor(mode="threadpool", max_workers=2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def blocking_query() -> str:
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+        return threading.current_thread().name
+
+    async def main() -> tuple[list[str], int]:
+        ticks = 0
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        names = await asyncio.gather(*(executor.run(blocking_query) for _ in range(4)))
+        task.cancel()
+        return names, ticks
+
+    try:
+        names, ticks = asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    assert all(name.startswith("db") for name in names)
+    assert max(peak) == 2
+    assert ticks > 5
+
+
+def test_inline_mode_runs_on_the_calling_thread() -> None:
+    """Inline mode keeps the previous behaviour for debugging."""
+    executor = DatabaseExecutor(mode="inline")
+    name = asyncio.run(executor.run(lambda: threading.current_thread().name))
+    assert name == threading.current_thread().name
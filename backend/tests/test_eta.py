@@ -0,0 +1,45 @@
+"""Tests for the route-geometry ETA engine."""
+from datetime import datetime
+
+import pytest
+
+from app.models.models import RouteStop
+from app.services.eta import EtaEngine, RouteGeometry, format_eta
+from app.services.live_positions import BusPosition
+
+
+def make_geometry() -> RouteGeometry:
+    """Build a straight north-bound route with stops roughly 1.1 km apart."""
+    stops = [
+        RouteStop(id=i + 1, route_id=1, stop_name=f"Stop {i}", latitude=9.90 + 0.01 * i,
+                  longitude=78.10, order=i)
+        for i in range(4)
+    ]
+    return RouteGeometry(1, "Route A", stops)
+
+
+def test_cumulative_distances() -> None:
+    """Cumulative distance grows by the haversine length of each segment."""
+    geometry = make_geometry()
+    assert geometry.cumulative_m[0] == 0.0
+    assert geometry.length_m == pytest.approx(3 * 1111.95, rel=1e-3)
+
+
+def test_projection_snaps_onto_polyline() -> None:
+    """A point beside the route is placed at its foot on the nearest segment."""
+    along, off = make_geometry().project(9.915, 78.101)
+    assert along == pytest.approx(1.5 * 1111.95, rel=1e-3)
+    assert off == pytest.approx(109.6, rel=1e-2)
+
+
+def test_estimate_covers_downstream_stops_only() -> None:
+    """ETAs are returned for stops ahead of the bus and cached per position."""
+    engine = EtaEngine(default_speed_kmh=36.0)
+    geometry = make_geometry()
+    position = BusPosition(7, 1, 9.915, 78.10, None, datetime.utcnow())
+
+    etas = engine.estimate(geometry, position)
+    assert [e.stop_id for e in etas] == [3, 4]
+    assert etas[0].eta_seconds == pytest.approx(55.6, rel=1e-2)
+    assert engine.estimate(geometry, position) is etas
+    assert format_eta(etas[0].eta_seconds) == "1 minute"
@@ -0,0 +1,59 @@
+"""Tests for running feedback aggregates and daily rollups."""
+from datetime import date, datetime
+
+from app.models.models import Feedback, FeedbackDailyRollup
+from app.services.feedback_analytics import FeedbackAnalytics
+
+
+def submit(db, analytics: FeedbackAnalytics, rating: int, category: str, created_at: datetime,
+           user_type: str = "student") -> Feedback:
+    """Store a feedback entry the way crud.create_feedback does."""
+    feedback = Feedback(user_id=1, user_type=user_type, rating=rating, category=category,
+                        message="m", created_at=created_at)
+    db.add(feedback)
+    db.flush()
+    analytics.add_rollup(db, feedback)
+    db.commit()
+    analytics.record(feedback)
+    return feedback
+
+
+def test_running_totals_windows_and_recent_buffer(db) -> None:
+    """Totals come from memory, windows from rollups, and recent entries are bounded."""
+    analytics = FeedbackAnalytics(recent_size=2)
+    submit(db, analytics, 5, "service", datetime(2026, 3, 1, 9))
+    submit(db, analytics, 3, "service", datetime(2026, 3, 10, 9))
+    submit(db, analytics, 4, "route", datetime(2026, 3, 10, 18), user_type="driver")
+
+    assert db.query(FeedbackDailyRollup).count() == 3
+    totals = analytics.totals()
+    assert totals["total_feedback"] == 3
+    assert totals["average_rating"] == 4.0
+    assert totals["feedback_by_category"] == {"service": 2, "route": 1}
+    assert totals["feedback_by_user_type"] == {"student": 2, "driver": 1}
+    assert [f["rating"] for f in analytics.recent(10)] == [4, 3]
+
+    week = analytics.window(db, 7, today=date(2026, 3, 10))
+    assert week["total_feedback"] == 2
+    assert week["average_rating"] == 3.5
+    assert analytics.daily(db, 7, today=date(2026, 3, 10)) == [
+        {"day": "2026-03-10", "count": 2, "average_rating": 3.5}
+    ]
+
+
+def test_load_rebuilds_missing_rollups(db) -> None:
+    """Feedback stored before rollups existed is rolled up on load."""
+    db.add_all([
+        Feedback(user_id=1, user_type="student", rating=r, category="service", message="m",
+                 created_at=datetime(2026, 3, 2, 8))
+        for r in (2, 4)
+    ])
+    db.commit()
+
+    analytics = FeedbackAnalytics()
+    analytics.load(db)
+
+    rollup = db.query(FeedbackDailyRollup).one()
+    assert (rollup.day, rollup.count, rollup.rating_sum) == (date(2026, 3, 2), 2, 6)
+    assert analytics.totals()["total_feedback"] == 2
+    assert len(analytics.recent(10)) == 2
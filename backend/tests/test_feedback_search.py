@@ -0,0 +1,48 @@
+"""Tests for full-text feedback search."""
+from app.models.models import Feedback
+from app.services import feedback_search
+
+
+def feedback(message: str, rating: int = 3, category: str = "service") -> Feedback:
+    """Build a feedback entry."""
+    return Feedback(user_id=1, user_type="student", rating=rating, category=category, message=message)
+
+
+def test_index_backfills_and_follows_writes(db) -> None:
+    """Existing rows are indexed on creation and later writes are kept in sync."""
+    db.add(feedback("The bus was late again"))
+    db.commit()
+    assert feedback_search.ensure_index(db) is True
+    assert feedback_search.ensure_index(db) is False
+
+    db.add(feedback("Driver braking is too harsh", rating=2, category="driver_behavior"))
+    db.commit()
+    assert [r.message for r in feedback_search.search(db, "brak")] == ["Driver braking is too harsh"]
+
+    late = db.query(Feedback).filter_by(message="The bus was late again").one()
+    late.message = "The bus was on time"
+    db.commit()
+    assert feedback_search.search(db, "late") == []
+    db.delete(late)
+    db.commit()
+    assert feedback_search.search(db, "time") == []
+
+
+def test_ranking_snippets_and_filters(db) -> None:
+    """Better matches rank first, hits are highlighted and filters narrow the match."""
+    feedback_search.ensure_index(db)
+    db.add_all([
+        feedback("Seats are dirty", rating=2),
+        feedback("Dirty windows and dirty floor, very dirty bus", rating=1, category="bus_condition"),
+        feedback("Friendly driver", rating=5),
+    ])
+    db.commit()
+
+    results = feedback_search.search(db, "dirty")
+    assert len(results) == 2
+    assert results[0].category == "bus_condition"
+    assert "<mark>Dirty</mark>" in results[0].snippet
+
+    assert [r.rating for r in feedback_search.search(db, "dirty", category="service")] == [2]
+    assert feedback_search.search(db, "dirty", rating=5) == []
+    assert feedback_search.search(db, 'dirty" OR "friendly') == []
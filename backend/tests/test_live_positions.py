@@ -0,0 +1,90 @@
+"""Tests for the in-memory live position store."""
+from datetime import datetime, timedelta
+
+from app.services.live_positions import LivePositionStore
+from app.services.location_history import location_history
+
+
+def test_latest_position_is_kept_per_bus() -> None:
+    """Older points never overwrite a newer live position."""
+    store = LivePositionStore()
+    now = datetime.utcnow()
+    store.update(1, 10, 11.0, 76.0, timestamp=now)
+    store.update(1, 10, 11.5, 76.5, timestamp=now - timedelta(seconds=5))
+    store.update(2, 20, 12.0, 77.0, speed=30.0)
+
+    assert store.get(1).latitude == 11.0
+    assert store.get(2).speed == 30.0
+    assert len(store.all()) == 2
+
+
+def test_full_queue_coalesces_and_drops() -> None:
+    """A full queue replaces pending points per bus and drops unknown buses."""
+    store = LivePositionStore(max_pending=2)
+    store.update(1, 10, 11.0, 76.0)
+    store.update(2, 20, 12.0, 77.0)
+    store.update(1, 10, 11.1, 76.1)
+    store.update(3, 30, 13.0, 78.0)
+
+    stats = store.stats()
+    assert stats["pending"] == 2
+    assert stats["coalesced"] == 1
+    assert stats["dropped"] == 1
+    assert store.get(3) is not None
+    assert [p.latitude for p in store.drain()] == [11.1, 12.0]
+
+
+def test_flush_writes_bulk_rows(session_factory) -> None:
+    """Flushing persists every pending point and empties the queue."""
+    store = LivePositionStore(session_factory=session_factory, batch_size=2)
+    for i in range(5):
+        store.update(1, 10, 11.0 + i, 76.0)
+
+    assert store.flush() == 5
+    assert store.stats()["pending"] == 0
+
+    db = session_factory()
+    try:
+        now = datetime.utcnow()
+        rows = list(location_history.iter_rows(db, now - timedelta(hours=1), now + timedelta(hours=1)))
+        assert len(rows) == 5
+    finally:
+        db.close()
+
+
+def test_sequence_numbers_are_claimed_once() -> None:
+    """Re-sent points are recognised within the sequence window."""
+    store = LivePositionStore(seq_window=2)
+    assert store.claim_sequence(1, 5)
+    assert not store.claim_sequence(1, 5)
+    assert store.claim_sequence(2, 5)
+
+    store.release_sequences(1, [5])
+    assert store.claim_sequence(1, 5)
+
+
+def test_aware_timestamps_are_stored_as_naive_utc() -> None:
+    """A ping with an offset can be followed by one without a timestamp."""
+    from app.api.routes.driver import LocationUpdate
+
+    update = LocationUpdate(driver_id=1, latitude=11.0, longitude=76.0, timestamp="2026-10-17T12:30:00+05:30")
+    assert update.timestamp == datetime(2026, 10, 17, 7, 0)
+
+    store = LivePositionStore()
+    store.update(1, 10, 11.0, 76.0, timestamp=LocationUpdate(
+        driver_id=10, latitude=11.0, longitude=76.0, timestamp="2020-01-01T07:00:00Z").timestamp)
+    store.update(1, 10, 11.5, 76.5)
+
+    assert store.get(1).latitude == 11.5
+
+
+def test_batch_points_with_and_without_offsets_sort_together() -> None:
+    """Batched points mixing offset and naive timestamps are ordered in UTC."""
+    from app.api.routes.driver import LocationBatch
+
+    batch = LocationBatch(driver_id=1, points=[
+        {"seq": 1, "latitude": 11.0, "longitude": 76.0, "timestamp": "2026-10-17T12:40:00+05:30"},
+        {"seq": 2, "latitude": 11.1, "longitude": 76.1, "timestamp": "2026-10-17T07:05:00"},
+    ])
+
+    assert [p.seq for p in sorted(batch.points, key=lambda p: p.timestamp)] == [2, 1]
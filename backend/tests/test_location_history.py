@@ -0,0 +1,93 @@
+"""Tests for time-partitioned location history."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect
+
+from app.models.models import Location, LocationPartition
+from app.services.location_history import LocationHistory
+
+
+def row(bus_id: int, timestamp: datetime) -> dict:
+    """Build a location row."""
+    return {"bus_id": bus_id, "driver_id": 1, "latitude": 9.9, "longitude": 78.1,
+            "speed": None, "timestamp": timestamp}
+
+
+def test_rows_are_routed_to_daily_partitions(db) -> None:
+    """Inserts land in one table per day and range reads span partitions in order."""
+    history = LocationHistory(interval="day")
+    base = datetime(2026, 3, 2, 23, 59)
+    history.insert(db, [row(1, base + timedelta(minutes=m)) for m in (2, 0, 1)] + [row(2, base)])
+    db.commit()
+
+    names = [p.name for p in history.partitions(db)]
+    assert names == ["locations_d20260302", "locations_d20260303"]
+
+    rows = list(history.iter_rows(db, base, base + timedelta(hours=1), bus_id=1))
+    assert [r.timestamp for r in rows] == [base + timedelta(minutes=m) for m in (0, 1, 2)]
+
+
+def test_weekly_partitions_start_on_monday() -> None:
+    """Week partitions are named after their Monday."""
+    history = LocationHistory(interval="week")
+    start = history.period_start(datetime(2026, 3, 5, 8, 0))
+    assert start == datetime(2026, 3, 2)
+    assert history.partition_name(start) == "locations_w20260302"
+
+
+def test_maintenance_downsamples_then_drops(db) -> None:
+    """Old partitions keep one point per bus-minute, expired ones are dropped."""
+    history = LocationHistory(interval="day", full_resolution_days=7, retention_days=30)
+    now = datetime(2026, 4, 1)
+    old = datetime(2026, 3, 20, 8, 0)
+    expired = datetime(2026, 2, 1, 8, 0)
+    history.insert(db, [row(1, old + timedelta(seconds=5 * i)) for i in range(24)])
+    history.insert(db, [row(1, expired)])
+    db.commit()
+
+    result = history.maintain(db, now)
+    assert result == {"dropped": ["locations_d20260201"], "downsampled": ["locations_d20260320"]}
+    assert len(list(history.iter_rows(db, old, old + timedelta(days=1)))) == 2
+    assert "locations_d20260201" not in inspect(db.get_bind()).get_table_names()
+    assert db.get(LocationPartition, "locations_d20260320").downsampled
+
+
+def test_legacy_rows_are_adopted(db) -> None:
+    """Rows in the unpartitioned table move into partitions."""
+    history = LocationHistory(interval="day")
+    stamp = datetime(2026, 3, 2, 8, 0)
+    db.add(Location(bus_id=1, driver_id=1, latitude=9.9, longitude=78.1, timestamp=stamp))
+    db.commit()
+
+    assert history.adopt_legacy(db) == 1
+    assert db.query(Location).count() == 0
+    assert len(list(history.iter_rows(db, stamp, stamp + timedelta(seconds=1)))) == 1
+
+
+def test_rolled_back_partition_is_not_cached(db) -> None:
+    """A partition created in a rolled back transaction is registered again on the next insert."""
+    history = LocationHistory(interval="day")
+    stamp = datetime(2026, 3, 2, 8, 0)
+    history.insert(db, [row(1, stamp)])
+    db.rollback()
+    assert history.partitions(db) == []
+
+    history.insert(db, [row(1, stamp)])
+    db.commit()
+    assert [p.name for p in history.partitions(db)] == ["locations_d20260302"]
+    assert len(list(history.iter_rows(db, stamp, stamp + timedelta(seconds=1)))) == 1
+
+
+def test_savepoint_rollback_forgets_pending_partition(db) -> None:
+    """Rolling back a savepoint drops partitions it created from the pending cache."""
+    history = LocationHistory(interval="day")
+    stamp = datetime(2026, 3, 2, 8, 0)
+    savepoint = db.begin_nested()
+    history.insert(db, [row(1, stamp)])
+    savepoint.rollback()
+    db.commit()
+    assert not history._known
+
+    history.insert(db, [row(1, stamp)])
+    db.commit()
+    assert [p.name for p in history.partitions(db)] == ["locations_d20260302"]
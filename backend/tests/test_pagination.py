@@ -0,0 +1,37 @@
+"""Tests for keyset pagination helpers."""
+import pytest
+from fastapi import HTTPException
+
+from app.models.models import Bus
+from app.services.pagination import decode_cursor, encode_cursor, keyset_page
+
+
+def test_cursor_round_trip() -> None:
+    """Cursors are opaque but decode back to the id they point after."""
+    cursor = encode_cursor(42)
+    assert "42" not in cursor
+    assert decode_cursor(cursor) == 42
+    assert decode_cursor(None) is None
+
+
+def test_invalid_cursor_is_rejected() -> None:
+    """Tampered cursors produce a 400 error."""
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_keyset_pages_cover_every_row_once(db) -> None:
+    """Walking pages visits each row exactly once and stops without an empty page."""
+    db.add_all(Bus(bus_number=f"B{i}", capacity=40, model="x", registration_number=f"R{i}") for i in range(7))
+    db.commit()
+
+    seen, after_id, pages = [], None, 0
+    while True:
+        rows, after_id = keyset_page(db.query(Bus), Bus.id, after_id, 3)
+        seen.extend(b.id for b in rows)
+        pages += 1
+        if after_id is None:
+            break
+    assert seen == list(range(1, 8))
+    assert pages == 3
@@ -0,0 +1,85 @@
+"""Tests for the catalogue response cache and ETag revalidation."""
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.services.response_cache import ResponseCache, cached_response, etag_matches, response_cache
+
+
+def test_etag_changes_only_on_bump():
+    cache = ResponseCache()
+    first = cache.etag("buses")
+
+    assert cache.etag("buses") == first
+    cache.bump("routes")
+    assert cache.etag("buses") == first
+    cache.bump("buses")
+    assert cache.etag("buses") != first
+
+
+def test_bump_drops_collection_entries():
+    cache = ResponseCache()
+    cache.build("buses", "a", lambda: (b"[1]", {}))
+    cache.build("routes", "a", lambda: (b"[2]", {}))
+    cache.bump("buses")
+
+    assert cache.lookup("buses", "a") is None
+    assert cache.lookup("routes", "a").body == b"[2]"
+    assert cache.stats()["bytes"] == 3
+
+
+def test_build_racing_with_a_write_is_not_kept():
+    cache = ResponseCache()
+
+    def build():
+        cache.bump("buses")
+        return b"stale", {}
+
+    assert cache.build("buses", "a", build).body == b"stale"
+    assert cache.lookup("buses", "a") is None
+
+
+def test_eviction_is_bounded_by_bytes():
+    cache = ResponseCache(max_bytes=10)
+    cache.build("buses", "a", lambda: (b"aaaa", {}))
+    cache.build("buses", "b", lambda: (b"bbbb", {}))
+    cache.lookup("buses", "a")
+    cache.build("buses", "c", lambda: (b"cccc", {}))
+    cache.build("buses", "huge", lambda: (b"x" * 11, {}))
+
+    assert cache.lookup("buses", "b") is None
+    assert cache.lookup("buses", "huge") is None
+    assert cache.lookup("buses", "a") and cache.lookup("buses", "c")
+    assert cache.stats()["bytes"] == 8
+
+
+def test_etag_matching():
+    assert etag_matches('"x"', '"x"')
+    assert etag_matches('W/"x", "y"', '"x"')
+    assert etag_matches("*", '"x"')
+    assert not etag_matches('"y"', '"x"')
+    assert not etag_matches(None, '"x"')
+
+
+def test_not_modified_skips_the_builder():
+    app = FastAPI()
+    builds = []
+
+    @app.get("/things")
+    async def things(request: Request):
+        def build():
+            builds.append(1)
+            return b'["a"]', {"X-Next-Cursor": "abc"}
+        return await cached_response(request, "test-things", "all", build)
+
+    client = TestClient(app)
+    first = client.get("/things")
+    etag = first.headers["etag"]
+    assert first.json() == ["a"] and first.headers["x-next-cursor"] == "abc"
+
+    assert client.get("/things", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/things").json() == ["a"]
+    assert len(builds) == 1
+
+    response_cache.bump("test-things")
+    assert client.get("/things", headers={"If-None-Match": etag}).status_code == 200
+    assert len(builds) == 2
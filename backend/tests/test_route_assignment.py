@@ -0,0 +1,92 @@
+"""Tests for capacity-aware student-to-route assignment."""
+import itertools
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from app.models.models import Bus, Route, RouteStop, Schedule, Student
+from app.services.route_assignment import UNASSIGNED, RouteAssigner, assign
+from app.services.stats import DashboardCounters
+
+
+def best_by_enumeration(distances: np.ndarray, capacities: np.ndarray) -> tuple[int, float]:
+    """Most students assigned, then least walking, over every possible assignment."""
+    best = (-1, 0.0)
+    students, routes = distances.shape
+    for choice in itertools.product(range(-1, routes), repeat=students):
+        taken = [(s, r) for s, r in enumerate(choice) if r >= 0]
+        if any(not np.isfinite(distances[s, r]) for s, r in taken):
+            continue
+        if any(count > capacities[r] for r, count in Counter(r for _, r in taken).items()):
+            continue
+        total = sum(distances[s, r] for s, r in taken)
+        if len(taken) > best[0] or (len(taken) == best[0] and total < best[1]):
+            best = (len(taken), total)
+    return best
+
+
+def test_assign_is_optimal_on_small_instances():
+    rng = np.random.default_rng(5)
+    for _ in range(100):
+        students, routes = rng.integers(1, 7), rng.integers(1, 4)
+        distances = rng.random((students, routes)) * 1000
+        distances[rng.random((students, routes)) < 0.3] = np.inf
+        capacities = rng.integers(0, 4, routes)
+
+        result = assign(distances, capacities)
+        chosen = [(s, r) for s, r in enumerate(result) if r != UNASSIGNED]
+
+        assert all(np.bincount(result[result >= 0], minlength=routes) <= capacities)
+        count, total = best_by_enumeration(distances, capacities)
+        assert len(chosen) == count
+        assert np.isclose(sum(distances[s, r] for s, r in chosen), total)
+
+
+def test_repair_displaces_a_student_to_make_room():
+    distances = np.array([[100.0, 200.0], [150.0, np.inf]])
+
+    # Greedy seats student 0 on route 0, which is student 1's only option.
+    assert assign(distances, np.array([1, 1])).tolist() == [1, 0]
+
+
+@pytest.fixture
+def db(db):
+    """The test session with two routes served by a 2-seat and a 1-seat bus."""
+    db.add_all([
+        Bus(id=1, bus_number="B1", capacity=2, model="M", registration_number="R1"),
+        Bus(id=2, bus_number="B2", capacity=1, model="M", registration_number="R2"),
+        Route(id=1, route_name="North"),
+        Route(id=2, route_name="South"),
+        RouteStop(id=1, route_id=1, stop_name="N", latitude=9.95, longitude=78.10, order=1),
+        RouteStop(id=2, route_id=2, stop_name="S", latitude=9.90, longitude=78.10, order=1),
+        Schedule(id=1, bus_id=1, route_id=1, departure_time="07:00 AM", days_of_week="Monday", status="active"),
+        Schedule(id=2, bus_id=1, route_id=1, departure_time="05:00 PM", days_of_week="Monday", status="active"),
+        Schedule(id=3, bus_id=2, route_id=2, departure_time="07:00 AM", days_of_week="Monday", status="active"),
+    ])
+    homes = [(9.951, 2), (9.952, 2), (9.949, None), (9.905, 1)]
+    for index, (latitude, route_id) in enumerate(homes, start=1):
+        db.add(Student(id=index, name="S", email=f"s{index}@x.com", roll_number=f"R{index}", phone="1",
+                       password="x", route_id=route_id, home_latitude=latitude, home_longitude=78.10))
+    db.commit()
+    return db
+
+
+def test_plan_respects_scheduled_capacity_and_apply_updates_counts(db, monkeypatch):
+    counters = DashboardCounters()
+    counters.reconcile(db)
+    monkeypatch.setattr("app.services.route_assignment.dashboard_stats", counters)
+    assigner = RouteAssigner(max_walk_m=2000)
+
+    assert assigner.capacities(db) == {1: 2, 2: 1}  # bus 1 counted once for both trips
+    plan = assigner.plan(db)
+    summary = plan.summary()
+    assert plan.proposed == [1, None, 1, 2]  # student 2 lives farthest from the full North route
+    assert (summary["assigned"], summary["unassigned"], summary["moved"]) == (3, [2], 4)
+
+    assert assigner.apply(db, plan) == 4
+    db.expire_all()
+    assert [s.route_id for s in db.query(Student).order_by(Student.id)] == [1, None, 1, 2]
+    assert counters.snapshot()["students_per_route"] == {1: 2, 2: 1}
+    counters.reconcile(db)
+    assert counters.snapshot()["students_per_route"] == {1: 2, 2: 1}
@@ -0,0 +1,85 @@
+"""Tests for the route catalogue query and its response cache."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.api.routes import route
+from app.core.database import get_db
+from app.core.write_queue import WriteQueue
+from app.models.models import Route, RouteStop
+from app.services import crud
+from app.services.response_cache import response_cache
+
+
+def stops(count: int) -> list[dict]:
+    return [{"stop_name": f"S{i}", "latitude": 9.9 + i / 100, "longitude": 78.1, "order": i + 1}
+            for i in range(count)]
+
+
+@pytest.mark.parametrize("routes", [1, 25])
+def test_listing_routes_loads_stops_in_one_query(db, routes: int) -> None:
+    """A page of routes costs two statements however many routes it holds."""
+    for index in range(routes):
+        db.add(Route(route_name=f"R{index}", description="",
+                     stops=[RouteStop(**stop) for stop in stops(3)]))
+    db.commit()
+    db.expunge_all()
+
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    page, next_id = crud.get_routes(db, None, None)
+    assert sum(len(r.stops) for r in page) == 3 * routes
+    assert next_id is None
+    assert len(statements) == 2
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    """A client for the route router with writes going through a queue on the test database."""
+    writes = WriteQueue(session_factory)
+
+    def get_test_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = FastAPI()
+    app.include_router(route.router)
+    app.dependency_overrides[get_db] = get_test_db
+    monkeypatch.setattr(route, "run_write", writes.run)
+    response_cache.bump("routes")
+    yield TestClient(app)
+    writes.shutdown()
+
+
+def names(response) -> list[str]:
+    return [r["route_name"] for r in response.json()]
+
+
+def test_catalogue_is_cached_until_a_write(client) -> None:
+    """Unchanged catalogues revalidate; creating, renaming and deleting a route each serve a fresh body."""
+    first = client.get("/routes/")
+    assert first.status_code == 200 and first.json() == []
+    etag = first.headers["etag"]
+    assert client.get("/routes/", headers={"If-None-Match": etag}).status_code == 304
+
+    created = client.post("/routes/", json={"route_name": "North", "description": "", "stops": stops(2)})
+    assert created.status_code == 201
+    route_id = created.json()["id"]
+    listed = client.get("/routes/", headers={"If-None-Match": etag})
+    assert listed.status_code == 200 and names(listed) == ["North"]
+    etag = listed.headers["etag"]
+
+    updated = client.put(f"/routes/{route_id}", json={"route_name": "North Loop", "description": "",
+                                                       "stops": stops(2)})
+    assert updated.status_code == 200
+    listed = client.get("/routes/", headers={"If-None-Match": etag})
+    assert listed.status_code == 200 and names(listed) == ["North Loop"]
+    etag = listed.headers["etag"]
+
+    assert client.delete(f"/routes/{route_id}").status_code == 204
+    listed = client.get("/routes/", headers={"If-None-Match": etag})
+    assert listed.status_code == 200 and listed.json() == []
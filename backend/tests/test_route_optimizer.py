@@ -0,0 +1,71 @@
+"""Tests for the route stop-order optimizer."""
+import itertools
+import time
+
+import numpy as np
+
+from app.models.models import Bus
+from app.services import crud
+from app.services.eta import haversine
+from app.services.route_optimizer import RouteOptimizer, distance_matrix, path_length
+
+
+def random_points(count: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return 9.9 + rng.random(count) * 0.1, 78.1 + rng.random(count) * 0.1
+
+
+def test_distance_matrix_matches_haversine():
+    lat, lng = random_points(5, 0)
+    matrix = distance_matrix(lat, lng)
+
+    assert np.allclose(matrix, matrix.T)
+    assert matrix[1, 3] == haversine(*np.radians([lat[1], lng[1], lat[3], lng[3]]))
+
+
+def test_small_routes_reach_the_optimum_with_fixed_ends():
+    optimizer = RouteOptimizer(time_budget_ms=200)
+    for seed in range(5):
+        lat, lng = random_points(8, seed)
+        result = optimizer.optimize(lat, lng)
+        matrix = distance_matrix(lat, lng)
+        best = min(path_length(matrix, [0, *middle, 7]) for middle in itertools.permutations(range(1, 7)))
+
+        assert (result.order[0], result.order[-1]) == (0, 7)
+        assert sorted(result.order) == list(range(8))
+        assert np.isclose(result.optimized_m, best)
+        assert np.isclose(result.optimized_m, path_length(matrix, result.order))
+
+
+def test_sixty_stops_finish_well_within_a_second():
+    lat, lng = random_points(60, 42)
+    started = time.perf_counter()
+    result = RouteOptimizer(time_budget_ms=200).optimize(lat, lng)
+
+    assert time.perf_counter() - started < 0.5
+    assert result.saved_m > 0.5 * result.original_m
+
+
+def test_optimal_order_is_left_unchanged():
+    lat = np.array([9.90, 9.91, 9.92, 9.93, 9.94])
+    result = RouteOptimizer().optimize(lat, np.full(5, 78.1))
+
+    assert not result.changed
+    assert result.saved_m == 0.0
+
+
+def test_reorder_route_stops_keeps_ids_and_regenerates_stop_times(db):
+    db.add(Bus(id=1, bus_number="B1", capacity=40, model="M", registration_number="R1"))
+    zigzag = [9.90, 9.93, 9.91, 9.94]
+    route = crud.create_route(db, "R", "", [
+        {"stop_name": f"S{i}", "latitude": lat, "longitude": 78.1, "order": i} for i, lat in enumerate(zigzag)
+    ])
+    schedule = crud.create_schedule(db, 1, route.id, "07:00", "Monday")
+    ids = [stop.id for stop in route.stops]
+    before = schedule.stop_times[-1].arrival_minute
+
+    crud.reorder_route_stops(db, route, [ids[0], ids[2], ids[1], ids[3]])
+
+    assert [stop.id for stop in route.stops] == [ids[0], ids[2], ids[1], ids[3]]
+    assert [stop.order for stop in route.stops] == [1, 2, 3, 4]
+    assert crud.get_schedule(db, schedule.id).stop_times[-1].arrival_minute < before
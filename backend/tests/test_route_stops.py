@@ -0,0 +1,70 @@
+"""Tests for transactional route creation and diff-based stop updates."""
+import pytest
+from sqlalchemy import event
+
+from app.models.models import SegmentSpeed
+from app.services import crud
+from app.services.stop_times import set_segment_speeds
+
+
+@pytest.fixture
+def statements(db) -> list[str]:
+    """Record the first keyword of each statement executed on the test database."""
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement.split()[0]))
+    return statements
+
+
+def stop(name: str, order: int, lat: float = 9.9, **extra) -> dict:
+    """Build an incoming stop."""
+    return {"stop_name": name, "latitude": lat, "longitude": 78.1, "order": order, **extra}
+
+
+def test_create_route_commits_once(db) -> None:
+    """A route and all of its stops are written in one transaction."""
+    commits = []
+    event.listen(db, "after_commit", lambda session: commits.append(1))
+
+    route = crud.create_route(db, "R1", "", [stop(f"S{i}", i) for i in range(40)])
+
+    assert len(route.stops) == 40
+    assert len(commits) == 1
+
+
+def test_update_keeps_ids_and_issues_only_needed_statements(db, statements) -> None:
+    """Unchanged stops are untouched, moved stops are updated in place and ids survive."""
+    route = crud.create_route(db, "R1", "", [stop("A", 1), stop("B", 2), stop("C", 3)])
+    ids = {s.stop_name: s.id for s in route.stops}
+
+    statements.clear()
+    counts = crud.update_route(db, route, "R1", "", [
+        stop("A", 1),
+        stop("B", 2, lat=10.0, id=ids["B"]),
+        stop("D", 3),
+    ])
+
+    assert counts == {"inserted": 1, "updated": 1, "deleted": 1}
+    assert [(s.stop_name, s.id) for s in route.stops] == [("A", ids["A"]), ("B", ids["B"]), ("D", route.stops[2].id)]
+    assert route.stops[1].latitude == 10.0
+    assert ids["C"] not in {s.id for s in route.stops}
+    writes = [s for s in statements if s in ("INSERT", "UPDATE", "DELETE")]
+    # The removed stop's row and its (absent) segment speeds.
+    assert sorted(writes) == ["DELETE", "DELETE", "INSERT", "UPDATE"]
+
+
+def test_removed_stops_take_their_segment_speeds(db) -> None:
+    """Speeds from or to a deleted stop go with it; speeds between kept stops stay."""
+    route = crud.create_route(db, "R1", "", [stop("A", 1), stop("B", 2), stop("C", 3)])
+    a, b, c = (s.id for s in route.stops)
+    set_segment_speeds(db, [
+        {"from_stop_id": a, "to_stop_id": b, "speed_kmh": 20.0},
+        {"from_stop_id": b, "to_stop_id": c, "speed_kmh": 30.0},
+    ])
+    db.commit()
+
+    crud.update_route(db, route, "R1", "", [stop("A", 1), stop("B", 2)])
+    assert [(s.from_stop_id, s.to_stop_id) for s in db.query(SegmentSpeed)] == [(a, b)]
+
+    crud.delete_route(db, route.id)
+    assert db.query(SegmentSpeed).count() == 0
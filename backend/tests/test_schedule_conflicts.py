@@ -0,0 +1,89 @@
+"""Tests for the interval tree and bus double-booking detection."""
+import random
+
+import pytest
+
+from app.models.models import Bus, Route, RouteStop
+from app.services import crud
+from app.services.schedule_conflicts import (
+    MINUTES_PER_WEEK, Interval, IntervalTree, ScheduleConflicts, week_intervals
+)
+
+
+def test_interval_tree_matches_brute_force():
+    rng = random.Random(7)
+    tree, stored = IntervalTree(), []
+    for schedule_id in range(300):
+        start = rng.randrange(MINUTES_PER_WEEK)
+        interval = Interval(start, start + rng.randrange(1, 240), schedule_id)
+        tree.add(interval)
+        stored.append(interval)
+    for interval in stored[::3]:
+        assert tree.remove(interval)
+    stored = [iv for i, iv in enumerate(stored) if i % 3]
+    assert not tree.remove(Interval(0, 1, 999))
+    assert len(tree) == len(stored)
+
+    for _ in range(200):
+        start = rng.randrange(MINUTES_PER_WEEK)
+        end = start + rng.randrange(1, 120)
+        expected = {iv for iv in stored if iv.start < end and iv.end > start}
+        assert set(tree.overlapping(start, end)) == expected
+
+
+def test_week_intervals_wrap_past_sunday():
+    intervals = week_intervals(1, 23 * 60 + 30, 0b1000000, 60)  # Sunday 23:30 for an hour
+
+    assert intervals == [
+        Interval(MINUTES_PER_WEEK - 30, MINUTES_PER_WEEK, 1),
+        Interval(0, 30, 1),
+    ]
+
+
+@pytest.fixture
+def db(db):
+    """The test session with two buses and a two-stop route."""
+    db.add_all([
+        Bus(id=1, bus_number="B1", capacity=40, model="M", registration_number="R1"),
+        Bus(id=2, bus_number="B2", capacity=40, model="M", registration_number="R2"),
+        Route(id=1, route_name="Route A"),
+        RouteStop(id=1, route_id=1, stop_name="A", latitude=0.0, longitude=0.0, order=1),
+        RouteStop(id=2, route_id=1, stop_name="B", latitude=0.1, longitude=0.0, order=2),
+    ])
+    db.commit()
+    return db
+
+
+def test_check_uses_route_duration_and_days(db):
+    conflicts = ScheduleConflicts(turnaround_minutes=10)
+    conflicts.set(crud.create_schedule(db, 1, 1, "07:00", "Monday,Wednesday"))
+    trip = conflicts.duration(27)  # ~11.1 km at 25 km/h, plus turnaround
+
+    assert conflicts.check(1, 7 * 60 + trip, 0b1, trip) == []
+    clash = conflicts.check(1, 7 * 60 + trip - 1, 0b101, trip)
+    assert [(c.day, c.start_minute, c.end_minute) for c in clash] == [
+        ("Monday", 7 * 60 + trip - 1, 7 * 60 + trip),
+        ("Wednesday", 7 * 60 + trip - 1, 7 * 60 + trip),
+    ]
+    assert conflicts.check(1, 7 * 60 + 5, 0b10, trip) == []  # Tuesday is free
+    assert conflicts.check(2, 7 * 60, 0b1, trip) == []  # other bus
+    assert conflicts.check(1, 7 * 60, 0b1, trip, schedule_id=1) == []  # itself
+
+
+def test_audit_reports_each_overlap_once(db):
+    first = crud.create_schedule(db, 1, 1, "07:00", "Monday")
+    crud.create_schedule(db, 1, 1, "07:20", "Monday,Tuesday")
+    crud.create_schedule(db, 1, 1, "09:00", "Monday")
+    crud.create_schedule(db, 2, 1, "07:00", "Monday")
+    crud.create_schedule(db, 1, 1, "07:10", "Monday", status="inactive")
+    conflicts = ScheduleConflicts()
+    conflicts.load(db)
+
+    assert [(c.bus_id, c.schedule_ids, c.day, c.start_minute) for c in conflicts.audit()] == [
+        (1, (1, 2), "Monday", 7 * 60 + 20),
+    ]
+
+    crud.update_schedule(db, first, 1, 1, "05:00", "Monday")
+    conflicts.refresh(db, [first.id])
+    assert conflicts.audit() == []
+    assert conflicts.stats() == {"schedules": 4, "buses": 2}
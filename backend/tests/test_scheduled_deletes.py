@@ -0,0 +1,48 @@
+"""Tests that buses and routes with schedules cannot be deleted from under them."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import bus, route
+from app.core.write_queue import WriteQueue
+from app.models.models import Bus, Route, Schedule
+from app.services import crud
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    """A client for the bus and route routers; bus 1 runs route 1 on one schedule."""
+    db = session_factory()
+    db.add_all([
+        Bus(id=1, bus_number="B1", capacity=40, model="M", registration_number="R1"),
+        Route(id=1, route_name="North"),
+    ])
+    db.commit()
+    crud.create_schedule(db, 1, 1, "07:00", "Monday")
+    db.close()
+
+    writes = WriteQueue(session_factory)
+    monkeypatch.setattr(bus, "run_write", writes.run)
+    monkeypatch.setattr(route, "run_write", writes.run)
+    app = FastAPI()
+    app.include_router(bus.router)
+    app.include_router(route.router)
+    yield TestClient(app)
+    writes.shutdown()
+
+
+def test_scheduled_bus_and_route_are_kept(client, session_factory) -> None:
+    """Deletes are refused with 409 until the schedule is gone, then succeed."""
+    for path in ("/buses/1", "/routes/1"):
+        response = client.delete(path)
+        assert response.status_code == 409
+        assert "schedules" in response.json()["detail"]
+
+    db = session_factory()
+    assert db.query(Schedule).count() == 1
+    crud.delete_schedule(db, db.query(Schedule.id).scalar())
+    db.close()
+
+    assert client.delete("/buses/1").status_code == 204
+    assert client.delete("/routes/1").status_code == 204
+    assert client.delete("/routes/1").status_code == 404
@@ -0,0 +1,44 @@
+"""Tests for password hashing, legacy plain-text rows and the hashing pool."""
+import asyncio
+
+from app.core.security import (
+    PasswordHasher, get_password_hash, hash_password, is_password_hash, needs_rehash, verify_password
+)
+
+
+def test_hash_round_trip_and_salting():
+    first = hash_password("secret", 1024, 8, 1)
+    second = hash_password("secret", 1024, 8, 1)
+
+    assert first != second
+    assert first.startswith("scrypt$1024$8$1$")
+    assert verify_password("secret", first)
+    assert not verify_password("Secret", first)
+
+
+def test_legacy_plain_text_is_verified_and_flagged():
+    assert not is_password_hash("admin123")
+    assert verify_password("admin123", "admin123")
+    assert not verify_password("admin124", "admin123")
+    assert needs_rehash("admin123")
+
+
+def test_needs_rehash_when_cost_parameters_change():
+    assert not needs_rehash(get_password_hash("secret"))
+    assert needs_rehash(hash_password("secret", 1024, 8, 1))
+
+
+def test_malformed_hash_is_rejected():
+    assert not verify_password("secret", "scrypt$broken")
+
+
+def test_pool_hashes_and_verifies():
+    hasher = PasswordHasher(max_workers=1)
+    try:
+        stored = asyncio.run(hasher.hash("secret"))
+        assert not needs_rehash(stored)
+        assert asyncio.run(hasher.verify("secret", stored))
+        assert not asyncio.run(hasher.verify("wrong", stored))
+        assert all(verify_password(p, h) for p, h in zip(["a", "b"], hasher.hash_many(["a", "b"])))
+    finally:
+        hasher.shutdown()
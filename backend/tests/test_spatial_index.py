@@ -0,0 +1,90 @@
+"""Tests for the grid spatial index."""
+import random
+import threading
+
+import pytest
+
+from app.models.models import Route, RouteStop
+from app.services.spatial_index import GridIndex, SpatialIndex
+
+
+def make_index(count: int = 2000) -> GridIndex:
+    """Scatter points across a city-sized box."""
+    rng = random.Random(42)
+    index = GridIndex(cell_deg=0.01)
+    for key in range(count):
+        index.upsert(key, 9.8 + rng.random() * 0.4, 78.0 + rng.random() * 0.4)
+    return index
+
+
+def brute_force(index: GridIndex, latitude: float, longitude: float) -> list[tuple[float, int]]:
+    """Measure every point."""
+    return index._measure(latitude, longitude, list(index._points))
+
+
+@pytest.mark.parametrize("latitude,longitude", [(9.93, 78.12), (10.5, 78.9), (9.8, 78.0)])
+def test_nearest_matches_brute_force(latitude: float, longitude: float) -> None:
+    """k-nearest returns the same keys as a full scan, inside and outside the data."""
+    index = make_index()
+    expected = [key for _, key in brute_force(index, latitude, longitude)[:7]]
+    assert [key for _, key in index.nearest(latitude, longitude, 7)] == expected
+
+
+def test_within_matches_brute_force() -> None:
+    """Radius queries return exactly the points inside the circle."""
+    index = make_index()
+    expected = [key for d, key in brute_force(index, 9.95, 78.2) if d <= 1500]
+    assert [key for _, key in index.within(9.95, 78.2, 1500)] == expected
+
+
+def test_moves_and_removals() -> None:
+    """Moved points are found at their new cell; removed points disappear."""
+    index = GridIndex(cell_deg=0.01)
+    index.upsert(1, 9.90, 78.10)
+    index.upsert(1, 9.95, 78.15)
+    index.upsert(2, 9.90, 78.10)
+    assert [key for _, key in index.within(9.95, 78.15, 10)] == [1]
+
+    index.remove(2)
+    assert len(index) == 1
+    assert [key for _, key in index.nearest(9.90, 78.10, 5)] == [1]
+
+
+def test_queries_while_routes_are_replaced() -> None:
+    """Stop queries on one thread never fail while another keeps replacing and removing routes."""
+    index = SpatialIndex(cell_deg=0.01)
+    routes = [
+        Route(id=route_id, route_name=f"R{route_id}", stops=[
+            RouteStop(id=route_id * 100 + i, route_id=route_id, stop_name=f"S{i}",
+                      latitude=9.9 + i / 1000, longitude=78.1 + route_id / 1000, order=i + 1)
+            for i in range(30)
+        ])
+        for route_id in range(1, 5)
+    ]
+    for route in routes:
+        index.set_route(route)
+
+    done = threading.Event()
+    errors = []
+
+    def writer() -> None:
+        try:
+            while not done.is_set():
+                for route in routes:
+                    index.remove_route(route.id)
+                    index.set_route(route)
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(2000):
+            for stop in index.nearest_stops(9.91, 78.102, 10):
+                assert stop["route_name"] == f"R{stop['route_id']}"
+            index.stops_within(9.91, 78.102, 2000)
+    finally:
+        done.set()
+        thread.join()
+    assert errors == []
+    assert len(index.nearest_stops(9.91, 78.102, 200)) == 120
@@ -0,0 +1,65 @@
+"""Tests for incrementally maintained dashboard counters."""
+from app.models.models import Bus, Driver, Route, Student
+from app.services.stats import DashboardCounters
+
+
+def student(email: str, route_id=None) -> Student:
+    """Build a student."""
+    return Student(name="S", email=email, roll_number=email, password="x", phone="1", route_id=route_id)
+
+
+def test_commits_update_counters_and_rollbacks_do_not(session_factory) -> None:
+    """Inserts, status changes, moves and deletes are counted only once committed."""
+    stats = DashboardCounters()
+    stats.register(session_factory)
+
+    db = session_factory()
+    route = Route(route_name="R1")
+    bus = Bus(bus_number="TN01", capacity=40, model="M", registration_number="REG1")
+    db.add_all([route, bus, Driver(name="D", email="d@x", phone="1", license_number="L", password="x")])
+    db.commit()
+    db.add_all([student("a@x", route.id), student("b@x", route.id)])
+    db.commit()
+
+    snapshot = stats.snapshot()
+    assert snapshot["total_routes"] == 1
+    assert snapshot["total_students"] == 2
+    assert snapshot["active_buses"] == 1
+    assert snapshot["active_drivers"] == 1
+    assert snapshot["students_per_route"] == {route.id: 2}
+
+    db.add(student("c@x"))
+    db.flush()
+    db.rollback()
+    assert stats.snapshot()["total_students"] == 2
+
+    bus.status = "maintenance"
+    moved = db.query(Student).filter_by(email="a@x").one()
+    moved.route_id = None
+    db.commit()
+    db.delete(db.query(Student).filter_by(email="b@x").one())
+    db.commit()
+
+    snapshot = stats.snapshot()
+    assert snapshot["total_buses"] == 1
+    assert snapshot["active_buses"] == 0
+    assert snapshot["total_students"] == 1
+    assert snapshot["students_per_route"] == {}
+
+
+def test_reconcile_corrects_drift_from_bulk_writes(session_factory) -> None:
+    """Writes that bypass the unit of work are picked up by a recount."""
+    stats = DashboardCounters()
+    stats.register(session_factory)
+
+    db = session_factory()
+    db.add(Bus(bus_number="TN01", capacity=40, model="M", registration_number="REG1"))
+    db.commit()
+    db.query(Bus).update({Bus.status: "inactive"}, synchronize_session=False)
+    db.commit()
+    assert stats.snapshot()["active_buses"] == 1
+
+    stats.reconcile(db)
+    assert stats.snapshot()["active_buses"] == 0
+    assert stats.snapshot()["total_buses"] == 1
+    assert stats.reconciled_at is not None
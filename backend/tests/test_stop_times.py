@@ -0,0 +1,98 @@
+"""Tests for generated per-stop arrival times and their incremental regeneration."""
+import pytest
+from sqlalchemy import event
+
+from app.models.models import Bus, ScheduleStopTime
+from app.services import crud
+from app.services.eta import RouteGeometry
+from app.services.stop_times import StopTimeGenerator, set_segment_speeds, stop_times
+
+
+@pytest.fixture
+def db(db):
+    """The test session with two buses."""
+    db.add_all([
+        Bus(id=1, bus_number="B1", capacity=40, model="M", registration_number="R1"),
+        Bus(id=2, bus_number="B2", capacity=40, model="M", registration_number="R2"),
+    ])
+    db.commit()
+    return db
+
+
+def stops(count: int, step_deg: float = 0.01) -> list[dict]:
+    """Stops due north of each other, about 1.1 km apart."""
+    return [{"stop_name": f"S{i}", "latitude": 9.9 + step_deg * i, "longitude": 78.1, "order": i}
+            for i in range(count)]
+
+
+def minutes(db, schedule_id: int) -> list[int]:
+    """Return a schedule's arrival minutes in stop order."""
+    return [row.arrival_minute for row in
+            db.query(ScheduleStopTime).filter_by(schedule_id=schedule_id).order_by(ScheduleStopTime.stop_order)]
+
+
+def test_offsets_use_segment_speeds_and_dwell(db):
+    route = crud.create_route(db, "R", "", stops(3))
+    generator = StopTimeGenerator(default_speed_kmh=36.0, dwell_seconds=60)
+    geometry = RouteGeometry(route.id, route.route_name, list(route.stops))
+    segment = geometry.segment_m[0]
+
+    offsets = generator.offsets(geometry, {(route.stops[1].id, route.stops[2].id): 18.0})
+
+    assert offsets[0] == 0
+    assert abs(offsets[1] - segment / 10) < 1e-6
+    assert abs(offsets[2] - (offsets[1] + 60 + segment / 5)) < 1e-3
+
+
+def test_schedule_writes_generate_stop_times(db):
+    route = crud.create_route(db, "R", "", stops(3))
+    schedule = crud.create_schedule(db, 1, route.id, "07:00", "Weekdays")
+
+    times = minutes(db, schedule.id)
+    assert len(times) == 3 and times[0] == 420 and times == sorted(times)
+    assert [row.stop_id for row in schedule.stop_times] == [s.id for s in route.stops]
+
+    crud.update_schedule(db, schedule, 1, route.id, "08:00", "Weekdays")
+    assert minutes(db, schedule.id)[0] == 480
+
+    crud.update_schedule(db, schedule, 1, route.id, "08:00", "Weekdays", status="inactive")
+    assert minutes(db, schedule.id) == []
+
+
+def test_regeneration_only_touches_affected_schedules(db):
+    first = crud.create_route(db, "R1", "", stops(3))
+    second = crud.create_route(db, "R2", "", stops(3))
+    on_first = crud.create_schedule(db, 1, first.id, "07:00", "Monday")
+    on_second = crud.create_schedule(db, 2, second.id, "07:00", "Monday")
+    before = minutes(db, on_second.id)
+
+    inserted = []
+    event.listen(db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, parameters, *args:
+                 inserted.append(parameters) if statement.startswith("INSERT INTO schedule_stop_times") else None)
+    set_segment_speeds(db, [{"from_stop_id": first.stops[0].id, "to_stop_id": first.stops[1].id, "speed_kmh": 5.0}])
+    written = stop_times.regenerate(db, route_ids=[first.id])
+    db.commit()
+
+    assert written == 3
+    assert all(row[0] == on_first.id for batch in inserted for row in batch)
+    assert minutes(db, on_first.id)[1] > minutes(db, on_second.id)[1]
+    assert minutes(db, on_second.id) == before
+
+
+def test_route_update_regenerates_and_arrivals_query(db):
+    route = crud.create_route(db, "R", "", stops(4))
+    late = crud.create_schedule(db, 1, route.id, "23:55", "Monday")
+    crud.create_schedule(db, 2, route.id, "07:00", "Tuesday")
+
+    last_stop = route.stops[-1].id
+    tuesday = stop_times.arrivals(db, last_stop, 1, 0, 24 * 60 - 1)
+    assert [row.schedule_id for row in tuesday][0] == late.id  # after midnight, from Monday
+    assert len(tuesday) == 2
+
+    crud.update_route(db, route, "R", "", [
+        {"id": s.id, "stop_name": s.stop_name, "latitude": s.latitude, "longitude": s.longitude, "order": s.order}
+        for s in route.stops[:2]
+    ])
+    assert len(minutes(db, late.id)) == 2
+    assert stop_times.arrivals(db, route.stops[1].id, 0, 23 * 60, 24 * 60 - 1)[0].schedule_id == late.id
@@ -0,0 +1,109 @@
+"""Tests for compiled schedule times, their migration and the timetable index."""
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base, upgrade_schema
+from app.models.models import Bus, Route, Schedule
+from app.services import crud
+from app.services.timetable import (
+    TimetableIndex, days_from_mask, format_departure, migrate_schedules, parse_days, parse_departure
+)
+
+
+@pytest.fixture
+def db(db):
+    """The test session with one bus and one route."""
+    db.add_all([
+        Bus(id=1, bus_number="B1", capacity=40, model="M", registration_number="R1"),
+        Route(id=1, route_name="Route A"),
+    ])
+    db.commit()
+    return db
+
+
+def test_parse_days():
+    assert parse_days("Monday,Wednesday") == 0b101
+    assert parse_days(["mon", "SUN"]) == 0b1000001
+    assert parse_days("Weekdays") == 0b11111
+    assert days_from_mask(0b1100000) == ["Saturday", "Sunday"]
+    with pytest.raises(ValueError):
+        parse_days("Funday")
+    with pytest.raises(ValueError):
+        parse_days("")
+
+
+def test_parse_and_format_departure():
+    assert parse_departure("07:00 AM") == 420
+    assert parse_departure("12:15 am") == 15
+    assert parse_departure("12:30 PM") == 750
+    assert parse_departure("7 pm") == 1140
+    assert parse_departure("19:30") == 1170
+    assert format_departure(1170) == "07:30 PM"
+    assert format_departure(15) == "12:15 AM"
+    for bad in ("25:00", "13:00 PM", "7:75", "soon"):
+        with pytest.raises(ValueError):
+            parse_departure(bad)
+
+
+def test_create_schedule_stores_canonical_and_compiled_times(db):
+    schedule = crud.create_schedule(db, 1, 1, "7:05", "mon, Fri")
+
+    assert (schedule.departure_time, schedule.departure_minute) == ("07:05 AM", 425)
+    assert (schedule.days_of_week, schedule.days_mask) == ("Monday,Friday", 0b10001)
+    assert schedule.bus.bus_number == "B1"
+
+
+def test_migrate_schedules_compiles_legacy_rows(db):
+    db.add_all([
+        Schedule(bus_id=1, route_id=1, departure_time="08:00 AM", days_of_week="Monday,Tuesday"),
+        Schedule(bus_id=1, route_id=1, departure_time="whenever", days_of_week="Monday"),
+    ])
+    db.commit()
+
+    compiled, invalid = migrate_schedules(db)
+
+    rows = db.query(Schedule).order_by(Schedule.id).all()
+    assert (compiled, invalid) == (1, [rows[1].id])
+    assert (rows[0].departure_minute, rows[0].days_mask) == (480, 0b11)
+    assert rows[1].departure_minute is None
+
+
+def test_upgrade_schema_adds_missing_columns_and_indexes():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE schedules (id INTEGER PRIMARY KEY, bus_id INTEGER NOT NULL, route_id INTEGER NOT NULL, "
+            "departure_time VARCHAR(20) NOT NULL, days_of_week VARCHAR(100) NOT NULL, status VARCHAR(20), "
+            "created_at DATETIME)"
+        ))
+    Base.metadata.create_all(bind=engine)
+
+    added = upgrade_schema(engine)
+
+    assert {"schedules.days_mask", "schedules.departure_minute"} <= set(added)
+    indexes = {index["name"] for index in inspect(engine).get_indexes("schedules")}
+    assert "ix_schedules_departure_minute_days_mask" in indexes
+    assert upgrade_schema(engine) == []
+
+
+def test_timetable_departures_and_updates(db):
+    index = TimetableIndex()
+    early = crud.create_schedule(db, 1, 1, "07:00", "Weekdays")
+    late = crud.create_schedule(db, 1, 1, "17:30", "Monday,Saturday")
+    crud.create_schedule(db, 1, 1, "08:00", "Monday", status="inactive")
+    index.load(db)
+
+    assert [d.schedule_id for d in index.departures(0)] == [early.id, late.id]
+    assert [d.schedule_id for d in index.departures(0, 420, 420)] == [early.id]
+    assert [d.schedule_id for d in index.departures(5, 0, 1000)] == []
+    assert [d.schedule_id for d in index.departures(5, 1000)] == [late.id]
+
+    crud.update_schedule(db, early, 1, 1, "09:00", "Saturday")
+    index.set(early)
+    assert [d.minute for d in index.departures(5)] == [540, 1050]
+    assert [d.schedule_id for d in index.departures(0)] == [late.id]
+
+    index.remove(late.id)
+    assert [d.schedule_id for d in index.departures(5)] == [early.id]
+    assert len(index) == 1
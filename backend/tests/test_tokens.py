@@ -0,0 +1,84 @@
+"""Tests for signed access tokens, their cache and revocation."""
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.tokens import Principal, TokenAuthority, TokenError, token_authority
+from app.services.auth import require_role
+
+
+def test_issue_and_verify_round_trip():
+    authority = TokenAuthority("secret", ttl=60)
+    principal = authority.verify(authority.issue(7, "driver", now=1000), now=1010)
+
+    assert (principal.user_id, principal.role, principal.expires_at) == (7, "driver", 1060)
+
+
+def test_tampered_and_foreign_tokens_are_rejected():
+    authority = TokenAuthority("secret")
+    token = authority.issue(7, "driver")
+    payload, signature = token.split(".")
+
+    with pytest.raises(TokenError):
+        authority.verify(payload[:-1] + ("A" if payload[-1] != "A" else "B") + "." + signature)
+    with pytest.raises(TokenError):
+        TokenAuthority("other").verify(token)
+    with pytest.raises(TokenError):
+        authority.verify("not-a-token")
+
+
+def test_expired_token_is_rejected_even_when_cached():
+    authority = TokenAuthority("secret", ttl=60)
+    token = authority.issue(1, "student", now=1000)
+    authority.verify(token, now=1001)
+
+    with pytest.raises(TokenError):
+        authority.verify(token, now=1060)
+    assert authority.stats()["cached"] == 0
+
+
+def test_cache_is_bounded_and_reused():
+    authority = TokenAuthority("secret", cache_size=2)
+    tokens = [authority.issue(i, "student") for i in range(3)]
+    for token in tokens:
+        authority.verify(token)
+    authority.verify(tokens[2])
+
+    stats = authority.stats()
+    assert (stats["cached"], stats["hits"], stats["misses"]) == (2, 1, 3)
+
+
+def test_revoked_token_and_revoked_user():
+    authority = TokenAuthority("secret")
+    first = authority.issue(1, "driver", now=1000)
+    second = authority.issue(1, "driver", now=1000)
+    other = authority.issue(2, "driver", now=1000)
+
+    authority.revoke(authority.verify(first, now=1001))
+    with pytest.raises(TokenError):
+        authority.verify(first, now=1001)
+    authority.verify(second, now=1001)
+
+    authority.revoke_user("driver", 1, now=1500)
+    with pytest.raises(TokenError):
+        authority.verify(second, now=1501)
+    authority.verify(other, now=1501)
+
+
+def test_require_role_dependency():
+    app = FastAPI()
+
+    @app.get("/driver-only")
+    async def driver_only(principal: Principal = Depends(require_role("driver"))) -> dict:
+        return {"user_id": principal.user_id}
+
+    client = TestClient(app)
+    assert client.get("/driver-only").status_code == 401
+    assert client.get("/driver-only", headers={"Authorization": "Bearer junk"}).status_code == 401
+
+    student = token_authority.issue(3, "student")
+    assert client.get("/driver-only", headers={"Authorization": f"Bearer {student}"}).status_code == 403
+
+    driver = token_authority.issue(4, "driver")
+    response = client.get("/driver-only", headers={"Authorization": f"Bearer {driver}"})
+    assert response.json() == {"user_id": 4}
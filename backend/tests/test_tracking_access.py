@@ -0,0 +1,112 @@
+"""Tests that students and drivers can only track and report for their own assignment."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.routes import driver, student
+from app.core.database import get_db
+from app.core.tokens import token_authority
+from app.models.models import Bus, Driver, Route, Student
+from app.services.broadcast import PositionBroadcaster
+from app.services.live_positions import LivePositionStore
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    """A client for the student and driver routers; student 1 rides route 1 and driver 1 drives bus 1."""
+    db = session_factory()
+    db.add_all([
+        Route(id=1, route_name="North"),
+        Route(id=2, route_name="South"),
+        Bus(id=1, bus_number="B1", capacity=40, model="M", registration_number="R1"),
+        Bus(id=2, bus_number="B2", capacity=40, model="M", registration_number="R2"),
+        Student(id=1, name="S", email="s@x.com", roll_number="R1", phone="1", password="x", route_id=1),
+        Driver(id=1, name="D", email="d@x.com", phone="1", license_number="L1", password="x", bus_id=1),
+    ])
+    db.commit()
+    db.close()
+
+    def get_test_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    store = LivePositionStore()
+    monkeypatch.setattr(driver, "live_positions", store)
+    monkeypatch.setattr(driver, "publish_position", lambda position: None)
+    monkeypatch.setattr(student, "live_positions", store)
+    buses = PositionBroadcaster()
+    buses.set_bus_routes(1, {1})
+    buses.set_bus_routes(2, {2})
+    monkeypatch.setattr(student, "broadcaster", buses)
+    app = FastAPI()
+    app.include_router(student.router)
+    app.include_router(driver.router)
+    app.dependency_overrides[get_db] = get_test_db
+    return TestClient(app)
+
+
+def bearer(user_id: int, role: str) -> dict:
+    return {"Authorization": f"Bearer {token_authority.issue(user_id, role)}"}
+
+
+def test_students_only_track_their_route(client) -> None:
+    """Another route is refused for students and allowed for admins."""
+    own = client.get("/students/track-bus", headers=bearer(1, "student"))
+    assert own.json()["detail"] == "No live bus on this route"
+    assert client.get("/students/track-bus", params={"route_id": 1}, headers=bearer(1, "student")).status_code == 404
+
+    other = client.get("/students/track-bus", params={"route_id": 2}, headers=bearer(1, "student"))
+    assert other.status_code == 403
+    admin = client.get("/students/track-bus", params={"route_id": 2}, headers=bearer(9, "admin"))
+    assert admin.json()["detail"] == "No live bus on this route"
+
+
+def test_drivers_only_report_for_their_bus(client) -> None:
+    """A bus_id other than the driver's assigned bus is refused, for single and batched points."""
+    point = {"latitude": 9.9, "longitude": 78.1}
+    headers = bearer(1, "driver")
+
+    assert client.post("/drivers/location", json={"driver_id": 1, "bus_id": 2, **point},
+                       headers=headers).status_code == 403
+    assert client.post("/drivers/location/batch", json={
+        "driver_id": 1, "bus_id": 2, "points": [{"seq": 1, "timestamp": "2026-03-02T08:00:00", **point}]
+    }, headers=headers).status_code == 403
+    assert driver.live_positions.get(2) is None
+
+    assert client.post("/drivers/location", json={"driver_id": 1, "bus_id": 1, **point},
+                       headers=headers).status_code == 200
+    assert client.post("/drivers/location", json={"driver_id": 1, **point}, headers=headers).status_code == 200
+    assert driver.live_positions.get(1).driver_id == 1
+
+
+def refused(client: TestClient, query: str) -> int:
+    """Return the close code of a live socket the server refuses."""
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(f"/students/live?{query}"):
+            pass
+    return closed.value.code
+
+
+def test_live_updates_need_a_token_for_an_allowed_route(client) -> None:
+    """The socket and the SSE stream refuse missing tokens and other students' routes and buses."""
+    token = token_authority.issue(1, "student")
+    assert refused(client, "route_id=1") == 1008
+    assert refused(client, "route_id=1&token=forged") == 1008
+    assert refused(client, f"route_id=2&token={token}") == 1008
+    assert refused(client, f"bus_id=2&token={token}") == 1008
+
+    for query in (f"token={token}", f"route_id=1&token={token}", f"bus_id=1&token={token}"):
+        with client.websocket_connect(f"/students/live?{query}"):
+            pass
+    admin = token_authority.issue(9, "admin")
+    with client.websocket_connect(f"/students/live?route_id=2&token={admin}"):
+        pass
+
+    assert client.get("/students/live/stream", params={"route_id": 1}).status_code == 401
+    assert client.get("/students/live/stream", params={"route_id": 2}, headers=bearer(1, "student")).status_code == 403
+    assert client.get("/students/live/stream", params={"bus_id": 2}, headers=bearer(1, "student")).status_code == 403
+    assert client.get("/students/live/stream", headers=bearer(9, "admin")).status_code == 400
@@ -0,0 +1,37 @@
+"""Tests for the columnar trajectory archive."""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from app.services.location_history import LocationHistory
+from app.services import trajectory_archive
+from app.services.trajectory_archive import export_day, open_day, scan
+
+
+def test_export_and_memory_mapped_read(db, tmp_path, monkeypatch) -> None:
+    """Exported bus-days read back as zero-copy columns sorted by time."""
+    history = LocationHistory(interval="day")
+    monkeypatch.setattr(trajectory_archive, "location_history", history)
+
+    day = date(2026, 3, 2)
+    base = datetime(2026, 3, 2, 7, 0)
+    history.insert(db, [
+        {"bus_id": bus_id, "driver_id": 1, "latitude": 9.9 + i * 0.001, "longitude": 78.1,
+         "speed": None if i == 0 else 20.0 + i, "timestamp": base + timedelta(seconds=5 * i)}
+        for bus_id in (7, 3) for i in reversed(range(4))
+    ])
+    db.commit()
+
+    export_day(db, day, tmp_path)
+    archive = open_day(tmp_path, day)
+    assert sorted(archive.bus_ids) == [3, 7]
+
+    trajectory = archive.trajectory(7)
+    assert len(trajectory) == 4
+    assert trajectory.times[0] == np.datetime64(base, "us")
+    assert np.allclose(trajectory.latitude, [9.9, 9.901, 9.902, 9.903])
+    assert np.isnan(trajectory.speed[0]) and trajectory.speed[3] == 23.0
+    assert not trajectory.latitude.flags.owndata
+    assert not trajectory.latitude.flags.writeable
+
+    assert sum(len(t) for t in scan(tmp_path, day, day + timedelta(days=1))) == 8
@@ -0,0 +1,72 @@
+"""Tests for the single-writer queue and the SQLite storage profile."""
+import threading
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import Settings
+from app.core.database import Base, apply_storage_profile
+from app.core.write_queue import WriteQueue
+from app.models.models import Bus
+
+
+def make_factories(path) -> tuple[sessionmaker, sessionmaker]:
+    """Return writer and reader session factories on a WAL database file."""
+    url = f"sqlite:///{path}"
+    config = Settings(database_url=url)
+    writer = create_engine(url, connect_args={"check_same_thread": False}, pool_size=1, max_overflow=0)
+    apply_storage_profile(writer, config, writer=True)
+    reader = create_engine(url, connect_args={"check_same_thread": False})
+    apply_storage_profile(reader, config, writer=False)
+    Base.metadata.create_all(bind=writer)
+    return sessionmaker(bind=writer), sessionmaker(bind=reader)
+
+
+def add_bus(db, number: str) -> str:
+    """Add a bus without committing."""
+    db.add(Bus(bus_number=number, capacity=40, model="M", registration_number=f"REG-{number}"))
+    db.flush()
+    return number
+
+
+def test_batched_jobs_share_a_commit_and_fail_alone(tmp_path) -> None:
+    """A failing batched job is rolled back to its savepoint; the rest commit together."""
+    writer, reader = make_factories(tmp_path / "db.sqlite")
+    writes = WriteQueue(writer)
+    gate = threading.Event()
+    try:
+        blocker = writes.submit(lambda db: gate.wait())
+        futures = [writes.submit(add_bus, n, batched=True) for n in ("B1", "B2", "B1", "B3")]
+        gate.set()
+        blocker.result(timeout=5)
+        outcomes = [f.exception(timeout=5) is None for f in futures]
+    finally:
+        writes.shutdown()
+
+    assert outcomes == [True, True, False, True]
+    assert writes.commits == 2
+    db = reader()
+    assert sorted(b.bus_number for b in db.query(Bus)) == ["B1", "B2", "B3"]
+
+
+def test_readers_are_read_only_and_not_blocked_by_the_writer(tmp_path) -> None:
+    """Reads see the last commit while a write transaction is open."""
+    writer, reader = make_factories(tmp_path / "db.sqlite")
+    db = writer()
+    add_bus(db, "B1")
+    db.commit()
+
+    add_bus(db, "B2")  # open write transaction
+    readonly = reader()
+    assert readonly.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    assert [b.bus_number for b in readonly.query(Bus)] == ["B1"]
+    db.commit()
+    readonly.rollback()
+    assert readonly.query(Bus).count() == 2
+
+    try:
+        readonly.execute(text("DELETE FROM buses"))
+    except Exception as exc:
+        assert "readonly" in str(exc)
+    else:
+        raise AssertionError("reader connection accepted a write")
@@ -5,6 +5,7 @@ import {
   Text,
   ScrollView,
   TouchableOpacity,
+  TextInput,
   Alert,
 } from 'react-native';
 import { useRouter } from 'expo-router';
@@ -15,6 +16,7 @@ export default function FeedbackDashboard() {
   const router = useRouter();
   const [feedbacks, setFeedbacks] = useState<any[]>([]);
   const [loading, setLoading] = useState(false);
+  const [searchQuery, setSearchQuery] = useState('');
   const [stats, setStats] = useState({
     total: 0,
     avgRating: 0,
@@ -53,6 +55,21 @@ export default function FeedbackDashboard() {
     loadFeedback();
   }, []);
 
+  const handleSearch = async () => {
+    if (!searchQuery.trim()) {
+      loadFeedback();
+      return;
+    }
+    setLoading(true);
+    try {
+      setFeedbacks(await feedbackService.searchFeedback(searchQuery.trim()));
+    } catch (error) {
+      Alert.alert('Error', 'Failed to search feedback');
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const getRatingColor = (rating: number) => {
     if (rating >= 4) return '#10b981';
     if (rating >= 3) return '#f59e0b';
@@ -157,6 +174,14 @@ export default function FeedbackDashboard() {
         {/* Feedback List */}
         <View style={styles.section}>
           <Text style={styles.sectionTitle}>Recent Feedback</Text>
+          <TextInput
+            style={styles.searchInput}
+            placeholder="Search feedback messages"
+            value={searchQuery}
+            onChangeText={setSearchQuery}
+            onSubmitEditing={handleSearch}
+            returnKeyType="search"
+          />
           {feedbacks.map((feedback) => (
             <View key={feedback.id} style={styles.feedbackCard}>
               <View style={styles.feedbackHeader}>
@@ -317,6 +342,15 @@ const styles = StyleSheet.create({
     color: '#1e293b',
     textAlign: 'right',
   },
+  searchInput: {
+    backgroundColor: '#fff',
+    borderWidth: 1,
+    borderColor: '#e2e8f0',
+    borderRadius: 8,
+    padding: 12,
+    fontSize: 16,
+    marginBottom: 12,
+  },
   feedbackCard: {
     backgroundColor: '#fff',
     borderRadius: 12,
@@ -12,7 +12,7 @@ import AsyncStorage from '@react-native-async-storage/async-storage';
 import { useRouter } from 'expo-router';
 import { MaterialCommunityIcons } from '@expo/vector-icons';
 import { LinearGradient } from 'expo-linear-gradient';
-import { driverService } from '../../services/api';
+import { authService, driverService } from '../../services/api';
 
 export default function DriverDashboard() {
   const router = useRouter();
@@ -47,7 +47,7 @@ export default function DriverDashboard() {
   const toggleLocationSharing = async () => {
     try {
       // Simulated location update
-      await driverService.updateLocation(13.0827, 80.2707);
+      await driverService.updateLocation(userData?.id, 13.0827, 80.2707, userData?.bus_id ?? undefined);
       setLocationSharing(!locationSharing);
       Alert.alert('Success', locationSharing ? 'Location sharing stopped' : 'Location sharing started');
     } catch (error: any) {
@@ -56,6 +56,7 @@ export default function DriverDashboard() {
   };
 
   const handleLogout = async () => {
+    await authService.logout();
     await AsyncStorage.clear();
     router.replace('/');
   };
@@ -12,7 +12,7 @@ import AsyncStorage from '@react-native-async-storage/async-storage';
 import { useRouter } from 'expo-router';
 import { MaterialCommunityIcons } from '@expo/vector-icons';
 import { LinearGradient } from 'expo-linear-gradient';
-import { studentService } from '../../services/api';
+import { authService, studentService } from '../../services/api';
 
 export default function StudentDashboard() {
   const router = useRouter();
@@ -46,7 +46,8 @@ export default function StudentDashboard() {
 
   const trackBus = async () => {
     try {
-      const data = await studentService.trackBus();
+      const student = JSON.parse((await AsyncStorage.getItem('userData')) || '{}');
+      const data = await studentService.trackBus(student.route_id ?? undefined, student.id);
       setBusTracking(data);
     } catch (error: any) {
       Alert.alert('Error', 'Failed to track bus');
@@ -54,6 +55,7 @@ export default function StudentDashboard() {
   };
 
   const handleLogout = async () => {
+    await authService.logout();
     await AsyncStorage.clear();
     router.replace('/');
   };
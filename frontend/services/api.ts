@@ -1,5 +1,6 @@
 import axios from 'axios';
 import { Platform } from 'react-native';
+import AsyncStorage from '@react-native-async-storage/async-storage';
 
 // Use localhost for web, and your computer's IP for mobile
 const getApiUrl = () => {
@@ -20,10 +21,14 @@ const api = axios.create({
   },
 });
 
-// Add request interceptor for debugging
+// Add request interceptor for debugging and the stored access token
 api.interceptors.request.use(
-  (config) => {
+  async (config) => {
     console.log('API Request:', config.method?.toUpperCase(), config.url);
+    const token = await AsyncStorage.getItem('userToken');
+    if (token) {
+      config.headers.Authorization = `Bearer ${token}`;
+    }
     return config;
   },
   (error) => {
@@ -44,6 +49,18 @@ api.interceptors.response.use(
   }
 );
 
+// Follow X-Next-Cursor headers until every page of a list endpoint is loaded
+const fetchAllPages = async (url: string, limit = 500) => {
+  const items: any[] = [];
+  let cursor: string | undefined;
+  do {
+    const response = await api.get(url, { params: { limit, cursor } });
+    items.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return items;
+};
+
 export const authService = {
   adminLogin: async (username: string, password: string) => {
     const response = await api.post('/admin/login', { username, password });
@@ -59,6 +76,15 @@ export const authService = {
     const response = await api.post('/drivers/login', { email, password });
     return response.data;
   },
+
+  // Revoke the stored token on the server before it is cleared locally
+  logout: async () => {
+    try {
+      await api.post('/auth/logout');
+    } catch (error) {
+      // The token may already be expired or revoked
+    }
+  },
 };
 
 export const adminService = {
@@ -69,8 +95,7 @@ export const adminService = {
   
   // Student Management
   getStudents: async () => {
-    const response = await api.get('/admin/students');
-    return response.data;
+    return fetchAllPages('/admin/students');
   },
   
   createStudent: async (data: any) => {
@@ -87,11 +112,15 @@ export const adminService = {
     const response = await api.delete(`/admin/students/${id}`);
     return response.data;
   },
+
+  assignStudentRoutes: async (apply = false) => {
+    const response = await api.post('/admin/students/assign-routes', null, { params: { apply } });
+    return response.data;
+  },
   
   // Driver Management
   getDrivers: async () => {
-    const response = await api.get('/admin/drivers');
-    return response.data;
+    return fetchAllPages('/admin/drivers');
   },
   
   createDriver: async (data: any) => {
@@ -112,8 +141,7 @@ export const adminService = {
 
 export const busService = {
   getBuses: async () => {
-    const response = await api.get('/buses');
-    return response.data;
+    return fetchAllPages('/buses');
   },
   
   getBus: async (id: number) => {
@@ -162,6 +190,11 @@ export const routeService = {
     const response = await api.delete(`/routes/${id}`);
     return response.data;
   },
+
+  optimizeRoute: async (id: number, apply = false) => {
+    const response = await api.post(`/routes/${id}/optimize`, null, { params: { apply } });
+    return response.data;
+  },
 };
 
 export const scheduleService = {
@@ -174,6 +207,14 @@ export const scheduleService = {
     const response = await api.get(`/schedules/${id}`);
     return response.data;
   },
+
+  // Departures on a weekday (defaults to today) between two times such as "07:30"
+  getDepartures: async (day?: string, from?: string, to?: string, routeId?: number) => {
+    const response = await api.get('/schedules/departures', {
+      params: { day, from, to, route_id: routeId },
+    });
+    return response.data;
+  },
   
   createSchedule: async (data: any) => {
     const response = await api.post('/schedules', data);
@@ -197,10 +238,24 @@ export const studentService = {
     return response.data;
   },
   
-  trackBus: async () => {
-    const response = await api.get('/students/track-bus');
+  trackBus: async (routeId?: number, studentId?: number) => {
+    const response = await api.get('/students/track-bus', {
+      params: { route_id: routeId, student_id: studentId },
+    });
     return response.data;
   },
+
+  // Live positions pushed by the server instead of polling track-bus
+  // WebSockets cannot carry an Authorization header, so the token goes in the query string
+  openLiveTracking: async (routeId: number, onPosition: (position: any) => void) => {
+    const token = await AsyncStorage.getItem('userToken');
+    const socket = new WebSocket(
+      `${API_BASE_URL.replace(/^http/, 'ws')}/students/live?route_id=${routeId}` +
+        `&token=${encodeURIComponent(token ?? '')}`
+    );
+    socket.onmessage = (event) => onPosition(JSON.parse(event.data));
+    return socket;
+  },
 };
 
 export const driverService = {
@@ -209,22 +264,42 @@ export const driverService = {
     return response.data;
   },
   
-  updateLocation: async (latitude: number, longitude: number) => {
-    const response = await api.post('/drivers/location', { latitude, longitude });
+  updateLocation: async (driverId: number, latitude: number, longitude: number, busId?: number) => {
+    const response = await api.post('/drivers/location', {
+      driver_id: driverId,
+      bus_id: busId,
+      latitude,
+      longitude,
+    });
+    return response.data;
+  },
+
+  // points: [{ seq, latitude, longitude, speed?, timestamp }] buffered while offline
+  uploadLocationBatch: async (driverId: number, points: any[], busId?: number) => {
+    const response = await api.post('/drivers/location/batch', {
+      driver_id: driverId,
+      bus_id: busId,
+      points,
+    });
     return response.data;
   },
 };
 
 export const feedbackService = {
   getFeedback: async () => {
-    const response = await api.get('/feedback');
-    return response.data;
+    return fetchAllPages('/feedback');
   },
   
   getFeedbackSummary: async () => {
     const response = await api.get('/feedback/summary');
     return response.data;
   },
+
+  // Ranked full-text search; filters: { category?, rating?, status? }
+  searchFeedback: async (q: string, filters: Record<string, any> = {}) => {
+    const response = await api.get('/feedback/search', { params: { q, ...filters } });
+    return response.data;
+  },
   
   submitFeedback: async (data: any) => {
     const response = await api.post('/feedback', data);